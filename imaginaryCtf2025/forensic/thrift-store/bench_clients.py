@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Throughput / latency benchmark of the thrift-store clients against the
+# local store_server.py, which runs in a child process so client and server
+# do not share a GIL.
+#
+# Each round is one checkout: createBasket, addToBasket x2, pay(exact total).
+# Clients: thriftpy2 (solve_thrift_store.connect), pwntools
+# (exploit_pwntools call_* helpers, skipped if pwntools is missing) and the
+# pipelined client, plus a getInventory decode test at the given size.
+#
+# Usage: python3 bench_clients.py [--rounds 500] [--inventory 1000] [--latency-ms 0]
+
+import io
+import os
+import sys
+import time
+import argparse
+import contextlib
+import multiprocessing
+from typing import Callable, List
+
+from store_server import Store, StoreServer, make_inventory
+
+ITEMS = ["cheddar-cheese-200g", "tomatoes-500g"]
+
+
+def _serve(conn, inventory: int, latency: float, jitter: float) -> None:
+    server = StoreServer("127.0.0.1", 0, Store(make_inventory(inventory)), latency, jitter, seed=0)
+    conn.send(server.port)
+    server.serve_forever()
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def report(label: str, calls: int, elapsed: float, latencies: List[float]) -> None:
+    lat = sorted(latencies)
+    print(f"{label:<24} {calls / elapsed:>10.0f} {percentile(lat, 0.5) * 1e3:>9.3f} "
+          f"{percentile(lat, 0.99) * 1e3:>9.3f} {elapsed:>8.2f}")
+
+
+def timed_rounds(one_round: Callable[[], int], rounds: int):
+    """Run `one_round` (returns calls made) `rounds` times; per-call latency."""
+    latencies = []
+    calls = 0
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        t = time.perf_counter()
+        n = one_round()
+        latencies.append((time.perf_counter() - t) / n)
+        calls += n
+    return calls, time.perf_counter() - t0, latencies
+
+
+def bench_thriftpy2(host: str, port: int, rounds: int, total: int) -> None:
+    try:
+        from solve_thrift_store import connect
+    except ImportError:
+        print(f"{'thriftpy2':<24} skipped (thriftpy2 not installed)")
+        return
+    client, _ = connect(host, port)
+
+    def one_round() -> int:
+        basket = client.createBasket()
+        for slug in ITEMS:
+            client.addToBasket(basket, slug)
+        client.pay(basket, total)
+        return 2 + len(ITEMS)
+
+    report("thriftpy2", *timed_rounds(one_round, rounds))
+    t = time.perf_counter()
+    items = client.getInventory()
+    print(f"{'  getInventory':<24} {len(items)} items in {(time.perf_counter() - t) * 1e3:.2f} ms")
+    client.close()
+
+
+def bench_pwntools(host: str, port: int, rounds: int, total: int) -> None:
+    try:
+        import exploit_pwntools as xp
+        from pwn import context
+    except ImportError:
+        print(f"{'pwntools':<24} skipped (pwntools not installed)")
+        return
+    context.log_level = "error"
+    conn = xp.remote(host, port)
+    seq = iter(range(1, 1 << 31))
+    sink = io.StringIO()
+
+    def one_round() -> int:
+        # recv_frame prints a debug line per frame; that cost is kept, the text is not
+        with contextlib.redirect_stdout(sink):
+            basket, _ = xp.call_create_basket(conn, next(seq))
+            for slug in ITEMS:
+                xp.call_add_to_basket(conn, basket, slug, next(seq))
+            xp.call_pay(conn, basket, total, next(seq))
+        sink.seek(0)
+        sink.truncate()
+        return 2 + len(ITEMS)
+
+    report("pwntools", *timed_rounds(one_round, rounds))
+    t = time.perf_counter()
+    with contextlib.redirect_stdout(sink):
+        items = xp.call_get_inventory(conn, next(seq))
+    print(f"{'  getInventory':<24} {len(items or [])} items in {(time.perf_counter() - t) * 1e3:.2f} ms")
+    conn.close()
+
+
+def bench_pipeline(host: str, port: int, rounds: int, total: int) -> None:
+    from pipeline import PipelinedClient
+
+    with PipelinedClient(host, port) as client:
+        def one_round() -> int:
+            basket = client.call("createBasket").success
+            client.call_many([("addToBasket", (basket, slug)) for slug in ITEMS] + [("pay", (basket, total))])
+            return 2 + len(ITEMS)
+
+        report("pipeline", *timed_rounds(one_round, rounds))
+        t = time.perf_counter()
+        items = client.call("getInventory").success
+        print(f"{'  getInventory':<24} {len(items)} items in {(time.perf_counter() - t) * 1e3:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark thrift-store clients against the local server")
+    parser.add_argument("--rounds", type=int, default=500)
+    parser.add_argument("--inventory", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--clients", default="thriftpy2,pwntools,pipeline")
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    prices = {it["slug"]: it["price"] for it in make_inventory(args.inventory)}
+    total = sum(prices[s] for s in ITEMS)
+
+    parent, child = multiprocessing.Pipe()
+    proc = multiprocessing.Process(
+        target=_serve, args=(child, args.inventory, args.latency_ms / 1e3, args.jitter_ms / 1e3), daemon=True
+    )
+    proc.start()
+    port = parent.recv()
+    benches = {"thriftpy2": bench_thriftpy2, "pwntools": bench_pwntools, "pipeline": bench_pipeline}
+    try:
+        print(f"server 127.0.0.1:{port}, {args.inventory} items, latency {args.latency_ms} ms, "
+              f"{args.rounds} rounds of {2 + len(ITEMS)} calls", file=sys.stderr)
+        print(f"{'client':<24} {'calls/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'total s':>8}")
+        for name in args.clients.split(","):
+            benches[name]("127.0.0.1", port, args.rounds, total)
+    finally:
+        proc.terminate()
+        proc.join()
+
+
+if __name__ == "__main__":
+    main()
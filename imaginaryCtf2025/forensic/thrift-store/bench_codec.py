@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Decode benchmark: tbinary.Codec against the per-field slicing parser that
+# exploit_pwntools.py used for getInventory replies (kept below as the
+# baseline). Replies are synthesised with the codec's encoder.
+#
+# Usage: python3 bench_codec.py [--sizes 100,1000,10000,100000] [--repeat 5]
+
+import time
+import struct
+import argparse
+
+from tbinary import Codec, T_STOP, T_STRUCT, T_LIST, T_STRING, T_I32, T_I64
+
+
+def legacy_parse_inventory(pkt: bytes):
+    # the old exploit_pwntools.call_get_inventory parser, minus the I/O
+    off = 0
+
+    def read_i32() -> int:
+        nonlocal off
+        v = struct.unpack(">i", pkt[off : off + 4])[0]
+        off += 4
+        return v
+
+    def read_i16() -> int:
+        nonlocal off
+        v = struct.unpack(">h", pkt[off : off + 2])[0]
+        off += 2
+        return v
+
+    def read_byte() -> int:
+        nonlocal off
+        v = pkt[off]
+        off += 1
+        return v
+
+    def read_string() -> str:
+        nonlocal off
+        ln = read_i32()
+        s = pkt[off : off + ln]
+        off += ln
+        return s.decode("utf-8", errors="replace")
+
+    def read_i64() -> int:
+        nonlocal off
+        v = struct.unpack(">q", pkt[off : off + 8])[0]
+        off += 8
+        return v
+
+    first = read_i32()
+    if (first & 0xFFFF0000) == 0x80010000:
+        name_len = read_i32()
+        off += name_len
+        read_i32()
+    else:
+        off += first
+        read_byte()
+        read_i32()
+
+    items = []
+    while True:
+        t = read_byte()
+        if t == T_STOP:
+            break
+        fid = read_i16()
+        if fid == 0 and t == T_LIST:
+            read_byte()
+            count = read_i32()
+            for _ in range(count):
+                elem = {"slug": None, "name": None, "description": None, "price": None}
+                while True:
+                    tt = read_byte()
+                    if tt == T_STOP:
+                        break
+                    ff = read_i16()
+                    if tt == T_STRING and ff == 1:
+                        elem["slug"] = read_string()
+                    elif tt == T_STRING and ff == 2:
+                        elem["name"] = read_string()
+                    elif tt == T_STRING and ff == 3:
+                        elem["description"] = read_string()
+                    elif tt in (T_I64, T_I32):
+                        elem["price"] = read_i64() if tt == T_I64 else read_i32()
+                    else:
+                        break
+                items.append(elem)
+        elif t == T_STRUCT:
+            break
+        else:
+            break
+    return items
+
+
+def make_inventory(n: int):
+    return [
+        {
+            "slug": f"item-{i:06d}",
+            "name": f"Item number {i}",
+            "description": "A perfectly ordinary grocery item. " * 2,
+            "price": 100 + i,
+        }
+        for i in range(n)
+    ]
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark getInventory reply decoding")
+    parser.add_argument("--sizes", default="100,1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    codec = Codec()
+    print(f"{'items':>8} {'MB':>7} {'legacy ms':>10} {'codec ms':>9} {'speedup':>8}")
+    for n in (int(x) for x in args.sizes.split(",") if x):
+        pkt = codec.encode_reply("getInventory", 1, make_inventory(n), framed=False)
+        expected = legacy_parse_inventory(pkt)
+        got = codec.decode_reply(pkt).success
+        if got != expected:
+            raise SystemExit(f"decoders disagree at n={n}")
+        legacy = best_of(lambda: legacy_parse_inventory(pkt), args.repeat)
+        fast = best_of(lambda: codec.decode_reply(pkt), args.repeat)
+        print(f"{n:>8} {len(pkt) / 1e6:>7.2f} {legacy * 1e3:>10.2f} {fast * 1e3:>9.2f} {legacy / fast:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Throughput / memory benchmark for pcap2jsonl.py on synthetic captures.
+#
+# Captures of the requested sizes are written to a temp dir: many
+# interleaved connections running the capture.thrift workload, with large
+# replies split into MSS-sized segments and a few segments retransmitted or
+# swapped. Each file is then run through `pcap2jsonl.py --bench` in its own
+# process so peak RSS is per size; it should stay flat as the size grows.
+#
+# Usage: python3 bench_pcap.py [--sizes 16,64,256] [--pcapng] [--keep DIR]
+
+import os
+import sys
+import random
+import struct
+import argparse
+import tempfile
+import subprocess
+
+from tbinary import Codec, IDL
+from store_server import make_inventory
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MSS = 1448
+
+
+def _packet(src: int, dst: int, sport: int, dport: int, seq: int, data: bytes) -> bytes:
+    tcp = struct.pack(">HHIIBBHHH", sport, dport, seq, 0, 5 << 4, 0x18, 65535, 0, 0)
+    ip = struct.pack(">BBHHHBBHII", 0x45, 0, 20 + len(tcp) + len(data), 0, 0x4000, 64, 6, 0, src, dst)
+    return b"\x00" * 12 + b"\x08\x00" + ip + tcp + data
+
+
+class CaptureWriter:
+    def __init__(self, f, pcapng: bool):
+        self.f, self.pcapng = f, pcapng
+        if pcapng:
+            shb = struct.pack("<IIIHHq", 0x0A0D0D0A, 28, 0x1A2B3C4D, 1, 0, -1) + struct.pack("<I", 28)
+            idb = struct.pack("<IIHHI", 1, 20, 1, 0, 262144) + struct.pack("<I", 20)
+            f.write(shb + idb)
+        else:
+            f.write(struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 262144, 1))
+
+    def write(self, ts: float, pkt: bytes) -> None:
+        if self.pcapng:
+            usec = int(ts * 1e6)
+            pad = -len(pkt) % 4
+            blen = 32 + len(pkt) + pad
+            self.f.write(struct.pack("<IIIIIII", 6, blen, 0, usec >> 32, usec & 0xFFFFFFFF, len(pkt), len(pkt))
+                         + pkt + b"\x00" * pad + struct.pack("<I", blen))
+        else:
+            sec = int(ts)
+            self.f.write(struct.pack("<IIII", sec, int((ts - sec) * 1e6), len(pkt), len(pkt)) + pkt)
+
+
+def synthesize(path: str, size: int, pcapng: bool = False, conns: int = 64, seed: int = 0) -> int:
+    """Write a capture of about `size` bytes; returns the number of Thrift frames in it."""
+    rng = random.Random(seed)
+    codec = Codec(IDL.load(os.path.join(HERE, "capture.thrift")))
+    inventory = {"items": make_inventory(200)}
+    client, server = 0x7F000001, 0x7F000002
+    seqs = {}
+    frames = 0
+    ts = 1.7e9
+
+    def exchange(sport: int, seqid: int):
+        basket = f"{rng.getrandbits(128):032x}"
+        method = rng.choice(["createBasket", "addToBasket", "addToBasket", "getBasket", "getInventory", "pay"])
+        if method == "createBasket":
+            call = codec.encode_call(method, seqid)
+            reply = codec.encode_reply(method, seqid, {"id": basket})
+        elif method == "addToBasket":
+            call = codec.encode_call(method, seqid, basket, "tomatoes-500g")
+            reply = codec.encode_reply(method, seqid)
+        elif method == "getBasket":
+            call = codec.encode_call(method, seqid, basket)
+            reply = codec.encode_reply(method, seqid, {"items": [{"slug": "tomatoes-500g", "quantity": 1}] * 3})
+        elif method == "getInventory":
+            call = codec.encode_call(method, seqid)
+            reply = codec.encode_reply(method, seqid, inventory)
+        else:
+            call = codec.encode_call(method, seqid, basket, 700)
+            reply = codec.encode_reply(method, seqid, exception="Total does not match basket total")
+        return [(client, server, sport, 9090, call), (server, client, 9090, sport, reply)]
+
+    with open(path, "wb") as f:
+        out = CaptureWriter(f, pcapng)
+        seqid = 0
+        while f.tell() < size:
+            sport = 40000 + rng.randrange(conns)
+            seqid += 1
+            for src, dst, sp, dp, payload in exchange(sport, seqid & 0x7FFFFFFF):
+                key = (sp, dp)
+                if key not in seqs:
+                    isn = rng.getrandbits(32)
+                    ts += 1e-5
+                    out.write(ts, _syn(src, dst, sp, dp, isn))
+                    seqs[key] = (isn + 1) & 0xFFFFFFFF
+                segs = []
+                for i in range(0, len(payload), MSS):
+                    segs.append((seqs[key], payload[i:i + MSS]))
+                    seqs[key] = (seqs[key] + len(payload[i:i + MSS])) & 0xFFFFFFFF
+                if len(segs) > 2 and rng.random() < 0.05:
+                    j = rng.randrange(len(segs) - 1)
+                    segs[j], segs[j + 1] = segs[j + 1], segs[j]
+                for seq, data in segs:
+                    ts += 1e-5
+                    pkt = _packet(src, dst, sp, dp, seq, data)
+                    out.write(ts, pkt)
+                    if rng.random() < 0.02:
+                        out.write(ts, pkt)
+                frames += 1
+    return frames
+
+
+def _syn(src: int, dst: int, sport: int, dport: int, isn: int) -> bytes:
+    pkt = bytearray(_packet(src, dst, sport, dport, isn, b""))
+    pkt[14 + 20 + 13] = 0x02
+    return bytes(pkt)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pcap2jsonl.py on synthetic captures")
+    parser.add_argument("--sizes", default="16,64,256", help="Capture sizes in MB")
+    parser.add_argument("--pcapng", action="store_true")
+    parser.add_argument("--keep", default=None, help="Write captures here and keep them")
+    args = parser.parse_args()
+
+    workdir = args.keep or tempfile.mkdtemp(prefix="thrift-pcap-")
+    os.makedirs(workdir, exist_ok=True)
+    ext = "pcapng" if args.pcapng else "pcap"
+    for mb in (int(x) for x in args.sizes.split(",") if x):
+        path = os.path.join(workdir, f"synthetic-{mb}mb.{ext}")
+        frames = synthesize(path, mb << 20, args.pcapng)
+        print(f"{os.path.basename(path)}: {frames} frames", file=sys.stderr)
+        try:
+            subprocess.run([sys.executable, os.path.join(HERE, "pcap2jsonl.py"), path, "--bench"], check=True)
+        finally:
+            if not args.keep:
+                os.unlink(path)
+    if not args.keep:
+        os.rmdir(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+// Store schema as it appears on the wire in capture.pcap, for decoding the
+// capture (pcap2jsonl.py). Field ids and types are from the traffic; the
+// struct and field names are guesses. Unlike store.thrift, results are
+// wrapped in structs, Item.price is field 3 and pay declares an exception.
+// No successful pay() is in the capture, so its return type is unknown.
+
+namespace py store
+
+struct Item {
+  1: string slug,
+  2: string name,
+  3: i64 price,
+  4: optional string description
+}
+
+struct Inventory {
+  1: list<Item> items
+}
+
+struct Basket {
+  1: string id
+}
+
+struct BasketItem {
+  1: string slug,
+  2: i8 quantity
+}
+
+struct BasketContents {
+  1: list<BasketItem> items
+}
+
+exception StoreException {
+  1: string message
+}
+
+service Store {
+  Basket createBasket(),
+  void addToBasket(1: string basketId, 2: string itemSlug),
+  BasketContents getBasket(1: string basketId),
+  Inventory getInventory(),
+  string pay(1: string basketId, 2: i64 total) throws (2: StoreException error)
+}
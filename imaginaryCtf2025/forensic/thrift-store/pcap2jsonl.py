@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Stream Thrift calls and replies out of a pcap / pcapng capture as JSONL.
+#
+# The capture is memory-mapped and walked one packet at a time. TCP
+# payloads are reassembled per direction (retransmissions trimmed,
+# out-of-order segments held until the gap fills), cut into
+# TFramedTransport frames as soon as a frame is complete, and decoded with
+# tbinary.Codec. Memory stays bounded however large the capture is: pages
+# already parsed are dropped from the mapping, the number of live streams,
+# the bytes held out of order and the frame size are all capped, and a
+# stream that loses framing (gap, capture started mid-stream, non-Thrift
+# traffic) resyncs on the next strict message header.
+#
+# Usage:
+#   python3 pcap2jsonl.py [capture.pcap] [-o out.jsonl] [--idl capture.thrift] [--port 9090]
+#   python3 pcap2jsonl.py big.pcapng --bench
+
+import io
+import os
+import sys
+import json
+import mmap
+import time
+import socket
+import struct
+import argparse
+import resource
+import functools
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional, Tuple
+
+from tbinary import Codec, IDL
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+
+TCP_FIN, TCP_SYN, TCP_RST = 0x01, 0x02, 0x04
+
+# drop parsed pages from the mapping every this many bytes
+RELEASE_EVERY = 8 << 20
+
+Packet = Tuple[float, int, bytes]
+
+
+# ------------------------------------------------------------ capture files
+
+class CaptureReader:
+    """Packets (timestamp, linktype, bytes) from a pcap or pcapng file via mmap."""
+
+    def __init__(self, path: str):
+        self._f = open(path, "rb")
+        self.size = os.fstat(self._f.fileno()).st_size
+        self.mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        if self.size and hasattr(mmap, "MADV_SEQUENTIAL"):
+            self.mm.madvise(mmap.MADV_SEQUENTIAL)
+        self.offset = 0
+        self._released = 0
+
+    def close(self) -> None:
+        if isinstance(self.mm, mmap.mmap):
+            self.mm.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _release(self, off: int) -> None:
+        # parsed pages are clean file pages; dropping them keeps RSS flat
+        if off - self._released >= RELEASE_EVERY and hasattr(mmap, "MADV_DONTNEED"):
+            end = off - off % mmap.PAGESIZE
+            self.mm.madvise(mmap.MADV_DONTNEED, self._released, end - self._released)
+            self._released = end
+
+    def __iter__(self) -> Iterator[Packet]:
+        magic = bytes(self.mm[:4])
+        if magic == b"\x0a\x0d\x0d\x0a":
+            return self._pcapng()
+        if magic in (b"\xd4\xc3\xb2\xa1", b"\xa1\xb2\xc3\xd4", b"\x4d\x3c\xb2\xa1", b"\xa1\xb2\x3c\x4d"):
+            return self._pcap()
+        raise ValueError(f"not a pcap or pcapng file (magic {magic.hex()})")
+
+    def _pcap(self) -> Iterator[Packet]:
+        mm, size = self.mm, self.size
+        e = "<" if mm[0] in (0xD4, 0x4D) else ">"
+        nano = bytes(mm[:4]) in (b"\x4d\x3c\xb2\xa1", b"\xa1\xb2\x3c\x4d")
+        linktype = struct.unpack_from(e + "I", mm, 20)[0] & 0x0FFFFFFF
+        rec = struct.Struct(e + "IIII")
+        scale = 1e-9 if nano else 1e-6
+        off = 24
+        while off + 16 <= size:
+            sec, frac, caplen, _ = rec.unpack_from(mm, off)
+            off += 16
+            if off + caplen > size:
+                break
+            yield sec + frac * scale, linktype, mm[off:off + caplen]
+            off += caplen
+            self.offset = off
+            self._release(off)
+
+    def _pcapng(self) -> Iterator[Packet]:
+        mm, size = self.mm, self.size
+        e = "<"
+        interfaces = []
+        off = 0
+        while off + 12 <= size:
+            if bytes(mm[off:off + 4]) == b"\x0a\x0d\x0d\x0a":
+                # section header: byte order magic decides endianness for the section
+                e = "<" if bytes(mm[off + 8:off + 12]) == b"\x4d\x3c\x2b\x1a" else ">"
+                interfaces = []
+            btype, blen = struct.unpack_from(e + "II", mm, off)
+            if blen < 12 or off + blen > size:
+                break
+            body = off + 8
+            if btype == 1:
+                linktype = struct.unpack_from(e + "H", mm, body)[0]
+                interfaces.append((linktype, self._tsresol(e, body + 8, off + blen - 4)))
+            elif btype == 6:
+                iface, hi, lo, caplen = struct.unpack_from(e + "IIII", mm, body)
+                linktype, scale = interfaces[iface]
+                yield ((hi << 32) | lo) * scale, linktype, mm[body + 20:body + 20 + caplen]
+            elif btype == 3 and interfaces:
+                origlen = struct.unpack_from(e + "I", mm, body)[0]
+                caplen = min(origlen, blen - 16)
+                yield 0.0, interfaces[0][0], mm[body + 4:body + 4 + caplen]
+            elif btype == 2:
+                iface, _, hi, lo, caplen = struct.unpack_from(e + "HHIII", mm, body)
+                linktype, scale = interfaces[iface]
+                yield ((hi << 32) | lo) * scale, linktype, mm[body + 20:body + 20 + caplen]
+            off += blen
+            self.offset = off
+            self._release(off)
+
+    def _tsresol(self, e: str, off: int, end: int) -> float:
+        while off + 4 <= end:
+            code, length = struct.unpack_from(e + "HH", self.mm, off)
+            if code == 0:
+                break
+            if code == 9 and length >= 1:
+                v = self.mm[off + 4]
+                return 2.0 ** -(v & 0x7F) if v & 0x80 else 10.0 ** -v
+            off += 4 + (length + 3) // 4 * 4
+        return 1e-6
+
+
+# ------------------------------------------------------------ IP / TCP
+
+Segment = Tuple[str, int, str, int, int, int, bytes]
+
+
+@functools.lru_cache(maxsize=4096)
+def _addr(raw: bytes) -> str:
+    return socket.inet_ntop(socket.AF_INET if len(raw) == 4 else socket.AF_INET6, raw)
+
+
+def tcp_segment(linktype: int, pkt: bytes) -> Optional[Segment]:
+    """(src, sport, dst, dport, seq, flags, payload) of a TCP packet, else None."""
+    if linktype == LINKTYPE_ETHERNET:
+        off, ethertype = 14, pkt[12] << 8 | pkt[13] if len(pkt) >= 14 else 0
+        while ethertype in (0x8100, 0x88A8) and len(pkt) >= off + 4:
+            ethertype = pkt[off + 2] << 8 | pkt[off + 3]
+            off += 4
+    elif linktype == LINKTYPE_LINUX_SLL:
+        off, ethertype = 16, pkt[14] << 8 | pkt[15] if len(pkt) >= 16 else 0
+    elif linktype == LINKTYPE_LINUX_SLL2:
+        off, ethertype = 20, pkt[0] << 8 | pkt[1] if len(pkt) >= 20 else 0
+    elif linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        off, ethertype = 4, 0
+    elif linktype == LINKTYPE_RAW:
+        off, ethertype = 0, 0
+    else:
+        return None
+    if ethertype == 0 and len(pkt) > off:
+        ethertype = {4: 0x0800, 6: 0x86DD}.get(pkt[off] >> 4, 0)
+
+    if ethertype == 0x0800:
+        if len(pkt) < off + 20 or pkt[off + 9] != 6:
+            return None
+        ihl = (pkt[off] & 0x0F) * 4
+        end = off + (pkt[off + 2] << 8 | pkt[off + 3])
+        src, dst = pkt[off + 12:off + 16], pkt[off + 16:off + 20]
+        off += ihl
+    elif ethertype == 0x86DD:
+        # extension headers are not followed; Thrift over IPv6 rarely has any
+        if len(pkt) < off + 40 or pkt[off + 6] != 6:
+            return None
+        end = off + 40 + (pkt[off + 4] << 8 | pkt[off + 5])
+        src, dst = pkt[off + 8:off + 24], pkt[off + 24:off + 40]
+        off += 40
+    else:
+        return None
+    if len(pkt) < off + 20:
+        return None
+    sport, dport, seq = struct.unpack_from(">HHI", pkt, off)
+    flags = pkt[off + 13]
+    data = pkt[off + (pkt[off + 12] >> 4) * 4:min(end, len(pkt))]
+    return _addr(src), sport, _addr(dst), dport, seq, flags, data
+
+
+def _after(a: int, b: int) -> int:
+    """Signed distance from sequence number b to a, modulo 2^32."""
+    return (a - b + 0x80000000) % 0x100000000 - 0x80000000
+
+
+class TcpStream:
+    """One direction of a connection: in-order bytes cut into Thrift frames."""
+
+    __slots__ = ("next_seq", "buf", "held", "held_bytes", "synced", "last_ts")
+
+    def __init__(self):
+        self.next_seq: Optional[int] = None
+        self.buf = bytearray()
+        self.held: Dict[int, bytes] = {}
+        self.held_bytes = 0
+        self.synced = False
+        self.last_ts = 0.0
+
+    def add(self, seq: int, data: bytes, max_held: int) -> None:
+        d = _after(seq, self.next_seq)
+        if d < 0:
+            # retransmission, possibly with new bytes on the end
+            if -d >= len(data):
+                return
+            data, d = data[-d:], 0
+        if d > 0:
+            if seq not in self.held:
+                self.held[seq] = data
+                self.held_bytes += len(data)
+            if self.held_bytes > max_held:
+                # give up on the gap: resume at the earliest held segment
+                self.next_seq = min(self.held, key=lambda s: _after(s, self.next_seq))
+                self.buf.clear()
+                self.synced = False
+                self._drain()
+            return
+        self.buf += data
+        self.next_seq = (self.next_seq + len(data)) & 0xFFFFFFFF
+        if self.held:
+            self._drain()
+
+    def _drain(self) -> None:
+        while self.held:
+            seq = min(self.held, key=lambda s: _after(s, self.next_seq))
+            d = _after(seq, self.next_seq)
+            if d > 0:
+                return
+            data = self.held.pop(seq)
+            self.held_bytes -= len(data)
+            if -d < len(data):
+                self.buf += data[-d:]
+                self.next_seq = (self.next_seq + len(data) + d) & 0xFFFFFFFF
+
+    def frames(self, max_frame: int) -> Iterator[bytes]:
+        buf = self.buf
+        off = 0
+        while len(buf) - off >= 12:
+            n = int.from_bytes(buf[off:off + 4], "big")
+            if not (self.synced or _looks_like_message(buf, off + 4, n)) or n > max_frame:
+                # not at a frame boundary: skip to the next strict header
+                i = buf.find(b"\x80\x01\x00", off + 5)
+                if i < 0:
+                    off = max(off, len(buf) - 7)
+                    break
+                off = i - 4
+                self.synced = False
+                continue
+            if len(buf) - off - 4 < n:
+                break
+            self.synced = True
+            yield bytes(buf[off + 4:off + 4 + n])
+            off += 4 + n
+        del buf[:off]
+
+
+def _looks_like_message(buf, off: int, n: int) -> bool:
+    if n < 8:
+        return False
+    if buf[off] == 0x80 and buf[off + 1] == 0x01 and 1 <= buf[off + 3] <= 4:
+        return True
+    name_len = int.from_bytes(buf[off:off + 4], "big")
+    return 0 < name_len <= min(256, n - 9) and len(buf) > off + 4 + name_len and 1 <= buf[off + 4 + name_len] <= 4
+
+
+class Reassembler:
+    """TCP streams keyed by direction, least recently used evicted past max_streams."""
+
+    def __init__(self, max_streams: int = 4096, max_held: int = 1 << 20, max_frame: int = 16 << 20):
+        self.streams: "OrderedDict[tuple, TcpStream]" = OrderedDict()
+        self.max_streams, self.max_held, self.max_frame = max_streams, max_held, max_frame
+        self.evicted = 0
+
+    def feed(self, ts: float, seg: Segment) -> Iterator[Tuple[tuple, bytes]]:
+        src, sport, dst, dport, seq, flags, data = seg
+        key = (src, sport, dst, dport)
+        stream = self.streams.get(key)
+        if flags & TCP_SYN or stream is None:
+            if stream is None and not data and not flags & (TCP_SYN | TCP_FIN | TCP_RST):
+                # a bare ACK says nothing about where the data starts
+                return
+            stream = self.streams[key] = TcpStream()
+            stream.next_seq = (seq + 1) & 0xFFFFFFFF if flags & TCP_SYN else seq
+            stream.synced = bool(flags & TCP_SYN)
+            if len(self.streams) > self.max_streams:
+                self.streams.popitem(last=False)
+                self.evicted += 1
+        else:
+            self.streams.move_to_end(key)
+        stream.last_ts = ts
+        if data:
+            stream.add(seq, data, self.max_held)
+            for frame in stream.frames(self.max_frame):
+                yield key, frame
+        if flags & (TCP_FIN | TCP_RST):
+            del self.streams[key]
+
+
+# ------------------------------------------------------------ decoding
+
+class Stats:
+    def __init__(self):
+        self.packets = self.segments = self.frames = self.errors = 0
+
+
+def records(path: str, codec: Codec, port: Optional[int] = None, stats: Optional[Stats] = None,
+            **limits) -> Iterator[dict]:
+    """Decoded messages from a capture, in capture order."""
+    stats = stats or Stats()
+    asm = Reassembler(**limits)
+    with CaptureReader(path) as reader:
+        for ts, linktype, pkt in reader:
+            stats.packets += 1
+            seg = tcp_segment(linktype, pkt)
+            if seg is None or (port is not None and port not in (seg[1], seg[3])):
+                continue
+            stats.segments += 1
+            for (src, sport, dst, dport), frame in asm.feed(ts, seg):
+                stats.frames += 1
+                rec = {"ts": round(ts, 6), "src": f"{src}:{sport}", "dst": f"{dst}:{dport}"}
+                try:
+                    rec.update(codec.decode(frame))
+                except Exception as e:
+                    stats.errors += 1
+                    rec.update({"type": "error", "error": f"{type(e).__name__}: {e}", "len": len(frame)})
+                yield rec
+
+
+def _json_default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    return repr(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thrift calls/replies from a pcap or pcapng as JSONL")
+    parser.add_argument("capture", nargs="?", default=os.path.join(HERE, "capture.pcap"))
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (default stdout)")
+    parser.add_argument("--idl", default=os.path.join(HERE, "capture.thrift"),
+                        help="IDL for decoding (default: the schema seen in capture.pcap)")
+    parser.add_argument("--port", type=int, default=None, help="Only TCP traffic to/from this port")
+    parser.add_argument("--max-streams", type=int, default=4096)
+    parser.add_argument("--max-held", type=int, default=1 << 20, help="Out-of-order bytes held per stream")
+    parser.add_argument("--max-frame", type=int, default=16 << 20)
+    parser.add_argument("--bench", action="store_true", help="Discard output, report MB/s and peak RSS")
+    args = parser.parse_args()
+
+    codec = Codec(IDL.load(args.idl))
+    stats = Stats()
+    limits = dict(max_streams=args.max_streams, max_held=args.max_held, max_frame=args.max_frame)
+    if args.bench:
+        out = open(os.devnull, "w")
+    elif args.output == "-":
+        out = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", write_through=False)
+    else:
+        out = open(args.output, "w", encoding="utf-8")
+
+    t0 = time.perf_counter()
+    dumps = json.JSONEncoder(ensure_ascii=False, default=_json_default).encode
+    try:
+        for rec in records(args.capture, codec, args.port, stats, **limits):
+            out.write(dumps(rec))
+            out.write("\n")
+        out.flush()
+    except BrokenPipeError:
+        # reader went away (e.g. piped into head)
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return
+    elapsed = time.perf_counter() - t0
+
+    size = os.path.getsize(args.capture)
+    if args.bench:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{size / 1e6:.1f} MB in {elapsed:.2f}s: {size / 1e6 / elapsed:.1f} MB/s, "
+              f"{stats.packets / elapsed:.0f} packets/s, {stats.frames} frames, "
+              f"{stats.errors} decode errors, peak RSS {rss:.1f} MB", file=sys.stderr)
+    elif stats.errors:
+        print(f"{stats.frames} frames, {stats.errors} could not be decoded", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
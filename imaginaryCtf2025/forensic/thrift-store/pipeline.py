@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Pipelined Thrift clients for the thrift-store service.
+#
+# Calls are written back to back on one framed connection without waiting,
+# each with its own seqid, and replies are matched to calls by seqid as
+# they arrive. Filling a basket with N items or sweeping N pay() totals
+# then costs about one round trip instead of N.
+#
+# The live server speaks the schema seen in capture.pcap (capture.thrift,
+# results wrapped in structs); store_server.py speaks store.thrift. main()
+# picks capture.thrift unless the host is loopback; --idl overrides it.
+#
+# Usage:
+#   python3 pipeline.py [host] [port] --items a b c --totals 0 -1 ... [--idl capture.thrift]
+
+import os
+import socket
+import struct
+import asyncio
+import argparse
+import itertools
+import ipaddress
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from tbinary import Codec, IDL, Reply, DEFAULT_IDL
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CAPTURE_IDL = os.path.join(HERE, "capture.thrift")
+
+_u32 = struct.Struct(">I")
+
+
+def _seqids():
+    # positive i32 seqids, unique per connection
+    return itertools.count(1)
+
+
+class PipelinedClient:
+    """Blocking client: queue calls with submit(), then collect replies."""
+
+    def __init__(self, host: str, port: int, codec: Optional[Codec] = None,
+                 timeout: float = 5.0, strict: bool = True):
+        self.codec = codec or Codec()
+        self.strict = strict
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._seq = _seqids()
+        self._out = bytearray()
+        self._in = bytearray()
+        self._pending: Dict[int, str] = {}
+        self._replies: Dict[int, Reply] = {}
+
+    def submit(self, method: str, *args, **kwargs) -> int:
+        """Queue a call; returns its seqid. Nothing is sent until flush()."""
+        seqid = next(self._seq)
+        self._out += self.codec.encode_call(method, seqid, *args, strict=self.strict, **kwargs)
+        self._pending[seqid] = method
+        return seqid
+
+    def flush(self) -> None:
+        if self._out:
+            self.sock.sendall(self._out)
+            self._out.clear()
+
+    def _read_frame(self) -> bytes:
+        while True:
+            if len(self._in) >= 4:
+                n = _u32.unpack_from(self._in)[0]
+                if len(self._in) >= 4 + n:
+                    frame = bytes(self._in[4:4 + n])
+                    del self._in[:4 + n]
+                    return frame
+            chunk = self.sock.recv(1 << 16)
+            if not chunk:
+                raise ConnectionError("server closed the connection")
+            self._in += chunk
+
+    def result(self, seqid: int) -> Reply:
+        """Reply for `seqid`, reading (and stashing) other replies on the way."""
+        self.flush()
+        while seqid not in self._replies:
+            if seqid not in self._pending:
+                raise KeyError(f"no call with seqid {seqid} is outstanding")
+            reply = self.codec.decode_reply(self._read_frame())
+            if self._pending.pop(reply.seqid, None) is None:
+                raise ConnectionError(f"reply for unknown seqid {reply.seqid}")
+            self._replies[reply.seqid] = reply
+        return self._replies.pop(seqid)
+
+    def call(self, method: str, *args, **kwargs) -> Reply:
+        return self.result(self.submit(method, *args, **kwargs))
+
+    def call_many(self, calls: Iterable[Tuple[str, tuple]]) -> List[Reply]:
+        """Pipeline every (method, args) call, return replies in call order."""
+        seqids = [self.submit(method, *args) for method, args in calls]
+        self.flush()
+        return [self.result(s) for s in seqids]
+
+    def close(self) -> None:
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncPipelinedClient:
+    """asyncio client: every call() is a future resolved by a reader task."""
+
+    def __init__(self, codec: Optional[Codec] = None, strict: bool = True):
+        self.codec = codec or Codec()
+        self.strict = strict
+        self._seq = _seqids()
+        self._waiters: Dict[int, asyncio.Future] = {}
+        self._reader = self._writer = self._task = None
+        self._error: Optional[BaseException] = None
+
+    @classmethod
+    async def connect(cls, host: str, port: int, **kwargs) -> "AsyncPipelinedClient":
+        self = cls(**kwargs)
+        self._reader, self._writer = await asyncio.open_connection(host, port)
+        self._task = asyncio.get_running_loop().create_task(self._read_loop())
+        return self
+
+    async def _read_loop(self) -> None:
+        try:
+            while True:
+                n = _u32.unpack(await self._reader.readexactly(4))[0]
+                reply = self.codec.decode_reply(await self._reader.readexactly(n))
+                fut = self._waiters.pop(reply.seqid, None)
+                if fut is not None and not fut.done():
+                    fut.set_result(reply)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            err = ConnectionError(f"connection lost: {e}")
+        except Exception as e:
+            err = e
+        # kept so calls made after this point fail instead of waiting forever
+        self._error = err
+        for fut in self._waiters.values():
+            if not fut.done():
+                fut.set_exception(err)
+        self._waiters.clear()
+
+    async def call(self, method: str, *args, **kwargs) -> Reply:
+        if self._error is not None:
+            raise self._error
+        seqid = next(self._seq)
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters[seqid] = fut
+        # no drain per call: writes coalesce in the transport buffer
+        self._writer.write(self.codec.encode_call(method, seqid, *args, strict=self.strict, **kwargs))
+        return await fut
+
+    async def call_many(self, calls: Iterable[Tuple[str, tuple]]) -> List[Reply]:
+        return await asyncio.gather(*(self.call(method, *args) for method, args in calls))
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            await self._task
+
+
+def fill_and_sweep(client: PipelinedClient, items: List[str], totals: List[int]):
+    """Create a basket, add every item and try every total in two windows."""
+    basket = client.call("createBasket")
+    if basket.exception:
+        raise RuntimeError(f"createBasket: {basket.exception}")
+    basket_id = basket.success
+    if isinstance(basket_id, dict):
+        # capture.thrift: Basket {1: id}
+        basket_id = basket_id.get("id")
+    if not isinstance(basket_id, str):
+        # e.g. a server whose schema differs from the codec's IDL
+        raise RuntimeError(f"createBasket returned no basket id ({basket.success!r})")
+    added = client.call_many(("addToBasket", (basket_id, slug)) for slug in items)
+    paid = client.call_many(("pay", (basket_id, t)) for t in totals)
+    return basket_id, added, paid
+
+
+def default_idl(host: str) -> str:
+    """store.thrift for a local store_server.py, else the live server's schema."""
+    if host == "localhost":
+        return DEFAULT_IDL
+    try:
+        return DEFAULT_IDL if ipaddress.ip_address(host).is_loopback else CAPTURE_IDL
+    except ValueError:
+        return CAPTURE_IDL
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipelined basket filler / pay sweeper")
+    parser.add_argument("host", nargs="?", default="thrift-store.chal.imaginaryctf.org")
+    parser.add_argument("port", nargs="?", type=int, default=9090)
+    parser.add_argument("--items", nargs="*", default=["cheddar-cheese-200g", "tomatoes-500g"])
+    parser.add_argument("--totals", nargs="*", type=int,
+                        default=[0, 1, -1, (1 << 31) - 1, -(1 << 31), (1 << 63) - 1, -(1 << 63)])
+    parser.add_argument("--idl", default=None,
+                        help="Wire schema (default: store.thrift on loopback, else capture.thrift)")
+    args = parser.parse_args()
+
+    codec = Codec(IDL.load(args.idl or default_idl(args.host)))
+    with PipelinedClient(args.host, args.port, codec=codec) as client:
+        basket, added, paid = fill_and_sweep(client, args.items, args.totals)
+    print(f"Basket: {basket}")
+    for slug, r in zip(args.items, added):
+        print(f"addToBasket({slug}) -> {'exception: ' + r.exception if r.exception else 'ok'}")
+    for total, r in zip(args.totals, paid):
+        print(f"pay(total={total}) -> {'exception: ' + r.exception if r.exception else r.success}")
+
+
+if __name__ == "__main__":
+    main()
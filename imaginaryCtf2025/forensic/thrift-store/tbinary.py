@@ -0,0 +1,625 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Thrift TBinaryProtocol codec driven by a .thrift IDL (store.thrift by
+# default). Decoding works on a memoryview with struct.unpack_from, so no
+# slice of the packet is copied except the final string values, and any
+# field the IDL does not describe is skipped recursively, containers
+# included.
+
+import os
+import re
+import struct
+from collections import namedtuple
+from typing import Dict, Optional, Tuple
+
+
+# Thrift constants
+T_CALL = 1
+T_REPLY = 2
+T_EXCEPTION = 3
+T_ONEWAY = 4
+
+T_STOP = 0
+T_VOID = 1
+T_BOOL = 2
+T_BYTE = 3
+T_DOUBLE = 4
+T_I16 = 6
+T_I32 = 8
+T_I64 = 10
+T_STRING = 11
+T_STRUCT = 12
+T_MAP = 13
+T_SET = 14
+T_LIST = 15
+
+VERSION_1 = 0x80010000
+
+# wire size of the fixed-width types, used to skip whole containers at once
+FIXED_SIZE = {T_BOOL: 1, T_BYTE: 1, T_I16: 2, T_I32: 4, T_I64: 8, T_DOUBLE: 8}
+
+BASE_TYPES = {
+    "bool": T_BOOL, "byte": T_BYTE, "i8": T_BYTE, "i16": T_I16, "i32": T_I32,
+    "i64": T_I64, "double": T_DOUBLE, "string": T_STRING, "binary": T_STRING,
+    "void": T_VOID,
+}
+
+DEFAULT_IDL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "store.thrift")
+
+_i8 = struct.Struct(">b")
+_i16 = struct.Struct(">h")
+_i32 = struct.Struct(">i")
+_u32 = struct.Struct(">I")
+_i64 = struct.Struct(">q")
+_dbl = struct.Struct(">d")
+_field = struct.Struct(">bh")
+_elem = struct.Struct(">bi")
+_kv = struct.Struct(">bbi")
+
+Reply = namedtuple("Reply", "name mtype seqid success exception")
+
+
+class ThriftDecodeError(Exception):
+    pass
+
+
+# what a truncated buffer raises part way through a value
+_TRUNCATED = (IndexError, struct.error, RecursionError)
+
+
+class StructSpec:
+    """Fields of one struct: fid -> (name, type); `type` is a type tuple."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.fields: Dict[int, Tuple[str, tuple]] = {}
+        self.by_name: Dict[str, Tuple[int, tuple]] = {}
+        self._decoder = None
+
+    def add(self, fid: int, name: str, ttype: tuple) -> None:
+        self.fields[fid] = (name, ttype)
+        self.by_name[name] = (fid, ttype)
+        self._decoder = None
+
+    def decoder(self):
+        """decode(buf, off) -> (dict, off), generated for this struct's fields."""
+        if self._decoder is None:
+            self._decoder = _compile_decoder(self)
+        return self._decoder
+
+
+# Type tuples: (T_I32,), (T_LIST, elem), (T_SET, elem), (T_MAP, key, value),
+# (T_STRUCT, StructSpec)
+APP_EXCEPTION = StructSpec("TApplicationException")
+APP_EXCEPTION.add(1, "message", (T_STRING,))
+APP_EXCEPTION.add(2, "type", (T_I32,))
+
+
+class Function:
+    def __init__(self, name: str, returns: tuple, args: StructSpec, result: StructSpec, oneway: bool):
+        self.name = name
+        self.returns = returns
+        self.args = args
+        self.result = result
+        self.oneway = oneway
+
+
+class IDL:
+    """Structs and service functions parsed from a .thrift file."""
+
+    _TOKEN = re.compile(r'"[^"]*"|\'[^\']*\'|[A-Za-z_][\w.]*|-?\d+|[{}()<>,;:=\[\]]')
+
+    def __init__(self, text: str):
+        self.structs: Dict[str, StructSpec] = {}
+        self.typedefs: Dict[str, tuple] = {}
+        self.functions: Dict[str, Function] = {}
+        text = re.sub(r"/\*.*?\*/", " ", text, flags=re.S)
+        text = re.sub(r"(//|#)[^\n]*", " ", text)
+        self._toks = self._TOKEN.findall(text)
+        self._pos = 0
+        self._parse()
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_IDL) -> "IDL":
+        with open(path, "r") as f:
+            return cls(f.read())
+
+    def _next(self) -> str:
+        tok = self._toks[self._pos]
+        self._pos += 1
+        return tok
+
+    def _peek(self) -> Optional[str]:
+        return self._toks[self._pos] if self._pos < len(self._toks) else None
+
+    def _expect(self, tok: str) -> None:
+        got = self._next()
+        if got != tok:
+            raise ValueError(f"IDL: expected {tok!r}, got {got!r}")
+
+    def _struct(self, name: str) -> StructSpec:
+        return self.structs.setdefault(name, StructSpec(name))
+
+    def _type(self) -> tuple:
+        name = self._next()
+        if name in ("list", "set"):
+            self._expect("<")
+            elem = self._type()
+            self._expect(">")
+            return (T_LIST if name == "list" else T_SET, elem)
+        if name == "map":
+            self._expect("<")
+            key = self._type()
+            self._expect(",")
+            value = self._type()
+            self._expect(">")
+            return (T_MAP, key, value)
+        if name in BASE_TYPES:
+            return (BASE_TYPES[name],)
+        if name in self.typedefs:
+            return self.typedefs[name]
+        return (T_STRUCT, self._struct(name))
+
+    def _fields(self, spec: StructSpec, close: str) -> None:
+        auto = 0
+        while self._peek() != close:
+            tok = self._next()
+            if tok in (",", ";"):
+                continue
+            if self._peek() == ":":
+                fid = int(tok)
+                self._next()
+                tok = self._next()
+            else:
+                auto -= 1
+                fid = auto
+            if tok in ("required", "optional"):
+                tok = self._next()
+            self._pos -= 1
+            ttype = self._type()
+            spec.add(fid, self._next(), ttype)
+            if self._peek() == "=":
+                # default value; a single token is enough for this IDL
+                self._next()
+                self._next()
+        self._next()
+
+    def _parse(self) -> None:
+        while self._peek() is not None:
+            tok = self._next()
+            if tok in ("namespace", "include", "cpp_include"):
+                self._next()
+                if tok == "namespace":
+                    self._next()
+            elif tok in ("struct", "union", "exception"):
+                spec = self._struct(self._next())
+                self._expect("{")
+                self._fields(spec, "}")
+            elif tok == "typedef":
+                ttype = self._type()
+                self.typedefs[self._next()] = ttype
+            elif tok == "enum":
+                self.typedefs[self._next()] = (T_I32,)
+                self._expect("{")
+                while self._next() != "}":
+                    pass
+            elif tok == "service":
+                self._next()
+                if self._peek() == "extends":
+                    self._next()
+                    self._next()
+                self._expect("{")
+                self._service()
+
+    def _service(self) -> None:
+        while True:
+            tok = self._peek()
+            if tok == "}":
+                self._next()
+                return
+            if tok in (",", ";"):
+                self._next()
+                continue
+            oneway = tok == "oneway"
+            if oneway:
+                self._next()
+            returns = self._type()
+            name = self._next()
+            args = StructSpec(f"{name}_args")
+            self._expect("(")
+            self._fields(args, ")")
+            result = StructSpec(f"{name}_result")
+            if returns[0] != T_VOID:
+                result.add(0, "success", returns)
+            if self._peek() == "throws":
+                self._next()
+                self._expect("(")
+                self._fields(result, ")")
+            self.functions[name] = Function(name, returns, args, result, oneway)
+
+
+# ---------------------------------------------------------------- decoding
+
+def _overrun(buf, off: int, n: int):
+    raise ThriftDecodeError(f"length {n} at offset {off} runs past the end of a {len(buf)} byte message")
+
+
+def _check(buf, off: int, n: int) -> None:
+    # lengths and counts come off the wire: a negative one would move `off`
+    # backwards and loop forever, a huge one read past the end
+    if n < 0 or off + n > len(buf):
+        _overrun(buf, off, n)
+
+
+def skip(buf, off: int, ttype: int) -> int:
+    """Offset just past one value of wire type `ttype` at `off`."""
+    size = FIXED_SIZE.get(ttype)
+    if size is not None:
+        return off + size
+    if ttype == T_STRING:
+        n = _i32.unpack_from(buf, off)[0]
+        _check(buf, off + 4, n)
+        return off + 4 + n
+    if ttype == T_STRUCT:
+        while True:
+            ftype = buf[off]
+            if ftype == T_STOP:
+                return off + 1
+            off = skip(buf, off + 3, ftype)
+    if ttype == T_MAP:
+        ktype, vtype, count = _kv.unpack_from(buf, off)
+        off += 6
+        ks, vs = FIXED_SIZE.get(ktype), FIXED_SIZE.get(vtype)
+        if ks is not None and vs is not None:
+            _check(buf, off, count * (ks + vs))
+            return off + count * (ks + vs)
+        # every element takes at least one byte
+        _check(buf, off, count)
+        for _ in range(count):
+            off = skip(buf, skip(buf, off, ktype), vtype)
+        return off
+    if ttype in (T_LIST, T_SET):
+        etype, count = _elem.unpack_from(buf, off)
+        off += 5
+        size = FIXED_SIZE.get(etype)
+        if size is not None:
+            _check(buf, off, count * size)
+            return off + count * size
+        _check(buf, off, count)
+        for _ in range(count):
+            off = skip(buf, off, etype)
+        return off
+    raise ThriftDecodeError(f"cannot skip unknown type {ttype} at offset {off}")
+
+
+_i8_from = _i8.unpack_from
+_i16_from = _i16.unpack_from
+_i32_from = _i32.unpack_from
+_i64_from = _i64.unpack_from
+_dbl_from = _dbl.unpack_from
+
+
+def _read_string(buf, off, spec=None):
+    n = _i32_from(buf, off)[0]
+    off += 4
+    if n < 0 or off + n > len(buf):
+        _overrun(buf, off, n)
+    return str(buf[off:off + n], "utf-8", "replace"), off + n
+
+
+def _read_i64(buf, off, spec=None):
+    return _i64_from(buf, off)[0], off + 8
+
+
+def _read_i32(buf, off, spec=None):
+    return _i32_from(buf, off)[0], off + 4
+
+
+def _read_i16(buf, off, spec=None):
+    return _i16_from(buf, off)[0], off + 2
+
+
+def _read_byte(buf, off, spec=None):
+    return _i8_from(buf, off)[0], off + 1
+
+
+def _read_bool(buf, off, spec=None):
+    return buf[off] != 0, off + 1
+
+
+def _read_double(buf, off, spec=None):
+    return _dbl_from(buf, off)[0], off + 8
+
+
+def _read_struct_value(buf, off, spec=None):
+    return read_struct(buf, off, spec[1] if spec is not None and spec[0] == T_STRUCT else None)
+
+
+def _read_list(buf, off, spec=None):
+    etype, count = _elem.unpack_from(buf, off)
+    off += 5
+    _check(buf, off, count)
+    espec = spec[1] if spec is not None and spec[0] in (T_LIST, T_SET) and spec[1][0] == etype else None
+    out = []
+    append = out.append
+    if espec is not None and etype == T_STRUCT:
+        # list<SomeStruct>: call the generated decoder directly
+        decode = espec[1].decoder()
+        for _ in range(count):
+            value, off = decode(buf, off)
+            append(value)
+        return out, off
+    reader = _reader(etype, off)
+    for _ in range(count):
+        value, off = reader(buf, off, espec)
+        append(value)
+    return out, off
+
+
+def _read_map(buf, off, spec=None):
+    ktype, vtype, count = _kv.unpack_from(buf, off)
+    off += 6
+    _check(buf, off, count)
+    ok = spec is not None and spec[0] == T_MAP
+    kspec = spec[1] if ok and spec[1][0] == ktype else None
+    vspec = spec[2] if ok and spec[2][0] == vtype else None
+    kread, vread = _reader(ktype, off), _reader(vtype, off)
+    out = {}
+    for _ in range(count):
+        key, off = kread(buf, off, kspec)
+        out[key], off = vread(buf, off, vspec)
+    return out, off
+
+
+_READERS = {
+    T_STRING: _read_string, T_I64: _read_i64, T_I32: _read_i32, T_I16: _read_i16,
+    T_BYTE: _read_byte, T_BOOL: _read_bool, T_DOUBLE: _read_double,
+    T_STRUCT: _read_struct_value, T_LIST: _read_list, T_SET: _read_list, T_MAP: _read_map,
+}
+
+
+def _reader(ttype: int, off: int):
+    try:
+        return _READERS[ttype]
+    except KeyError:
+        raise ThriftDecodeError(f"cannot read unknown type {ttype} at offset {off}") from None
+
+
+def read_value(buf, off: int, ttype: int, spec: Optional[tuple] = None):
+    """(value, new offset). `spec` is the IDL type tuple; without it
+    structs decode to {fid: value} dicts."""
+    try:
+        return _reader(ttype, off)(buf, off, spec)
+    except _TRUNCATED as e:
+        raise ThriftDecodeError(f"truncated value at offset {off}: {e}") from None
+
+
+def read_struct(buf, off: int, spec: Optional[StructSpec]):
+    """Fields named per `spec`; unknown or mistyped fields are skipped.
+    Without a spec every field is kept, keyed by field id."""
+    start = off
+    out = {}
+    try:
+        if spec is None:
+            while True:
+                ftype = buf[off]
+                if ftype == T_STOP:
+                    return out, off + 1
+                fid = _i16_from(buf, off + 1)[0]
+                out[fid], off = read_value(buf, off + 3, ftype)
+        return spec.decoder()(buf, off)
+    except _TRUNCATED as e:
+        raise ThriftDecodeError(f"truncated struct at offset {start}: {e}") from None
+
+
+# Inline readers for the generated struct decoders; `{v}` is the target.
+_INLINE = {
+    T_STRING: ("n = _i32_from(buf, off)[0]\n"
+               "off += 4\n"
+               "if n < 0 or off + n > len(buf):\n"
+               "    _overrun(buf, off, n)\n"
+               "{v} = str(buf[off:off + n], 'utf-8', 'replace')\n"
+               "off += n"),
+    T_I64: "{v} = _i64_from(buf, off)[0]\noff += 8",
+    T_I32: "{v} = _i32_from(buf, off)[0]\noff += 4",
+    T_I16: "{v} = _i16_from(buf, off)[0]\noff += 2",
+    T_BYTE: "{v} = _i8_from(buf, off)[0]\noff += 1",
+    T_BOOL: "{v} = buf[off] != 0\noff += 1",
+    T_DOUBLE: "{v} = _dbl_from(buf, off)[0]\noff += 8",
+}
+
+
+def _compile_decoder(spec: StructSpec):
+    # One if/elif branch per (type, fid) pair, so decoding a known field is
+    # a couple of comparisons and an unpack, with no dispatch per field.
+    lines = [
+        "def decode(buf, off):",
+        "    out = {}",
+        "    while True:",
+        "        ftype = buf[off]",
+        "        if ftype == 0:",
+        "            return out, off + 1",
+        "        fid = _i16_from(buf, off + 1)[0]",
+        "        off += 3",
+    ]
+    env = {"_i8_from": _i8_from, "_i16_from": _i16_from, "_i32_from": _i32_from,
+           "_i64_from": _i64_from, "_dbl_from": _dbl_from, "skip": skip,
+           "_overrun": _overrun}
+    branch = "if"
+    for i, (fid, (name, ttype)) in enumerate(sorted(spec.fields.items())):
+        lines.append(f"        {branch} fid == {fid} and ftype == {ttype[0]}:")
+        target = f"out[{name!r}]"
+        if ttype[0] in _INLINE:
+            body = _INLINE[ttype[0]].format(v=target)
+        else:
+            env[f"_r{i}"], env[f"_t{i}"] = _READERS[ttype[0]], ttype
+            body = f"{target}, off = _r{i}(buf, off, _t{i})"
+        lines += ["            " + line for line in body.splitlines()]
+        branch = "elif"
+    if spec.fields:
+        lines += ["        else:", "            off = skip(buf, off, ftype)"]
+    else:
+        lines += ["        off = skip(buf, off, ftype)"]
+    exec(compile("\n".join(lines), f"<thrift decoder {spec.name}>", "exec"), env)
+    return env["decode"]
+
+
+def read_message_begin(buf, off: int = 0) -> Tuple[str, int, int, int]:
+    """(name, mtype, seqid, offset of the body); strict or loose headers."""
+    try:
+        first = _i32.unpack_from(buf, off)[0]
+        if first < 0:
+            if first & 0xFFFF0000 != VERSION_1:
+                raise ThriftDecodeError(f"bad message version {first & 0xFFFFFFFF:#x}")
+            mtype = first & 0xFF
+            n = _i32.unpack_from(buf, off + 4)[0]
+            off += 8
+            _check(buf, off, n)
+            name = str(buf[off:off + n], "utf-8", "replace")
+            off += n
+        else:
+            # loose: name length, name, type byte
+            off += 4
+            _check(buf, off, first)
+            name = str(buf[off:off + first], "utf-8", "replace")
+            off += first
+            mtype = buf[off]
+            off += 1
+        seqid = _i32.unpack_from(buf, off)[0]
+    except _TRUNCATED as e:
+        raise ThriftDecodeError(f"truncated message header: {e}") from None
+    return name, mtype, seqid, off + 4
+
+
+# ---------------------------------------------------------------- encoding
+
+def write_value(out: bytearray, ttype: tuple, value) -> None:
+    t = ttype[0]
+    if t == T_STRING:
+        b = value if isinstance(value, (bytes, bytearray)) else str(value).encode("utf-8")
+        out += _i32.pack(len(b))
+        out += b
+    elif t == T_I64:
+        out += _i64.pack(value)
+    elif t == T_I32:
+        out += _i32.pack(value)
+    elif t == T_I16:
+        out += _i16.pack(value)
+    elif t == T_BYTE:
+        out += _i8.pack(value)
+    elif t == T_BOOL:
+        out.append(1 if value else 0)
+    elif t == T_DOUBLE:
+        out += _dbl.pack(value)
+    elif t == T_STRUCT:
+        write_struct(out, ttype[1], value)
+    elif t in (T_LIST, T_SET):
+        values = list(value)
+        out += _elem.pack(ttype[1][0], len(values))
+        for v in values:
+            write_value(out, ttype[1], v)
+    elif t == T_MAP:
+        out += _kv.pack(ttype[1][0], ttype[2][0], len(value))
+        for k, v in value.items():
+            write_value(out, ttype[1], k)
+            write_value(out, ttype[2], v)
+    else:
+        raise ValueError(f"cannot write type {t}")
+
+
+def write_struct(out: bytearray, spec: StructSpec, value) -> None:
+    """`value` is a dict keyed by field name, or any object with those attributes."""
+    get = value.get if isinstance(value, dict) else (lambda k: getattr(value, k, None))
+    for fid, (name, ttype) in spec.fields.items():
+        v = get(name)
+        if v is None:
+            continue
+        out += _field.pack(ttype[0], fid)
+        write_value(out, ttype, v)
+    out.append(T_STOP)
+
+
+def message_begin(name: str, mtype: int, seqid: int, strict: bool = True) -> bytearray:
+    b = name.encode("utf-8")
+    if strict:
+        return bytearray(_u32.pack(VERSION_1 | mtype) + _i32.pack(len(b)) + b + _i32.pack(seqid))
+    return bytearray(_i32.pack(len(b)) + b + bytes([mtype]) + _i32.pack(seqid))
+
+
+def frame(payload) -> bytes:
+    return _u32.pack(len(payload)) + bytes(payload)
+
+
+def _buffer(buf):
+    # bytes are walked in place; anything else (bytearray, mmap, slices of a
+    # larger buffer) through a memoryview, so nothing is copied up front
+    return buf if isinstance(buf, (bytes, memoryview)) else memoryview(buf)
+
+
+class Codec:
+    """Encode calls/replies and decode them for the services in an IDL."""
+
+    def __init__(self, idl: Optional[IDL] = None):
+        self.idl = idl or IDL.load()
+
+    def function(self, name: str) -> Function:
+        try:
+            return self.idl.functions[name]
+        except KeyError:
+            raise ValueError(f"unknown method {name!r}") from None
+
+    def encode_call(self, method: str, seqid: int, *args, strict: bool = True,
+                    framed: bool = True, **kwargs) -> bytes:
+        fn = self.function(method)
+        names = [name for _, (name, _) in sorted(fn.args.fields.items())]
+        kwargs.update(zip(names, args))
+        out = message_begin(method, T_ONEWAY if fn.oneway else T_CALL, seqid, strict)
+        write_struct(out, fn.args, kwargs)
+        return frame(out) if framed else bytes(out)
+
+    def encode_reply(self, method: str, seqid: int, success=None, exception: Optional[str] = None,
+                     strict: bool = True, framed: bool = True) -> bytes:
+        """A T_REPLY with `success`, or a TApplicationException carrying `exception`."""
+        if exception is not None:
+            out = message_begin(method, T_EXCEPTION, seqid, strict)
+            write_struct(out, APP_EXCEPTION, {"message": exception, "type": 0})
+        else:
+            out = message_begin(method, T_REPLY, seqid, strict)
+            write_struct(out, self.function(method).result, {"success": success})
+        return frame(out) if framed else bytes(out)
+
+    def decode_call(self, buf) -> Tuple[str, int, int, dict]:
+        """(name, mtype, seqid, args by name) from an unframed message."""
+        buf = _buffer(buf)
+        name, mtype, seqid, off = read_message_begin(buf)
+        fn = self.idl.functions.get(name)
+        args, _ = read_struct(buf, off, fn.args if fn else None)
+        return name, mtype, seqid, args
+
+    def decode_reply(self, buf) -> Reply:
+        """Reply from an unframed message; `exception` is the message of a
+        TApplicationException or of a declared exception field."""
+        buf = _buffer(buf)
+        name, mtype, seqid, off = read_message_begin(buf)
+        if mtype == T_EXCEPTION:
+            exc, _ = read_struct(buf, off, APP_EXCEPTION)
+            return Reply(name, mtype, seqid, None, exc.get("message") or "TApplicationException")
+        fn = self.idl.functions.get(name)
+        result, _ = read_struct(buf, off, fn.result if fn else None)
+        success = result.pop("success" if fn else 0, None)
+        exception = None
+        for value in result.values():
+            exception = str(value.get("message", value)) if isinstance(value, dict) else str(value)
+        return Reply(name, mtype, seqid, success, exception)
+
+    def decode(self, buf):
+        """Call or reply, whichever the message type says: a dict for JSON output."""
+        buf = _buffer(buf)
+        name, mtype, seqid, _ = read_message_begin(buf)
+        if mtype in (T_CALL, T_ONEWAY):
+            _, _, _, args = self.decode_call(buf)
+            return {"type": "call", "method": name, "seqid": seqid, "args": args}
+        reply = self.decode_reply(buf)
+        return {"type": "reply" if mtype == T_REPLY else "exception", "method": name,
+                "seqid": seqid, "success": reply.success, "exception": reply.exception}
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# store_server.py runs every connection on one selector loop, so a hostile
+# frame must only cost its own connection.
+#
+# Usage: python3 -m pytest test_store_server.py
+
+import time
+import socket
+import struct
+
+import pytest
+
+from pipeline import PipelinedClient
+from store_server import StoreServer
+from tbinary import Codec, message_begin, T_CALL, T_STRING
+
+codec = Codec()
+
+
+def _send(port: int, data: bytes) -> socket.socket:
+    sock = socket.create_connection(("127.0.0.1", port), timeout=2)
+    sock.sendall(data)
+    return sock
+
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    buf = b""
+    while len(buf) < 4 or len(buf) < 4 + struct.unpack(">I", buf[:4])[0]:
+        chunk = sock.recv(1 << 16)
+        if not chunk:
+            break
+        buf += chunk
+    return buf[4:]
+
+
+def _checkout(port: int) -> str:
+    with PipelinedClient("127.0.0.1", port, timeout=2) as client:
+        basket = client.call("createBasket").success
+        client.call("addToBasket", basket, "banana")
+        return client.call("pay", basket, 90).success
+
+
+@pytest.fixture
+def server():
+    with StoreServer(port=0, max_frame=4096) as srv:
+        yield srv
+
+
+def test_negative_string_length_does_not_wedge_the_loop(server):
+    # getBasket call carrying an undeclared string field of length -7
+    body = bytes(message_begin("getBasket", T_CALL, 1)) + struct.pack(">bhi", T_STRING, 9, -7) + b"\x00"
+    hostile = _send(server.port, struct.pack(">I", len(body)) + body)
+    reply = codec.decode_reply(_recv_frame(hostile))
+    assert reply.exception.startswith("Malformed call")
+    assert _checkout(server.port).startswith("Thank you")
+    hostile.close()
+
+
+def test_oversized_frame_drops_only_that_connection(server):
+    hostile = _send(server.port, struct.pack(">I", 0xFFFFFFF0) + b"\x00" * 64)
+    assert hostile.recv(1) == b""
+    assert _checkout(server.port).startswith("Thank you")
+
+
+def test_half_closed_connection_gets_delayed_reply_without_spinning():
+    with StoreServer(port=0, latency=0.3) as srv:
+        sock = _send(srv.port, codec.encode_call("createBasket", 1))
+        sock.shutdown(socket.SHUT_WR)
+        time.sleep(0.1)
+        # parked until its reply is due, not watched at EOF
+        assert len(srv.sel.get_map()) == 1
+        assert codec.decode_reply(_recv_frame(sock)).success
+        assert sock.recv(1) == b""
+        sock.close()
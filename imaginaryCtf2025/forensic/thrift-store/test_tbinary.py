@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Hostile-input tests for tbinary: lengths and counts come off the wire, so
+# negative or oversized ones must raise ThriftDecodeError, never hang or
+# escape as IndexError / struct.error.
+#
+# Usage: python3 -m pytest test_tbinary.py
+
+import struct
+
+import pytest
+
+from tbinary import (Codec, ThriftDecodeError, message_begin, skip,
+                     T_CALL, T_REPLY, T_STRING, T_STRUCT, T_LIST, T_MAP, T_I32)
+
+codec = Codec()
+
+
+def _field(ftype: int, fid: int) -> bytes:
+    return struct.pack(">bh", ftype, fid)
+
+
+def reply(body: bytes, method: str = "getBasket") -> bytes:
+    return bytes(message_begin(method, T_REPLY, 1)) + body
+
+
+def call(body: bytes, method: str = "getBasket") -> bytes:
+    return bytes(message_begin(method, T_CALL, 1)) + body
+
+
+@pytest.mark.parametrize("n", [-7, -1, 1 << 30])
+def test_unknown_string_field_with_bad_length(n):
+    # an undeclared field is skipped; its length used to move off backwards
+    msg = reply(_field(T_STRING, 9) + struct.pack(">i", n) + b"\x00")
+    with pytest.raises(ThriftDecodeError):
+        codec.decode(msg)
+
+
+@pytest.mark.parametrize("n", [-7, 1 << 30])
+def test_known_string_field_with_bad_length(n):
+    msg = call(_field(T_STRING, 1) + struct.pack(">i", n) + b"\x00")
+    with pytest.raises(ThriftDecodeError):
+        codec.decode_call(msg)
+
+
+@pytest.mark.parametrize("ttype, header", [
+    (T_LIST, struct.pack(">bi", T_I32, -3)),
+    (T_LIST, struct.pack(">bi", T_STRUCT, 1 << 30)),
+    (T_MAP, struct.pack(">bbi", T_STRING, T_I32, -1)),
+    (T_MAP, struct.pack(">bbi", T_I32, T_I32, 1 << 28)),
+])
+def test_container_with_bad_count(ttype, header):
+    msg = reply(_field(ttype, 9) + header + b"\x00")
+    with pytest.raises(ThriftDecodeError):
+        codec.decode(msg)
+    with pytest.raises(ThriftDecodeError):
+        skip(header + b"\x00", 0, ttype)
+
+
+def test_bad_message_name_length():
+    msg = struct.pack(">Ii", 0x80010002, -5) + b"x" * 8
+    with pytest.raises(ThriftDecodeError):
+        codec.decode(msg)
+
+
+def test_every_truncation_raises_decode_error():
+    inventory = [{"slug": f"item-{i}", "name": f"Item {i}", "price": i, "description": "d"} for i in range(3)]
+    for msg in (codec.encode_reply("getInventory", 5, inventory, framed=False),
+                codec.encode_call("addToBasket", 6, "basket", "banana", framed=False)):
+        assert codec.decode(msg)["seqid"] in (5, 6)
+        for cut in range(len(msg)):
+            with pytest.raises(ThriftDecodeError):
+                codec.decode(msg[:cut])
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark the twisted encoder and the solve.py decoder as N grows.
+
+For each size N a synthetic instance is generated with gen.py from a fixed
+seed. Encode throughput is compared against a per-vector loop in the
+style of chall.py. The instance is then decoded with solve.candidates and
+scored by the fraction of flag characters recovered.
+
+Usage:
+  python3 bench.py [--sizes 10,30,100,300,1000] [--encode-sizes 1000,100000]
+                   [--restarts 2048] [--workers W] [--seed S]
+"""
+import os
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+import gen
+import quat
+import solve
+
+
+def encode_loop(flag: str, rng: np.random.Generator, s: float = 1.25, sigma: float = 0.22):
+    # chall.py's loop: one 4-element quaternion product pair per chunk
+    ar = []
+    for i in range(0, len(flag), 3):
+        c = flag[i:i + 3].ljust(3, '0')
+        ar.append(np.array([rng.uniform(0, 255)] + [ord(ch) for ch in c], dtype=float))
+    r = quat.random_unit(1, rng)[0]
+    a = np.linalg.qr(rng.standard_normal((3, 3)))[0]
+    if np.linalg.det(a) < 0:
+        a[:, 0] = -a[:, 0]
+    t = rng.uniform(-90, 90, size=3)
+    for i, v in enumerate(ar):
+        tmp = quat.rotate(v, r)
+        vec = s * (a @ tmp[1:]) + t + rng.normal(0, sigma, size=3)
+        ar[i] = np.concatenate(([tmp[0]], vec))
+    return np.array(ar)
+
+
+def bench_encode(sizes, seed):
+    print(f"{'N':>9} {'loop vec/s':>12} {'batch vec/s':>12} {'speedup':>8}")
+    for n in sizes:
+        flag = gen.random_flag(n, np.random.default_rng(seed))
+        t0 = time.perf_counter()
+        encode_loop(flag, np.random.default_rng(seed))
+        loop = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        gen.encode(flag, np.random.default_rng(seed))
+        batch = time.perf_counter() - t0
+        print(f"{n:>9} {n / loop:>12.0f} {n / batch:>12.0f} {loop / batch:>7.1f}x")
+
+
+def bench_decode(sizes, seed, restarts, workers):
+    print(f"{'N':>6} {'time s':>8} {'residual':>9} {'chars ok':>9}  decoded")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            rng = np.random.default_rng(seed)
+            flag = gen.random_flag(n, rng)
+            Q, _ = gen.encode(flag, rng)
+            path = os.path.join(tmp, f"out_{n}.txt")
+            gen.write_output(path, Q)
+
+            t0 = time.perf_counter()
+            err, text, _ = solve.candidates(path, restarts=restarts, seed=seed, workers=workers, top=1)[0]
+            elapsed = time.perf_counter() - t0
+            truth = flag.ljust(len(text), '0')
+            ok = sum(a == b for a, b in zip(text, truth)) / len(truth)
+            shown = text if len(text) <= 40 else text[:37] + '...'
+            print(f"{n:>6} {elapsed:>8.2f} {err:>9.3f} {ok:>8.1%}  {shown}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark the twisted encoder and decoder')
+    ap.add_argument('--sizes', default='10,30,100,300,1000')
+    ap.add_argument('--encode-sizes', default='1000,10000,100000')
+    ap.add_argument('--restarts', type=int, default=2048)
+    ap.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    ap.add_argument('--seed', type=int, default=0)
+    args = ap.parse_args()
+
+    bench_encode([int(n) for n in args.encode_sizes.split(',') if n], args.seed)
+    print()
+    bench_decode([int(n) for n in args.sizes.split(',') if n], args.seed, args.restarts, args.workers)
+
+
+if __name__ == '__main__':
+    main()
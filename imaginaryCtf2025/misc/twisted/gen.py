@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Synthetic instances of the twisted challenge.
+
+Applies the chall.py transform (quaternion rotation, random proper
+rotation, scale, translation, Gaussian noise) to a whole flag at once with
+quat.py, from a fixed seed, so instances of any size can be reproduced.
+
+Usage:
+  python3 gen.py <n_vectors> [out.txt|out.npy] [--seed S] [--flag FLAG]
+                 [--scale 1.25] [--sigma 0.22]
+"""
+import string
+import argparse
+
+import numpy as np
+
+import quat
+
+FLAG_CHARS = string.ascii_letters + string.digits + '_!'
+
+
+def random_flag(n_vectors: int, rng: np.random.Generator, prefix: str = 'ictf{') -> str:
+    # 3 characters per vector, closed with '}' like a real flag
+    body = 3 * n_vectors - len(prefix) - 1
+    return prefix + ''.join(rng.choice(list(FLAG_CHARS), size=max(0, body))) + '}'
+
+
+def encode(flag: str, rng: np.random.Generator, s: float = 1.25, sigma: float = 0.22):
+    """Return (Q, params): Q is the N x 4 output chall.py would print."""
+    flag = flag.encode()
+    flag += b'0' * (-len(flag) % 3)
+    V = np.empty((len(flag) // 3, 4))
+    V[:, 0] = rng.uniform(0, 255, size=len(V))
+    V[:, 1:] = np.frombuffer(flag, dtype=np.uint8).reshape(-1, 3)
+
+    r = quat.random_unit(1, rng)[0]
+    a = np.linalg.qr(rng.standard_normal((3, 3)))[0]
+    if np.linalg.det(a) < 0:
+        a[:, 0] = -a[:, 0]
+    t = rng.uniform(-90, 90, size=3)
+
+    Q = quat.rotate(V, r)
+    Q[:, 1:] = s * Q[:, 1:] @ a.T + t + rng.normal(0, sigma, size=(len(V), 3))
+    return Q, {'r': r, 'a': a, 's': s, 't': t, 'sigma': sigma}
+
+
+def write_output(path: str, Q: np.ndarray, block: int = 100000):
+    if path.endswith('.npy'):
+        np.save(path, Q)
+        return
+    # Same shape of text as chall.py's print(ar), written block by block
+    with open(path, 'w') as f:
+        f.write('[')
+        for i in range(0, len(Q), block):
+            rows = Q[i:i + block]
+            f.write(('' if i == 0 else ', ') + ', '.join(
+                'array([%.8f, %.8f, %.8f, %.8f])' % tuple(row) for row in rows))
+        f.write(']\n')
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Generate a synthetic twisted instance')
+    ap.add_argument('n', type=int, help='number of output vectors (ignored with --flag)')
+    ap.add_argument('out', nargs='?', default='synthetic.txt')
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--flag')
+    ap.add_argument('--scale', type=float, default=1.25)
+    ap.add_argument('--sigma', type=float, default=0.22)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    flag = args.flag or random_flag(args.n, rng)
+    Q, _ = encode(flag, rng, args.scale, args.sigma)
+    write_output(args.out, Q)
+    print(f"wrote {len(Q)} vectors to {args.out}")
+    print(flag if len(flag) <= 120 else flag[:117] + '...')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Vectorised quaternion helpers for the twisted challenge.
+
+Quaternions are (..., 4) arrays ordered (w, x, y, z), as in chall.py.
+Every function broadcasts over the leading axes, so one call handles a
+whole N x 4 batch instead of one 4-element array per loop iteration.
+"""
+import numpy as np
+
+
+def conj(q: np.ndarray) -> np.ndarray:
+    return q * np.array([1.0, -1.0, -1.0, -1.0])
+
+
+def mul(q1: np.ndarray, q2: np.ndarray) -> np.ndarray:
+    # Hamilton product, same component order as chall.py's mul
+    w1, x1, y1, z1 = np.moveaxis(np.asarray(q1, dtype=float), -1, 0)
+    w2, x2, y2, z2 = np.moveaxis(np.asarray(q2, dtype=float), -1, 0)
+    return np.stack([
+        w1*w2 - x1*x2 - y1*y2 - z1*z2,
+        w1*x2 + x1*w2 + y1*z2 - z1*y2,
+        w1*y2 - x1*z2 + y1*w2 + z1*x2,
+        w1*z2 + x1*y2 - y1*x2 + z1*w2,
+    ], axis=-1)
+
+
+def rotate(v: np.ndarray, q: np.ndarray) -> np.ndarray:
+    # q v q*; the scalar part of v passes through unchanged for unit q
+    return mul(mul(q, v), conj(q))
+
+
+def normalize(q: np.ndarray) -> np.ndarray:
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def random_unit(n: int, rng: np.random.Generator) -> np.ndarray:
+    # Uniform over unit quaternions, hence over rotations
+    return normalize(rng.standard_normal((n, 4)))
+
+
+def to_matrix(q: np.ndarray) -> np.ndarray:
+    # (..., 4) unit quaternions -> (..., 3, 3) rotation matrices
+    w, x, y, z = np.moveaxis(q, -1, 0)
+    return np.stack([
+        np.stack([1 - 2*(y*y + z*z), 2*(x*y - w*z), 2*(x*z + w*y)], axis=-1),
+        np.stack([2*(x*y + w*z), 1 - 2*(x*x + z*z), 2*(y*z - w*x)], axis=-1),
+        np.stack([2*(x*z - w*y), 2*(y*z + w*x), 1 - 2*(x*x + y*y)], axis=-1),
+    ], axis=-2)
+
+
+def from_matrix(R: np.ndarray) -> np.ndarray:
+    # (..., 3, 3) rotation matrices -> (..., 4) unit quaternions with w >= 0.
+    # Each candidate row is 4 * q_k * q, so picking the row with the largest
+    # diagonal term keeps the division well conditioned.
+    R = np.asarray(R, dtype=float)
+    m00, m01, m02 = R[..., 0, 0], R[..., 0, 1], R[..., 0, 2]
+    m10, m11, m12 = R[..., 1, 0], R[..., 1, 1], R[..., 1, 2]
+    m20, m21, m22 = R[..., 2, 0], R[..., 2, 1], R[..., 2, 2]
+    cand = np.stack([
+        np.stack([1 + m00 + m11 + m22, m21 - m12, m02 - m20, m10 - m01], axis=-1),
+        np.stack([m21 - m12, 1 + m00 - m11 - m22, m01 + m10, m02 + m20], axis=-1),
+        np.stack([m02 - m20, m01 + m10, 1 - m00 + m11 - m22, m12 + m21], axis=-1),
+        np.stack([m10 - m01, m02 + m20, m12 + m21, 1 - m00 - m11 + m22], axis=-1),
+    ], axis=-2)
+    diag = np.stack([cand[..., k, k] for k in range(4)], axis=-1)
+    k = np.argmax(diag, axis=-1)
+    q = np.take_along_axis(cand, k[..., None, None], axis=-2)[..., 0, :]
+    q = normalize(q)
+    return np.where(q[..., :1] < 0, -q, q)
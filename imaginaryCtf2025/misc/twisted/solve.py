@@ -1,71 +1,392 @@
-import re
+import os
+import argparse
+import contextlib
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 
+import quat
+
+
+# Everything that cannot be part of a float becomes a separator
+_NUMBER_CHARS = set('0123456789.+-eE')
+_TO_SPACE = str.maketrans({chr(i): ' ' for i in range(128) if chr(i) not in _NUMBER_CHARS})
+
+
+def _parse_floats(text: str) -> np.ndarray:
+    text = text.translate(_TO_SPACE)
+    # fromstring turns a blank string into [-1.]
+    if text.isspace() or not text:
+        return np.empty(0)
+    return np.fromstring(text, dtype=np.float64, sep=' ')
+
+
+def load_vectors(path: str, chunk_size: int = 1 << 20) -> np.ndarray:
+    """Load the (N, 3) vector parts of chall.py output.
+
+    Text output is parsed in chunks straight into a growing float64 buffer,
+    so memory stays near the size of the result rather than of the text.
+    A .npy file (N x 4 quaternions or N x 3 vectors) is memory-mapped.
+    """
+    if path.endswith('.npy'):
+        arr = np.load(path, mmap_mode='r')
+        # Drop the quaternion scalar if present
+        return arr[:, 1:] if arr.shape[1] == 4 else arr
 
-def load_vectors(path: str) -> np.ndarray:
-    text = open(path, 'r').read()
-    # Extract floats; drop the first element of each 4-tuple (quaternion scalar)
-    nums = list(map(float, re.findall(r"[-+]?\d+\.\d+(?:e[+-]?\d+)?", text)))
-    rows = [nums[i:i + 4] for i in range(0, len(nums), 4)]
-    Y = np.array([r[1:] for r in rows])
-    return Y
+    buf = np.empty(1024, dtype=np.float64)
+    n = 0
+    carry = ''
+    with open(path, 'r') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            text = carry + chunk
+            if chunk:
+                # A number may straddle the chunk boundary; keep its head
+                cut = max(text.rfind(c) for c in ' ,[]()\n')
+                text, carry = text[:cut + 1], text[cut + 1:]
+            vals = _parse_floats(text)
+            if n + len(vals) > len(buf):
+                buf = np.resize(buf, max(2 * len(buf), n + len(vals)))
+            buf[n:n + len(vals)] = vals
+            n += len(vals)
+            if not chunk:
+                break
+    # Drop the first element of each 4-tuple (quaternion scalar)
+    return buf[:n - n % 4].reshape(-1, 4)[:, 1:]
 
 
-def kabsch(A: np.ndarray, B: np.ndarray) -> np.ndarray:
-    # Finds R minimizing ||R A - B||_F, with det(R) = +1
-    H = B.T @ A
+def kabsch_batch(A: np.ndarray, B: np.ndarray) -> np.ndarray:
+    # Stacked Kabsch: A, B are (K, N, 3); returns (K, 3, 3) proper rotations
+    H = np.einsum('kni,knj->kij', B, A)
     U, S, Vt = np.linalg.svd(H)
-    R = U @ Vt
-    if np.linalg.det(R) < 0:
-        Vt[-1, :] *= -1
-        R = U @ Vt
-    return R
+    d = np.sign(np.linalg.det(U @ Vt))
+    d[d == 0] = 1.0
+    U[:, :, -1] *= d[:, None]
+    return U @ Vt
+
+
+def umeyama_batch(A: np.ndarray, B: np.ndarray):
+    # Stacked similarity fit for centred A, B (K, N, 3): returns R (K, 3, 3)
+    # and s (K,) minimising ||s R A - B||_F
+    H = np.einsum('kni,knj->kij', B, A)
+    U, S, Vt = np.linalg.svd(H)
+    d = np.sign(np.linalg.det(U @ Vt))
+    d[d == 0] = 1.0
+    U[:, :, -1] *= d[:, None]
+    S[:, -1] *= d
+    var = np.einsum('kni,kni->k', A, A)
+    return U @ Vt, S.sum(axis=1) / np.maximum(var, 1e-12)
+
+
+def random_rotations(k: int, rng: np.random.Generator) -> np.ndarray:
+    # Uniform random rotations from normalised Gaussian quaternions
+    return quat.to_matrix(quat.random_unit(k, rng))
+
+
+def small_rotations(k: int, sigma: float, rng: np.random.Generator) -> np.ndarray:
+    # Rotations by roughly sigma radians about random axes
+    q = np.concatenate((np.ones((k, 1)), rng.normal(0, sigma / 2, size=(k, 3))), axis=1)
+    return quat.to_matrix(quat.normalize(q))
+
+
+def anchored_rotations(Y: np.ndarray, X0: np.ndarray, X1: np.ndarray, k: int,
+                       rng: np.random.Generator):
+    # Random rotations that carry the known row X0 -> Y[0] and a guess of row
+    # X1 -> Y[1]: pick one of the candidate X1, align the two directions, then
+    # spin by a random angle about that axis. Returns the rotations and the
+    # X1 each one used.
+    e = Y[1] - Y[0]
+    e /= np.linalg.norm(e)
+    X1 = X1[rng.integers(len(X1), size=k)]
+    d = X1 - X0
+    d /= np.linalg.norm(d, axis=1, keepdims=True)
+
+    def cross_matrix(w):
+        z = np.zeros(len(w))
+        return np.stack([
+            np.stack([z, -w[:, 2], w[:, 1]], axis=-1),
+            np.stack([w[:, 2], z, -w[:, 0]], axis=-1),
+            np.stack([-w[:, 1], w[:, 0], z], axis=-1),
+        ], axis=1)
+
+    # Rodrigues: rotation taking d onto e, then about e by theta
+    W = cross_matrix(np.cross(d, e))
+    c = np.clip(d @ e, -1 + 1e-9, None)
+    align = np.eye(3) + W + W @ W / (1 + c)[:, None, None]
+    E = cross_matrix(np.broadcast_to(e, (k, 3)))
+    theta = rng.uniform(0, 2 * np.pi, size=k)[:, None, None]
+    spin = np.eye(3) + np.sin(theta) * E + (1 - np.cos(theta)) * (E @ E)
+    return spin @ align, X1
+
+
+ASCII_MIN, ASCII_MAX = 32, 126
+
+
+def _template(n_rows: int, head: str, tail: str = '') -> np.ndarray:
+    # Flattened X with the known characters filled in and NaN elsewhere
+    known = np.full(3 * n_rows, np.nan)
+    known[:len(head)] = [ord(c) for c in head]
+    if tail:
+        known[len(known) - len(tail):] = [ord(c) for c in tail]
+    return known
+
+
+def _pin(X: np.ndarray, known: np.ndarray) -> None:
+    # Overwrite the known characters of every restart in X (K, N, 3)
+    mask = ~np.isnan(known)
+    X.reshape(len(X), -1)[:, mask] = known[mask]
+
+
+def _seed(Y: np.ndarray, known: np.ndarray, K: int, scale: float, rng: np.random.Generator,
+          slack: float = 0.0):
+    # Initial rotations, scales and translations for K restarts. A row-1
+    # guess is kept if its distance from row 0 matches the scale to within
+    # 1.5 plus `slack` (relative), for when the scale itself is a guess.
+    s = np.full(K, scale)
+    B = random_rotations(K, rng)
+    X = np.full((K,) + Y.shape, 95.0)
+    _pin(X, known)
+    t = Y.mean(axis=0) - s[:, None] * np.einsum('kij,kj->ki', B, X.mean(axis=1))
+    if len(Y) < 2 or np.isnan(known[:4]).any():
+        return B, s, t
+    # Row 0 is known and row 1 partly: seed the restarts from rotations
+    # consistent with both instead of uniformly over SO(3)
+    X0 = known[:3]
+    fill = np.arange(ASCII_MIN, ASCII_MAX + 1, dtype=float)
+    gaps = np.isnan(known[3:6])
+    X1 = np.tile(known[3:6], (len(fill) ** gaps.sum(), 1))
+    X1[:, gaps] = list(itertools.product(fill, repeat=gaps.sum()))
+    gap = np.linalg.norm(Y[1] - Y[0]) / scale
+    X1 = X1[np.abs(np.linalg.norm(X1 - X0, axis=1) - gap) < 1.5 + slack * gap]
+    if not len(X1):
+        return B, s, t
+    B, _ = anchored_rotations(Y, X0, X1, K, rng)
+    t = Y[0] - s[:, None] * (B @ X0)
+    return B, s, t
+
+
+def _descend(Y: np.ndarray, known: np.ndarray, B, s, t, scale,
+             max_iter: int = 250, cutoff: float = np.inf, warmup: int = 16):
+    # Alternate snap + align for every restart until its snapped X stops
+    # changing; updates B, s, t in place and returns (residuals, X).
+    # Past warm-up, restarts with a residual above `cutoff` are abandoned.
+    K = len(B)
+    X = np.full((K,) + Y.shape, 95.0)
+    alive = np.ones(K, dtype=bool)
+    active = np.arange(K)
+
+    for it in range(max_iter):
+        Bk, sk, tk = B[active], s[active], t[active]
+        # Snap to nearest ASCII after inverting current transform
+        X_est = np.einsum('kni,kij->knj', Y[None] - tk[:, None], Bk) / sk[:, None, None]
+        X_new = np.clip(np.rint(X_est), ASCII_MIN, ASCII_MAX)
+        _pin(X_new, known)
 
+        # Restarts whose snapped X stopped changing have converged
+        moving = np.any(X_new != X[active], axis=(1, 2))
+        X[active] = X_new
 
-def decode(output_path: str, scale: float = 1.25) -> str:
+        # Recompute rotation with Kabsch and translation from means
+        mean = X_new.mean(axis=1)
+        Xc = X_new - mean[:, None]
+        Yc = (Y[None] - tk[:, None]) / scale
+        Bk = kabsch_batch(Xc, Yc)
+        B[active] = Bk
+        t[active] = Y.mean(axis=0) - sk[:, None] * np.einsum('kij,kj->ki', Bk, mean)
+
+        if np.isfinite(cutoff) and it >= warmup and it % 8 == 0:
+            # Drop restarts already far worse than the best of the last pass
+            err = _residuals(Y, B[active], s[active], t[active], X[active])
+            hopeless = err > cutoff
+            alive[active[hopeless]] = False
+            moving &= ~hopeless
+
+        active = active[moving]
+        if not len(active):
+            break
+
+    err = _residuals(Y, B, s, t, X)
+    err[~alive] = np.inf
+    return err, X
+
+
+def _descend_job(Y, known, B, s, t, scale, max_iter, cutoff):
+    err, X = _descend(Y, known, B, s, t, scale, max_iter, cutoff)
+    return err, X, B, s, t
+
+
+def _descend_all(Y, known, B, s, t, scale, max_iter, cutoff=np.inf, pool=None, workers: int = 1):
+    # _descend over every restart, split into one chunk per worker
+    if pool is None:
+        return _descend_job(Y, known, B, s, t, scale, max_iter, cutoff)
+    parts = [c for c in np.array_split(np.arange(len(B)), workers) if len(c)]
+    jobs = [(Y, known, B[c], s[c], t[c], scale, max_iter, cutoff) for c in parts]
+    return tuple(np.concatenate(a) for a in zip(*pool.map(_descend_job, *zip(*jobs))))
+
+
+def _restarts(Y: np.ndarray, known: np.ndarray, K: int, scale: float, seed,
+              max_iter: int = 250, hops: int = 4, keep: int = 32, jitter: float = 0.01,
+              prune: float = 2.0, slack: float = 0.0, pool=None, workers: int = 1):
+    """Run K restarts of snap + align; returns (residuals, X, scales).
+
+    The basin around the true rotation is narrow, and the fixed points next
+    to it are off by a small rotation, so after the first pass the `keep`
+    best restarts are re-seeded `hops` times with small random rotations.
+    Each hop abandons restarts more than `prune` times worse than the best
+    residual of the pass before. Seeding, hop selection and that cut-off
+    see all K restarts; only the descents are spread over `pool`, and each
+    restart descends independently, so the result does not depend on the
+    worker count.
+    """
+    rng = np.random.default_rng(seed)
+    B, s, t = _seed(Y, known, K, scale, rng, slack)
+    err, X, B, s, t = _descend_all(Y, known, B, s, t, scale, max_iter, pool=pool, workers=workers)
+
+    for _ in range(hops):
+        top = np.argsort(err)[:keep]
+        top = top[np.isfinite(err[top])]
+        if not len(top):
+            break
+        idx = np.repeat(top, max(1, K // (2 * len(top))))
+        Bh = small_rotations(len(idx), jitter, rng) @ B[idx]
+        sh = s[idx].copy()
+        th = Y.mean(axis=0) - sh[:, None] * np.einsum('kij,kj->ki', Bh, X[idx].mean(axis=1))
+        cutoff = prune * err[top[0]]
+        eh, Xh, Bh, sh, th = _descend_all(Y, known, Bh, sh, th, scale, max_iter, cutoff, pool, workers)
+        B, s, t = np.concatenate((B[top], Bh)), np.concatenate((s[top], sh)), np.concatenate((t[top], th))
+        err, X = np.concatenate((err[top], eh)), np.concatenate((X[top], Xh))
+
+    return err, X.astype(int), s
+
+
+def _residuals(Y, B, s, t, X) -> np.ndarray:
+    Y_pred = s[:, None, None] * np.einsum('kij,knj->kni', B, X) + t[:, None]
+    return np.linalg.norm((Y[None] - Y_pred).reshape(len(X), -1), axis=1)
+
+
+def _scale_range(Y: np.ndarray, known: np.ndarray, slack: float = 0.05):
+    # Scales consistent with the known characters of row 1 and of the last
+    # row, given a fully known row 0: each row's distance from row 0 is
+    # bounded by the ASCII range of its unknown characters
+    X0 = known[:3]
+    lo, hi = 0.0, np.inf
+    for row in sorted({1, len(Y) - 1} - {0}):
+        d = known[3 * row:3 * row + 3] - X0
+        a, b = ASCII_MIN - X0, ASCII_MAX - X0
+        unknown = np.isnan(d)
+        near = np.where(unknown, np.where((a <= 0) & (b >= 0), 0, np.minimum(abs(a), abs(b))), abs(d))
+        far = np.where(unknown, np.maximum(abs(a), abs(b)), abs(d))
+        gap = np.linalg.norm(Y[row] - Y[0])
+        lo = max(lo, gap / np.linalg.norm(far) * (1 - slack))
+        if np.linalg.norm(near) > 0:
+            hi = min(hi, gap / np.linalg.norm(near) * (1 + slack))
+    return lo, hi
+
+
+def _scale_search(Y: np.ndarray, heads: list, restarts: int, max_iter: int, seeds,
+                  pool=None, workers: int = 1, ratio: float = 1.04, steps: int = 5):
+    """(residuals, X, scales) from a grid of fixed scales, each Kabsch-fitted.
+
+    A free scale lets wrong strings fit short instances better than the
+    true one, so the scale is searched instead: a geometric grid (`ratio`
+    apart) over the range the known rows allow, for every template in
+    `heads`, with restarts // 8 restarts per point; then `steps` finer
+    points either side of the best; then the best fine scale with all
+    `restarts`. The decodings found are ranked after a per-string refit.
+    """
+    runs = []
+
+    def run(known, scales, K, slack):
+        for s in scales:
+            runs.append(_restarts(Y, known, K, float(s), next(seeds), max_iter, slack=slack,
+                                  pool=pool, workers=workers) + (known,))
+
+    coarse = max(64, restarts // 8)
+    for known in heads:
+        lo, hi = _scale_range(Y, known)
+        if not lo < hi < np.inf:
+            continue
+        run(known, lo * ratio ** np.arange(np.log(hi / lo) // np.log(ratio) + 1), coarse, ratio - 1)
+    if not runs:
+        raise ValueError('no scale is consistent with the known characters')
+    best = min(runs, key=lambda r: r[0].min())
+    s0, known = best[2][0], best[3]
+    run(known, s0 * ratio ** (np.arange(-steps, steps + 1) / steps), coarse, (ratio - 1) / steps)
+    best = min(runs, key=lambda r: r[0].min())
+    run(known, best[2][:1], restarts, 0.0)
+    return _refit(Y, *(np.concatenate([r[i] for r in runs]) for i in range(2)))
+
+
+def _refit(Y: np.ndarray, err: np.ndarray, X: np.ndarray):
+    # Every distinct decoding from the scale search, re-fitted with its own
+    # best scale (Umeyama on the fixed string), so grid points do not bias
+    # the ranking; returns (residuals, X, scales)
+    X = np.unique(X[np.isfinite(err)], axis=0)
+    Xc = X - X.mean(axis=1, keepdims=True)
+    Yc = np.broadcast_to(Y - Y.mean(axis=0), Xc.shape)
+    R, s = umeyama_batch(Xc, Yc)
+    Y_pred = s[:, None, None] * np.einsum('kij,knj->kni', R, Xc)
+    return np.linalg.norm((Yc - Y_pred).reshape(len(X), -1), axis=1), X, s
+
+
+def candidates(output_path: str, scale=1.25, restarts: int = 2048,
+               max_iter: int = 250, seed: int = 0, prefix: str = 'ictf{',
+               suffix: str = '}', workers: int = 1, top: int = 10) -> list:
+    """Ranked (residual, decoded, scale) tuples, best first.
+
+    scale=None searches for the scale (see _scale_search). That needs row 0
+    known from `prefix`, and pins the end of the text too: `suffix` then
+    chall.py's '0' padding, trying each of the three padding lengths.
+    With workers > 1 every descent is split into chunks across a process
+    pool; the ranking is the same for any number of workers.
+    """
     Y = load_vectors(output_path)
-    s = scale
-    ASCII_MIN, ASCII_MAX = 32, 126
-
-    # Alternating minimization: snap to nearest ASCII, then align via Kabsch
-    best_err = float('inf')
-    best_X = None
-
-    for seed in range(50):
-        rng = np.random.default_rng(seed)
-        B = np.eye(3)
-        # Initialize around typical printable ASCII mean
-        X = np.full_like(Y, 95.0)
-        t = Y.mean(axis=0) - s * (B @ X.mean(axis=0))
-
-        for _ in range(250):
-            # Snap to nearest ASCII after inverting current transform
-            X_est = (B.T @ (Y - t).T / s).T
-            X = np.rint(X_est)
-            X = np.clip(X, ASCII_MIN, ASCII_MAX)
-
-            # Use known flag prefix to break symmetries
-            X[0] = np.array([105, 99, 116])  # 'ict'
-            X[1, 0] = 102                    # 'f'
-            X[1, 1] = 123                    # '{'
-
-            # Recompute rotation with Kabsch and translation from means
-            Xc = X - X.mean(axis=0)
-            Yc = (Y - t) / s
-            B = kabsch(Xc, Yc)
-            t = Y.mean(axis=0) - s * (B @ X.mean(axis=0))
-
-        Y_pred = (s * (B @ X.T)).T + t
-        err = float(np.linalg.norm(Y - Y_pred))
-        if err < best_err:
-            best_err = err
-            best_X = X.astype(int)
-
-    decoded = ''.join(''.join(chr(int(c)) for c in row) for row in best_X)
-    return decoded
+    known = _template(len(Y), prefix)
+    seeds = iter(np.random.SeedSequence(seed).spawn(4096))
+    if scale is None:
+        if len(prefix) < 3:
+            raise ValueError('estimating the scale needs at least 3 prefix characters')
+        heads = [_template(len(Y), prefix, suffix + '0' * pad) for pad in range(3)
+                 if len(prefix) + len(suffix) + pad <= 3 * len(Y)]
+
+    with ProcessPoolExecutor(workers) if workers > 1 else contextlib.nullcontext() as pool:
+        if scale is None:
+            err, X, s = _scale_search(Y, heads, restarts, max_iter, seeds, pool, workers)
+        else:
+            err, X, s = _restarts(Y, known, restarts, scale, next(seeds), max_iter,
+                                  pool=pool, workers=workers)
+
+    ranked = {}
+    for i in np.argsort(err):
+        if not np.isfinite(err[i]) or len(ranked) >= top:
+            break
+        text = ''.join(chr(c) for c in X[i].ravel())
+        if text not in ranked:
+            ranked[text] = (float(err[i]), text, float(s[i]))
+    return list(ranked.values())
+
+
+def decode(output_path: str, scale: float = 1.25, restarts: int = 2048,
+           max_iter: int = 250, seed: int = 0, prefix: str = 'ictf{', suffix: str = '}') -> str:
+    return candidates(output_path, scale, restarts, max_iter, seed, prefix, suffix, top=1)[0][1]
 
 
 if __name__ == '__main__':
-    flag = decode('output.txt')
-    print(flag)
+    ap = argparse.ArgumentParser(description='Recover the flag from twisted output vectors')
+    ap.add_argument('output', nargs='?', default='output.txt')
+    ap.add_argument('--scale', type=float, default=1.25)
+    ap.add_argument('--estimate-scale', action='store_true', help='search for the scale instead of assuming --scale')
+    ap.add_argument('--prefix', default='ictf{')
+    ap.add_argument('--suffix', default='}', help='last flag characters, pinned with --estimate-scale')
+    ap.add_argument('--restarts', type=int, default=2048)
+    ap.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--top', type=int, default=5)
+    args = ap.parse_args()
 
+    scale = None if args.estimate_scale else args.scale
+    ranked = candidates(args.output, scale, args.restarts, seed=args.seed, prefix=args.prefix,
+                        suffix=args.suffix, workers=args.workers, top=args.top)
+    for err, text, s in ranked:
+        print(f"{err:8.3f}  s={s:.4f}  {text}")
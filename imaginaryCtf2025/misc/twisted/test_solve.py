@@ -0,0 +1,49 @@
+"""
+End-to-end checks of solve.py on output.txt and on gen.py instances.
+
+Usage:
+  python3 -m pytest test_solve.py
+"""
+import os
+
+import numpy as np
+import pytest
+
+import gen
+import solve
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FLAG = 'ictf{qu4t3rn10n5_4r3_600d!!}'
+
+
+def instance(tmp_path, n, scale, seed):
+    # what `gen.py n out.txt --seed seed --scale scale` writes
+    rng = np.random.default_rng(seed)
+    flag = gen.random_flag(n, rng)
+    Q, _ = gen.encode(flag, rng, scale)
+    path = str(tmp_path / 'out.txt')
+    gen.write_output(path, Q)
+    return path, flag.ljust(3 * n, '0')
+
+
+@pytest.mark.parametrize('scale', [1.25, None])
+def test_output_txt(scale):
+    err, text, s = solve.candidates(os.path.join(HERE, 'output.txt'), scale, top=1)[0]
+    assert text.rstrip('0') == FLAG
+    assert abs(s - 1.25) < 0.01
+
+
+@pytest.mark.parametrize('n, scale, seed', [(20, 1.25, 0), (20, 1.37, 5)])
+def test_estimated_scale_decodes_generated_instance(tmp_path, n, scale, seed):
+    path, truth = instance(tmp_path, n, scale, seed)
+    err, text, s = solve.candidates(path, None, top=1)[0]
+    assert text == truth
+    assert abs(s - scale) < 0.01
+    assert solve.decode(path, scale) == truth
+
+
+def test_ranking_does_not_depend_on_workers(tmp_path):
+    path, _ = instance(tmp_path, 10, 1.25, 0)
+    one = solve.candidates(path, restarts=256, workers=1, top=5)
+    two = solve.candidates(path, restarts=256, workers=2, top=5)
+    assert one == two
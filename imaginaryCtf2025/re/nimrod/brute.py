@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Recover nimrod's LCG seed from a ciphertext and a known plaintext prefix.
+
+Every keystream byte is bits 16..23 of an LCG state, and in a mod-2^32 LCG
+the low k bits of the state only depend on the low k bits of the seed. So
+the keystream is fixed by the seed's low 24 bits: those are searched
+(2^24 candidates, well under a second), and the 256 seeds sharing them all
+decrypt identically. --full scans all 2^32 seeds instead.
+
+Candidates are checked in uint32 blocks across a process pool. A block is
+filtered on the first known keystream byte, then only the survivors are
+stepped and checked on the next one, so almost all work is a single
+multiply-add-compare per seed.
+
+Usage:
+  python3 brute.py [binary] [offset] [--prefix ictf{] [--workers N] [--full]
+  python3 brute.py --hex <ciphertext-hex> [--prefix ictf{]
+"""
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+
+import numpy as np
+
+import lcg
+from solve import read_nim_string
+
+CHUNK = 1 << 22
+
+
+def known_keystream(enc: bytes, prefix: bytes) -> np.ndarray:
+    n = min(len(enc), len(prefix))
+    return np.frombuffer(enc[:n], dtype=np.uint8) ^ np.frombuffer(prefix[:n], dtype=np.uint8)
+
+
+def scan(lo: int, hi: int, ks: np.ndarray) -> np.ndarray:
+    """Seeds in [lo, hi) whose keystream starts with ks."""
+    seeds = np.arange(lo, hi, dtype=np.uint64).astype(np.uint32)
+    a, c = np.uint32(lcg.A), np.uint32(lcg.C)
+    s = seeds * a + c
+    for i, k in enumerate(ks):
+        if i:
+            s = s * a + c
+        # reject on the first mismatching byte
+        keep = ((s >> 16) & 0xFF) == k
+        seeds, s = seeds[keep], s[keep]
+        if not len(seeds):
+            break
+    return seeds
+
+
+def _scan_chunk(args):
+    lo, hi, ks = args
+    return hi - lo, scan(lo, hi, ks)
+
+
+def search(ks: np.ndarray, bits: int = 24, workers: int = None, chunk: int = CHUNK,
+           report: float = 2.0) -> list:
+    space = 1 << bits
+    chunk = min(chunk, space)
+    jobs = [(lo, min(space, lo + chunk), ks) for lo in range(0, space, chunk)]
+    hits = []
+    done = 0
+    t0 = last = time.perf_counter()
+    with multiprocessing.Pool(workers or os.cpu_count()) as pool:
+        for n, found in pool.imap_unordered(_scan_chunk, jobs):
+            done += n
+            hits.extend(int(x) for x in found)
+            now = time.perf_counter()
+            if now - last >= report or done == space:
+                rate = done / (now - t0)
+                eta = (space - done) / rate if rate else float('inf')
+                print(f"  {done / space:6.1%}  {rate / 1e6:8.1f} Mseeds/s  eta {eta:6.1f}s  hits {len(hits)}",
+                      file=sys.stderr)
+                last = now
+    return sorted(hits)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Brute-force the nimrod LCG seed')
+    ap.add_argument('binary', nargs='?', default='nimrod')
+    ap.add_argument('offset', nargs='?', default='0x116E8')
+    ap.add_argument('--hex', help='ciphertext as hex instead of reading the binary')
+    ap.add_argument('--prefix', default='ictf{')
+    ap.add_argument('--workers', type=int, default=os.cpu_count())
+    ap.add_argument('--full', action='store_true', help='scan all 2^32 seeds, not just the low 24 bits')
+    args = ap.parse_args()
+
+    enc = bytes.fromhex(args.hex) if args.hex else read_nim_string(args.binary, int(args.offset, 0))
+    ks = known_keystream(enc, args.prefix.encode())
+    if len(ks) < 4:
+        print("warning: fewer than 4 known bytes, expect false positives", file=sys.stderr)
+
+    bits = 32 if args.full else 24
+    t0 = time.perf_counter()
+    hits = search(ks, bits, args.workers)
+    print(f"scanned 2^{bits} seeds in {time.perf_counter() - t0:.1f}s, {len(hits)} match")
+    for low in hits[:16]:
+        plain = lcg.decrypt(enc, low)
+        # with the 24-bit search, any of low | (h << 24) is an equivalent seed
+        print(f"seed {low:#010x}{'' if args.full else ' (+ k * 2^24)'}: {plain!r}")
+    if len(hits) > 16:
+        print(f"... and {len(hits) - 16} more")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Vectorised keystream for nimrod's XOR-LCG.
+
+The generator is s' = (A*s + C) mod 2^32 and each byte is keyed with
+(s' >> 16) & 0xFF. Stepping n times is itself an affine map, so it can be
+composed by squaring in O(log n) and any offset is reachable directly.
+Blocks of states come from a table of (A^k, C_k) coefficients applied to a
+uint32 vector of block start states; uint32 multiplication in NumPy wraps
+mod 2^32, which is exactly the LCG's arithmetic.
+
+Usage:
+  python3 lcg.py <hex-ciphertext> [seed] [offset]
+"""
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+A = 0x19660D
+C = 0x3C6EF35F
+SEED = 0x13371337
+MASK = 0xFFFFFFFF
+BLOCK = 1 << 12
+
+
+def jump(n: int, a: int = A, c: int = C):
+    """(a_n, c_n) such that n steps map s to (a_n*s + c_n) mod 2^32."""
+    an, cn = 1, 0
+    while n:
+        if n & 1:
+            # apply the current power after what we have so far
+            an, cn = (a * an) & MASK, (a * cn + c) & MASK
+        a, c = (a * a) & MASK, (a * c + c) & MASK
+        n >>= 1
+    return an, cn
+
+
+def state_at(seed: int, n: int) -> int:
+    an, cn = jump(n)
+    return (an * seed + cn) & MASK
+
+
+def coefficients(n: int, a: int = A, c: int = C):
+    """uint32 arrays (a_k, c_k) for k = 0..n-1, built by doubling."""
+    ak = np.ones(1, dtype=np.uint32)
+    ck = np.zeros(1, dtype=np.uint32)
+    while len(ak) < n:
+        # the second half is the first half followed by len(ak) more steps
+        am, cm = map(np.uint32, jump(len(ak), a, c))
+        ak = np.concatenate((ak, ak * am))
+        ck = np.concatenate((ck, ck * am + cm))
+    return ak[:n], ck[:n]
+
+
+_TABLE = coefficients(BLOCK)
+
+
+def states(seed: int, n: int, offset: int = 0) -> np.ndarray:
+    """LCG states s_{offset+1} .. s_{offset+n} as uint32."""
+    if n <= 0:
+        return np.empty(0, dtype=np.uint32)
+    ak, ck = _TABLE
+    blocks = -(-n // BLOCK)
+    # start state of every block, each BLOCK steps after the previous one
+    ja, jc = coefficients(blocks, *jump(BLOCK))
+    starts = ja * np.uint32(state_at(seed, offset + 1)) + jc
+    out = ak[None, :] * starts[:, None] + ck[None, :]
+    return out.ravel()[:n]
+
+
+def keystream(seed: int, n: int, offset: int = 0) -> np.ndarray:
+    return (states(seed, n, offset) >> 16).astype(np.uint8)
+
+
+def keystream_parallel(seed: int, n: int, workers: int = 4, chunk: int = 1 << 22) -> np.ndarray:
+    """Same as keystream(), with chunks filled concurrently by threads."""
+    out = np.empty(n, dtype=np.uint8)
+
+    def fill(start):
+        end = min(n, start + chunk)
+        out[start:end] = keystream(seed, end - start, start)
+
+    with ThreadPoolExecutor(workers) as pool:
+        list(pool.map(fill, range(0, n, chunk)))
+    return out
+
+
+def keystream_seeds(seeds, n: int, offset: int = 0) -> np.ndarray:
+    """(len(seeds), n) keystream bytes, one row per candidate seed."""
+    seeds = np.asarray(seeds, dtype=np.uint32)
+    ak, ck = coefficients(n)
+    a1, c1 = jump(offset + 1)
+    first = seeds * np.uint32(a1) + np.uint32(c1)
+    return ((ak[None, :] * first[:, None] + ck[None, :]) >> 16).astype(np.uint8)
+
+
+def decrypt(enc: bytes, seed: int = SEED, offset: int = 0) -> bytes:
+    data = np.frombuffer(enc, dtype=np.uint8)
+    return (data ^ keystream(seed, len(data), offset)).tobytes()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: lcg.py <hex-ciphertext> [seed] [offset]")
+        sys.exit(1)
+    seed = int(sys.argv[2], 0) if len(sys.argv) > 2 else SEED
+    offset = int(sys.argv[3], 0) if len(sys.argv) > 3 else 0
+    print(decrypt(bytes.fromhex(sys.argv[1]), seed, offset))
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Find and decrypt LCG-encrypted Nim string literals anywhere in an ELF.
+
+The file is memory-mapped and only the section headers and the sections
+being scanned are touched, so large binaries are never read in whole. In
+.rodata a Nim literal payload is a machine word holding the capacity
+(with NIM_STRLIT_FLAG, bit 62, set) followed by the bytes and a NUL. Every
+aligned word is tested as such a header with NumPy, a window at a time. Each plausible
+payload is XORed with the keystream and ranked by how much of the result
+is printable ASCII.
+
+Usage:
+  python3 nimstrings.py [binary] [--section .rodata] [--seed 0x13371337]
+                        [--min-len 4] [--top 20] [--all]
+"""
+import sys
+import mmap
+import struct
+import argparse
+
+import numpy as np
+
+import lcg
+
+STRLIT_FLAG = 1 << 62
+
+
+def elf_sections(buf) -> dict:
+    """name -> (file offset, size, word size, byte order) from the section headers."""
+    if buf[:4] != b'\x7fELF':
+        raise ValueError('not an ELF file')
+    is64 = buf[4] == 2
+    endian = '<' if buf[5] == 1 else '>'
+    if is64:
+        shoff, = struct.unpack_from(endian + 'Q', buf, 0x28)
+        shentsize, shnum, shstrndx = struct.unpack_from(endian + 'HHH', buf, 0x3A)
+        fmt = endian + 'IIQQQQ'
+    else:
+        shoff, = struct.unpack_from(endian + 'I', buf, 0x20)
+        shentsize, shnum, shstrndx = struct.unpack_from(endian + 'HHH', buf, 0x2E)
+        fmt = endian + 'IIIIII'
+    headers = [struct.unpack_from(fmt, buf, shoff + i * shentsize) for i in range(shnum)]
+    strtab_off, strtab_size = headers[shstrndx][4], headers[shstrndx][5]
+
+    sections = {}
+    for name_off, sh_type, _, _, offset, size in headers:
+        # SHT_NOBITS (.bss) has no bytes in the file
+        if sh_type == 8:
+            continue
+        end = buf.find(b'\0', strtab_off + name_off, strtab_off + strtab_size)
+        name = bytes(buf[strtab_off + name_off:end]).decode(errors='replace')
+        sections[name] = (offset, size, 8 if is64 else 4, endian)
+    return sections
+
+
+def find_headers(buf, offset: int, size: int, word: int = 8, endian: str = '<',
+                 min_len: int = 4, max_len: int = 1 << 20, window: int = 1 << 20) -> np.ndarray:
+    """File offsets of words in [offset, offset + size) that look like a Nim literal header."""
+    start = -(-offset // word) * word
+    count = (offset + size - start) // word
+    flag = np.uint64(STRLIT_FLAG if word == 8 else 1 << 30)
+    dtype = np.dtype(f'{endian}u{word}')
+    data = np.frombuffer(buf, dtype=np.uint8)
+    found = []
+    # a window of words at a time keeps the temporaries small
+    for first in range(0, max(count, 0), window):
+        n = min(window, count - first)
+        words = np.frombuffer(buf, dtype=dtype, count=n, offset=start + first * word)
+        cap = words.astype(np.uint64) & ~flag
+        idx = np.flatnonzero((cap >= min_len) & (cap <= max_len))
+        pos = start + (first + idx) * word
+        end = pos + word + cap[idx].astype(np.int64)
+        ok = end < offset + size
+        pos, end = pos[ok], end[ok]
+        # literals are NUL terminated
+        found.append(pos[data[end] == 0])
+    return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+
+def printable_score(data: bytes) -> float:
+    arr = np.frombuffer(data, dtype=np.uint8)
+    if not len(arr):
+        return 0.0
+    return float(np.count_nonzero((arr >= 0x20) & (arr < 0x7F) | (arr == 0x0A)) / len(arr))
+
+
+def scan(path: str, sections=('.rodata',), seed: int = lcg.SEED, min_len: int = 4) -> list:
+    """Ranked (score, offset, length, plaintext) for every candidate literal."""
+    results = []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        table = elf_sections(mm)
+        for name in sections:
+            if name not in table:
+                print(f"no {name} section in {path}", file=sys.stderr)
+                continue
+            offset, size, word, endian = table[name]
+            heads = find_headers(mm, offset, size, word, endian, min_len)
+            if not len(heads):
+                continue
+            lengths = [int.from_bytes(mm[h:h + word], 'little' if endian == '<' else 'big')
+                       & ((STRLIT_FLAG if word == 8 else 1 << 30) - 1) for h in heads]
+            # every literal is encrypted from the start of the keystream
+            ks = lcg.keystream(seed, max(lengths)).tobytes()
+            for h, n in zip(heads, lengths):
+                enc = mm[h + word:h + word + n]
+                plain = (np.frombuffer(enc, dtype=np.uint8)
+                         ^ np.frombuffer(ks, dtype=np.uint8, count=n)).tobytes()
+                results.append((printable_score(plain), int(h), n, plain))
+    results.sort(key=lambda r: (-r[0], -r[2]))
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Scan an ELF for encrypted Nim string literals')
+    ap.add_argument('binary', nargs='?', default='nimrod')
+    ap.add_argument('--section', action='append', help='section to scan (repeatable, default .rodata)')
+    ap.add_argument('--seed', default=hex(lcg.SEED))
+    ap.add_argument('--min-len', type=int, default=4)
+    ap.add_argument('--top', type=int, default=20)
+    ap.add_argument('--all', action='store_true', help='also list candidates that decrypt to mostly binary')
+    args = ap.parse_args()
+
+    results = scan(args.binary, args.section or ['.rodata'], int(args.seed, 0), args.min_len)
+    shown = [r for r in results if args.all or r[0] >= 0.9][:args.top]
+    print(f"{len(results)} candidate literals, {len(shown)} shown")
+    for score, offset, n, plain in shown:
+        print(f"{score:5.2f}  {offset:#010x}  len {n:<5} {plain!r}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,8 @@
 #!/usr/bin/env python3
+import lcg
 
-def lcg_next(seed: int) -> int:
-    return (seed * 0x19660D + 0x3C6EF35F) & 0xFFFFFFFF
 
-
-def decrypt_flag_from_binary(path: str, offset: int) -> str:
+def read_nim_string(path: str, offset: int) -> bytes:
     with open(path, "rb") as f:
         f.seek(offset)
         header = f.read(8)
@@ -15,17 +13,17 @@ def decrypt_flag_from_binary(path: str, offset: int) -> str:
         enc = f.read(length)
         if len(enc) != length:
             raise RuntimeError("Failed to read encrypted flag bytes")
+    return enc
 
-    seed = 0x13371337
-    out = bytearray()
-    for b in enc:
-        seed = lcg_next(seed)
-        keystream_byte = (seed >> 16) & 0xFF
-        out.append(b ^ keystream_byte)
 
-    return out.decode("utf-8")
+def decrypt_flag_from_binary(path: str, offset: int) -> str:
+    enc = read_nim_string(path, offset)
+    # Keystream for the whole string at once; see lcg.py
+    return lcg.decrypt(enc, lcg.SEED).decode("utf-8")
 
 
 if __name__ == "__main__":
-    flag = decrypt_flag_from_binary("nimrod", 0x116E8)
-    print(flag)
+    from nimstrings import scan
+    # best-scoring literal in .rodata; the flag sits at 0x116E8
+    offset = scan("nimrod")[0][1]
+    print(decrypt_flag_from_binary("nimrod", offset))
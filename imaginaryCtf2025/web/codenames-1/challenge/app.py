@@ -1,24 +1,76 @@
 import os
-import json
 import random
 import string
-from flask import Flask, render_template, request, redirect, url_for, session, flash
-from flask_socketio import SocketIO, join_room, emit
-from werkzeug.security import generate_password_hash, check_password_hash
+import time
+import functools
+from flask import Flask, Response, render_template, request, redirect, url_for, session, flash
+from flask_socketio import SocketIO, join_room, emit, rooms
+from auth import HashPool, PoolBusy, TokenBucketLimiter
+from profile_store import WriteBehindStore, open_store
+from game_store import open_game_store
+from game_state import Game
+from win_awards import WinAwardQueue
+from bot_pool import BotPool
+from metrics import Metrics
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', os.urandom(16))
 
-socketio = SocketIO(app)
+# Set SOCKETIO_MESSAGE_QUEUE (e.g. redis://host:6379/0) to fan out emits across workers.
+# ASYNC_MODE (eventlet, gevent or threading) is normally set by serve.py.
+socketio = SocketIO(
+    app,
+    async_mode=os.environ.get('ASYNC_MODE') or None,
+    message_queue=os.environ.get('SOCKETIO_MESSAGE_QUEUE'),
+)
+# Time every Socket.IO handler registered below; views are wrapped at the bottom
+metrics = Metrics(room_idle=float(os.environ.get('METRICS_ROOM_IDLE', '3600')))
+def _joined_room():
+    # only rooms this socket joined, i.e. live games it plays in; ?code= is client-supplied
+    code = request.args.get('code')
+    return code if code and code in rooms() else None
+metrics.instrument_socketio(socketio, room_of=_joined_room)
+metrics.start_profiler(int(os.environ.get('METRICS_PROFILE_HZ', '0')))
+
+# Password hashing runs in worker processes; created first so they fork before any threads start
+hash_pool = HashPool(
+    workers=int(os.environ.get('HASH_WORKERS', '2')),
+    max_pending=int(os.environ.get('HASH_MAX_PENDING', '64')),
+    method=os.environ.get('PASSWORD_HASH_METHOD') or None,
+    sleep=socketio.sleep,
+)
+# Per-IP token bucket for register/login attempts; LOGIN_RATE=0 disables it
+login_limiter = TokenBucketLimiter(
+    rate=float(os.environ.get('LOGIN_RATE', '5')),
+    burst=int(os.environ.get('LOGIN_BURST', '20')),
+)
 
 # Secret prefix used to identify bot passwords; generated at startup
 BOT_SECRET_PREFIX = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+# native: shared pool of HTTP/Socket.IO bots; selenium: bot.py with a warm Chrome pool
+BOT_MODE = os.environ.get('BOT_MODE', 'native')
+bot_pool = BotPool(
+    os.environ.get('BOT_BASE_URL', 'http://localhost:5000'),
+    BOT_SECRET_PREFIX,
+    max_concurrency=int(os.environ.get('BOT_POOL_SIZE', '32')),
+    lifetime=float(os.environ.get('BOT_LIFETIME', '30')),
+    script=os.path.join(os.getcwd(), 'bot.py') if BOT_MODE == 'selenium' else None,
+)
 
-PROFILES_DIR = 'profiles'
-if not os.path.exists(PROFILES_DIR):
-    os.makedirs(PROFILES_DIR)
+# Profile backend: files (default), sqlite or log; see profile_store.py.
+# All writes go through one native writer thread so handlers never block on disk.
+profile_store = WriteBehindStore(open_store())
+# Wins are queued here and written to profile_store in batches
+win_awards = WinAwardQueue(
+    profile_store,
+    flush_interval=float(os.environ.get('WIN_FLUSH_INTERVAL', '1.0')),
+    max_pending=int(os.environ.get('WIN_FLUSH_MAX_PENDING', '256')),
+)
 
-games = {}
+# Game backend: memory (default) or redis; see game_store.py
+games = open_game_store()
+# Seconds between sweeps of idle games (TTLs come from GAME_TTL_<PHASE>)
+GAME_REAP_INTERVAL = float(os.environ.get('GAME_REAP_INTERVAL', '30'))
 # Directory for language wordlists
 WORDS_DIR = 'words'
 # Ensure the words directory exists
@@ -26,18 +78,82 @@ if not os.path.exists(WORDS_DIR):
     os.makedirs(WORDS_DIR)
 # Available languages (filenames without extension)
 LANGUAGES = [os.path.splitext(f)[0] for f in sorted(os.listdir(WORDS_DIR)) if f.lower().endswith('.txt')]
+# Seconds a cached wordlist is served before its file mtime is checked again
+WORDS_RECHECK_INTERVAL = float(os.environ.get('WORDS_RECHECK_INTERVAL', '5'))
+# language -> (mtime_ns, checked_at, words); words is an immutable tuple
+_word_cache = {}
+# hits: served from memory, misses: file (re)read from disk, stats: mtime checks
+word_cache_stats = {'hits': 0, 'misses': 0, 'stats': 0}
+
+def load_words(language):
+    entry = _word_cache.get(language)
+    now = time.monotonic()
+    if entry and now - entry[1] < WORDS_RECHECK_INTERVAL:
+        word_cache_stats['hits'] += 1
+        return entry[2]
+    wl_path = os.path.join(WORDS_DIR, f"{language}.txt")
+    word_cache_stats['stats'] += 1
+    try:
+        mtime = os.stat(wl_path).st_mtime_ns
+        if entry and entry[0] == mtime:
+            # unchanged on disk, keep serving the cached copy
+            _word_cache[language] = (mtime, now, entry[2])
+            word_cache_stats['hits'] += 1
+            return entry[2]
+        word_cache_stats['misses'] += 1
+        with open(wl_path) as wf:
+            words = tuple(line.strip() for line in wf if line.strip())
+    except IOError as e:
+        print(e)
+        _word_cache.pop(language, None)
+        return ()
+    _word_cache[language] = (mtime, now, words)
+    return words
+
+# warm the cache so game creation never hits the disk in steady state
+for _lang in LANGUAGES:
+    load_words(_lang)
+
+def reap_games():
+    while True:
+        socketio.sleep(GAME_REAP_INTERVAL)
+        try:
+            for code in games.reap():
+                socketio.close_room(code)
+                metrics.forget_room(code)
+        except Exception as e:
+            print(f"game reaper: {e}")
+
+def collect_app_metrics():
+    yield 'codenames_games_live', 'gauge', games.live(), None
+    for phase, n in games.evicted.items():
+        yield 'codenames_games_evicted_total', 'counter', n, {'phase': phase}
+    for kind, n in word_cache_stats.items():
+        yield 'codenames_wordlist_cache_total', 'counter', n, {'result': kind}
+    yield 'codenames_win_awards_flushed_total', 'counter', win_awards.flushed, None
+    yield 'codenames_win_awards_flush_failures_total', 'counter', win_awards.failures, None
+    yield 'codenames_profile_write_failures_total', 'counter', profile_store.failures, None
+    yield 'codenames_hash_rejected_total', 'counter', hash_pool.rejected, None
+    yield 'codenames_login_limited_total', 'counter', login_limiter.limited, None
+    yield 'codenames_bots_submitted_total', 'counter', bot_pool.submitted, None
+
+metrics.add_collector(collect_app_metrics)
 
 def load_profile(username):
-    path = os.path.join(PROFILES_DIR, username)
-    if not os.path.exists(path):
-        return None
-    with open(path, 'r') as f:
-        return json.load(f)
+    return profile_store.get(username)
 
 def save_profile(profile):
-    path = os.path.join(PROFILES_DIR, profile['username'])
-    with open(path, 'w') as f:
-        json.dump(profile, f)
+    profile_store.put(profile)
+
+@app.route('/metrics')
+def metrics_view():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/profile')
+def profile_view():
+    if not metrics.profile_hz:
+        return Response('profiler disabled, set METRICS_PROFILE_HZ\n', status=404, mimetype='text/plain')
+    return Response(metrics.profile(), mimetype='text/plain')
 
 @app.route('/')
 def index():
@@ -45,12 +161,21 @@ def index():
         return redirect(url_for('lobby'))
     return render_template('index.html')
 
+def login_allowed():
+    # the bot pool logs every bot in from one address; its secret prefix exempts it
+    if request.form.get('password', '').startswith(BOT_SECRET_PREFIX):
+        return True
+    return login_limiter.allow(request.remote_addr)
+
 @app.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'GET':
         if 'username' in session:
             return redirect(url_for('lobby'))
         return render_template('register.html')
+    if not login_allowed():
+        flash('Too many attempts, please slow down')
+        return redirect(url_for('register'))
     # get form inputs
     username = request.form.get('username', '').strip().replace('/', '')
     raw_pass = request.form.get('password', '')
@@ -70,7 +195,11 @@ def register():
         is_bot = True
         pwd = raw_pass[len(BOT_SECRET_PREFIX):]
     # hash stripped password
-    pw_hash = generate_password_hash(pwd)
+    try:
+        pw_hash = hash_pool.hash(pwd)
+    except PoolBusy:
+        flash('Server busy, please try again')
+        return redirect(url_for('register'))
     profile = {'username': username, 'password_hash': pw_hash, 'wins': 0, 'is_bot': is_bot}
     save_profile(profile)
     session['username'] = username
@@ -83,6 +212,9 @@ def login():
         if 'username' in session:
             return redirect(url_for('lobby'))
         return render_template('login.html')
+    if not login_allowed():
+        flash('Too many attempts, please slow down')
+        return redirect(url_for('login'))
     username = request.form.get('username', '').strip()
     raw_pass = request.form.get('password', '')
     profile = load_profile(username)
@@ -96,7 +228,12 @@ def login():
         is_bot = True
         pwd = raw_pass[len(BOT_SECRET_PREFIX):]
     # verify password
-    if not check_password_hash(profile['password_hash'], pwd):
+    try:
+        valid = hash_pool.check(profile['password_hash'], pwd)
+    except PoolBusy:
+        flash('Server busy, please try again')
+        return redirect(url_for('login'))
+    if not valid:
         flash('Invalid username or password')
         return redirect(url_for('login'))
     session['username'] = username
@@ -115,35 +252,26 @@ def lobby():
         return redirect(url_for('index'))
     profile = load_profile(session['username'])
     wins = profile.get('wins', 0) if profile else 0
+    # include awards that are still waiting in the queue
+    wins += win_awards.pending_for(session['username'])
     return render_template('lobby.html', wins=wins, languages=LANGUAGES)
 
 @app.route('/create_game', methods=['POST'])
 def create_game():
     if 'username' not in session:
         return redirect(url_for('index'))
-    # generate unique code
-    while True:
-        code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        if code not in games:
-            break
     # prepare game with selected language word list
     # determine language (default to first available)
     language = request.form.get('language', None)
     if not language or '.' in language:
         language = LANGUAGES[0] if LANGUAGES else None
-    # load words for this language
-    word_list = []
+    # load words for this language (served from the in-memory cache)
+    word_list = ()
     if language:
-        wl_path = os.path.join(WORDS_DIR, f"{language}.txt")
-        try:
-            with open(wl_path) as wf:
-                word_list = [line.strip() for line in wf if line.strip()]
-        except IOError as e:
-            print(e)
-            word_list = []
+        word_list = load_words(language)
     # fallback if needed
     if not word_list:
-        word_list = []
+        word_list = ()
     # pick 25 random words
     words = random.sample(word_list, 25) if len(word_list) >= 25 else random.sample(word_list * 25, 25)
     start_team = random.choice(['red', 'blue'])
@@ -169,21 +297,12 @@ def create_game():
     # determine hard mode (double win points)
     hard_mode = bool(request.form.get('hard_mode'))
     # initialize game state
-    game = {
-        'players': [session['username']],
-        'board': words,
-        'colors': colors_list,
-        'revealed': [False] * 25,
-        'start_team': start_team,
-        'team_color': start_team,
-        'clue_giver': None,
-        'clue': None,
-        'guesses_remaining': 0,
-        'score': 0,
-        'hard_mode': hard_mode,
-        'bots': []
-    }
-    games[code] = game
+    game = Game([session['username']], words, colors_list, start_team, hard_mode)
+    # generate unique code; create() refuses codes that are already taken
+    while True:
+        code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+        if games.create(code, game):
+            break
     return redirect(url_for('game_view', code=code))
 
 @app.route('/join_game', methods=['POST'])
@@ -191,15 +310,17 @@ def join_game():
     if 'username' not in session:
         return redirect(url_for('index'))
     code = request.form.get('code', '').strip().upper()
-    game = games.get(code)
-    if not game or len(game['players']) >= 2:
-        flash('Invalid or full game code')
-        return redirect(url_for('lobby'))
-    if session['username'] in game['players']:
-        return redirect(url_for('game_view', code=code))
-    game['players'].append(session['username'])
-    # assign the joiner as clue giver
-    game['clue_giver'] = session['username']
+    with games.lock(code):
+        game = games.get(code)
+        if not game or len(game.players) >= 2:
+            flash('Invalid or full game code')
+            return redirect(url_for('lobby'))
+        if session['username'] in game.players:
+            return redirect(url_for('game_view', code=code))
+        game.players.append(session['username'])
+        # assign the joiner as clue giver
+        game.clue_giver = session['username']
+        games.save(code, game)
     return redirect(url_for('game_view', code=code))
 
 @app.route('/game/<code>')
@@ -207,10 +328,10 @@ def game_view(code):
     if 'username' not in session:
         return redirect(url_for('index'))
     game = games.get(code)
-    if not game or session['username'] not in game['players']:
+    if not game or session['username'] not in game.players:
         flash('Invalid game access')
         return redirect(url_for('lobby'))
-    player_idx = game['players'].index(session['username'])
+    player_idx = game.players.index(session['username'])
     return render_template('game.html', code=code, username=session['username'], player_idx=player_idx)
 
 @app.route('/add_bot', methods=['POST'])
@@ -219,78 +340,91 @@ def add_bot():
         return redirect(url_for('index'))
     code = request.form.get('code', '').strip().upper()
     game = games.get(code)
-    if not game or session['username'] not in game['players']:
+    if not game or session['username'] not in game.players:
         flash('Invalid game code')
         return redirect(url_for('lobby'))
-    # spawn a bot process to join this game
-    import subprocess, sys, os as _os
-    script = _os.path.join(_os.getcwd(), 'bot.py')
-    # pass secret prefix to bot via environment
-    env = _os.environ.copy()
-    env['BOT_SECRET_PREFIX'] = BOT_SECRET_PREFIX
-    subprocess.Popen([sys.executable, script, code], env=env)
+    # hand the game to the bot pool (native clients, or warm Chromes with BOT_MODE=selenium)
+    bot_pool.submit(code)
     return redirect(url_for('game_view', code=code))
 
+def with_game_lock(handler):
+    # serialise handlers touching the same game, across greenlets and workers
+    @functools.wraps(handler)
+    def wrapper(*args):
+        with games.lock(request.args.get('code', '')):
+            return handler(*args)
+    return wrapper
+
 @socketio.on('join')
-def on_join():
-    code = request.args.get('code')
+@with_game_lock
+def on_join(data=None):
+    code = request.args.get('code', '')
     game = games.get(code)
     username = session.get('username')
-    if not game or username not in game['players']:
+    if not game or username not in game.players:
         return
     # join the game room and record this client's socket id
     join_room(code)
     # map this player's username to their session id for personalized emits
-    game.setdefault('sids', {})[username] = request.sid
+    game.sids[username] = request.sid
     # record bot participants
     if session.get('is_bot'):
-        if 'bots' in game and username not in game['bots']:
-            game['bots'].append(username)
+        if username not in game.bots:
+            game.bots.append(username)
+    games.save(code, game)
     # when both players have joined via WebSocket, send start_game to each individually
     # ensure game has two players and both have connected
-    if len(game.get('players', [])) == 2 and len(game.get('sids', {})) == 2:
-        # common payload for both roles
-        payload_common = {
-            'board': game['board'],
-            'revealed': game['revealed'],
-            'clue_giver': game['clue_giver'],
-            'team_color': game['team_color'],
-            'score': game['score'],
-            'clue': game['clue'],
-            'guesses_remaining': game['guesses_remaining'],
-            'hard_mode': game.get('hard_mode', False)
-        }
-        # send full colors to clue giver, omit for guesser
-        for player, sid in game['sids'].items():
-            data = payload_common.copy()
-            if player == game['clue_giver']:
-                data['colors'] = game['colors']
-            emit('start_game', data, room=sid)
+    if len(game.players) == 2 and len(game.sids) == 2:
+        # a reconnecting client only needs the events after its last seq
+        since = data.get('since') if isinstance(data, dict) else None
+        if isinstance(since, int):
+            missed = game.since(since)
+            if missed is not None:
+                emit('resync', {'events': missed}, room=request.sid)
+                return
+        # cached per-role snapshot; only the clue giver sees colors
+        for player, sid in game.sids.items():
+            emit('start_game', game.snapshot(player == game.clue_giver), room=sid)
+
+@socketio.on('disconnect')
+@with_game_lock
+def on_disconnect(*args):
+    code = request.args.get('code', '')
+    game = games.get(code)
+    username = session.get('username')
+    # forget this socket so the game falls back to the lobby TTL
+    if game and game.sids.get(username) == request.sid:
+        del game.sids[username]
+        games.save(code, game)
 
 @socketio.on('give_clue')
+@with_game_lock
 def on_give_clue(data):
-    code = request.args.get('code')
+    code = request.args.get('code', '')
     game = games.get(code)
     user = session.get('username')
     # only clue giver can send clues
-    if not game or user != game.get('clue_giver'):
+    if not game or user != game.clue_giver:
         return
     clue = data.get('clue')
     try:
         num = int(data.get('number', 0))
     except:
         num = 0
-    game['clue'] = clue
-    game['guesses_remaining'] = num
-    emit('clue_given', {'clue': clue, 'guesses_remaining': num}, room=code)
+    game.clue = clue
+    game.guesses_remaining = num
+    payload = game.record('clue_given', {'clue': clue, 'guesses_remaining': num})
+    games.save(code, game)
+    emit('clue_given', payload, room=code)
 
 @socketio.on('make_guess')
+@with_game_lock
 def on_make_guess(data):
-    code = request.args.get('code')
+    code = request.args.get('code', '')
     game = games.get(code)
     user = session.get('username')
     # only guesser and when guesses remain
-    if not game or user == game.get('clue_giver') or game.get('guesses_remaining', 0) <= 0:
+    if not game or user == game.clue_giver or game.guesses_remaining <= 0:
         return
     # extract index of guessed cell
     try:
@@ -298,79 +432,66 @@ def on_make_guess(data):
     except:
         return
     # validate index and reveal state
-    if idx < 0 or idx >= len(game['board']) or game['revealed'][idx]:
+    if idx < 0 or idx >= len(game.board) or game.is_revealed(idx):
         return
-    word = game['board'][idx]
-    color = game['colors'][idx]
-    game['revealed'][idx] = True
+    word = game.board[idx]
+    color = game.reveal(idx)
     # scoring: +1 for your team, -1 for opponent, 0 for neutral
-    team = game.get('team_color')
+    score_before = game.score
+    team = game.team_color
     if color == team:
-        game['score'] += 1
+        game.score += 1
     elif color != 'neutral':
-        game['score'] -= 1
+        game.score -= 1
     # decrement guesses
-    game['guesses_remaining'] -= 1
+    game.guesses_remaining -= 1
     # check lose condition: assassin, negative score, or opponent pick in hard mode
     opponent = 'red' if team == 'blue' else 'blue'
-    hard_mode = game.get('hard_mode', False)
-    lose_flag = (color == 'assassin' or game['score'] < 0 or (hard_mode and color == opponent))
+    hard_mode = game.hard_mode
+    lose_flag = (color == 'assassin' or game.score < 0 or (hard_mode and color == opponent))
+    # check win condition: all your team words revealed
+    win_flag = game.team_remaining(team) == 0
+    game.finished = lose_flag or win_flag
+    # delta update: only fields that changed, plus the sequence number
+    payload = {
+        'index': idx,
+        'color': color,
+        'guesses_remaining': game.guesses_remaining
+    }
+    if game.score != score_before:
+        payload['score'] = game.score
     if lose_flag:
         # determine lose message
         if hard_mode and color == opponent:
             lose_msg = "Sorry, in Hard Mode you guessed the opposing team's word. You lost!"
         elif color == 'assassin':
             lose_msg = "Sorry, you hit the assassin. You lost!"
-        elif game['score'] < 0:
+        elif game.score < 0:
             lose_msg = "Sorry, your score went negative. You lost!"
         else:
             lose_msg = "Sorry, you lost!"
-        emit('update', {
-            'index': idx,
-            'color': color,
-            'score': game['score'],
-            'guesses_remaining': game['guesses_remaining'],
-            'lose': True,
-            'lose_msg': lose_msg
-        }, room=code)
-        return
-    # check win condition: all your team words revealed
-    win_flag = all(game['revealed'][i] for i, col in enumerate(game['colors']) if col == team)
-    if win_flag:
+        payload['lose'] = True
+        payload['lose_msg'] = lose_msg
+    elif win_flag:
         # award wins (double if hard mode)
-        bonus = 2 if game.get('hard_mode') else 1
-        for p in game['players']:
-            profile = load_profile(p)
-            if profile:
-                profile['wins'] = profile.get('wins', 0) + bonus
-                save_profile(profile)
-        # prepare payload, including flag if bot is in game and hard mode
-        payload = {
-            'index': idx,
-            'color': color,
-            'score': game['score'],
-            'guesses_remaining': game['guesses_remaining'],
-            'win': True,
-            'wins_awarded': bonus
-        }
+        bonus = 2 if game.hard_mode else 1
+        win_awards.award(game.players, bonus)
+        payload['win'] = True
+        payload['wins_awarded'] = bonus
         # cooperative bot wins when human wins
-        if game.get('hard_mode'):
+        if game.hard_mode:
             # include flag if a bot is in this game
-            if game.get('bots'):
+            if game.bots:
                 try:
                     payload['flag'] = os.environ.get("FLAG_2")
                 except Exception:
                     pass
-        emit('update', payload, room=code)
-        return
-    # normal update
-    emit('update', {
-        'index': idx,
-        'color': color,
-        'score': game['score'],
-        'guesses_remaining': game['guesses_remaining'],
-        'win': False
-    }, room=code)
+    game.record('update', payload)
+    games.save(code, game)
+    emit('update', payload, room=code)
+
+metrics.instrument_flask(app)
+socketio.start_background_task(reap_games)
 
 if __name__ == '__main__':
     socketio.run(app)
@@ -0,0 +1,101 @@
+"""
+Password hashing and login rate control for the Codenames server.
+
+Hashing is deliberately slow, so it runs in a small process pool instead
+of on the server's event loop. The caller polls for the result with a
+cooperative sleep, at most max_pending hashes may be queued at once, and
+anything beyond that is refused with PoolBusy. A per-IP token bucket caps
+how fast one client can try passwords.
+"""
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PoolBusy(Exception):
+    pass
+
+
+def _hash(password, method):
+    if method:
+        return generate_password_hash(password, method=method)
+    return generate_password_hash(password)
+
+
+class HashPool:
+    def __init__(self, workers=2, max_pending=64, method=None, sleep=time.sleep, poll=0.002):
+        # werkzeug method string, e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'
+        self.method = method
+        self.max_pending = max_pending
+        self.rejected = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._sleep = sleep
+        self._poll = poll
+        self._executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'))
+        # fork the workers now, before the server starts any other threads
+        list(self._executor.map(abs, range(workers)))
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise PoolBusy()
+            self._pending += 1
+        try:
+            future = self._executor.submit(fn, *args)
+            # yield to other green threads while a worker does the hashing
+            while not future.done():
+                self._sleep(self._poll)
+            return future.result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def check(self, pw_hash, password):
+        # cost parameters are read back from pw_hash, so old hashes keep working
+        return self._run(check_password_hash, pw_hash, password)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class TokenBucketLimiter:
+    """rate tokens per second per key, up to burst; rate <= 0 disables limiting."""
+
+    def __init__(self, rate=5.0, burst=20, max_keys=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.limited = 0
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                self.limited += 1
+                return False
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return True
+
+    def _prune(self, now):
+        # drop buckets that have refilled completely; they hold no state
+        full = self.burst / self.rate
+        for key, (tokens, last) in list(self._buckets.items()):
+            if now - last >= full:
+                del self._buckets[key]
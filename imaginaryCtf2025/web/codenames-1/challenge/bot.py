@@ -1,11 +1,25 @@
 #!/usr/bin/env python3
 """
 Simple Selenium-based bot for joining and playing Codenames games.
-Usage: python3 bot.py <GAME_CODE>
+Usage: python3 bot.py <GAME_CODE> [LIFETIME_SECONDS]
+       python3 bot.py --serve < codes.txt   (warm browser pool, one code per line)
+       python3 bot.py --resolve-driver      (resolve and cache the ChromeDriver path)
+
+Server pushes are captured in the page by wrapping the Socket.IO client
+before main.js loads, and handed to Python callbacks as they arrive, so
+the bot reacts within milliseconds instead of polling the DOM.
+
+In --serve mode BOT_BROWSER_POOL_SIZE headless Chromes are started once and
+every bot runs in a fresh incognito browser context of one of them.
 """
 import sys
+import json
 import time
 import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -14,24 +28,220 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 import random
-import os
 from shutil import which
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: bot.py <GAME_CODE>")
-        sys.exit(1)
-    code = sys.argv[1].strip().upper()
-    # Bot credentials
-    username = f"BOT_{code}_" + os.urandom(4).hex()
-    password = os.environ.get('BOT_SECRET_PREFIX', "") + os.urandom(16).hex()
+# Installed before any page script runs: wraps window.io so every socket
+# forwards its events to window.__botEvents, and turns alerts into events
+# so they cannot block the page.
+HOOK_JS = """
+(function() {
+  window.__botEvents = [];
+  window.__botWaiter = null;
+  function push(name, data) {
+    window.__botEvents.push([name, data === undefined ? null : data]);
+    if (window.__botWaiter) {
+      var waiter = window.__botWaiter;
+      window.__botWaiter = null;
+      waiter(window.__botEvents.splice(0));
+    }
+  }
+  var wrapped;
+  Object.defineProperty(window, 'io', {
+    configurable: true,
+    get: function() { return wrapped; },
+    set: function(real) {
+      wrapped = function() {
+        var socket = real.apply(this, arguments);
+        socket.onAny(push);
+        return socket;
+      };
+      Object.assign(wrapped, real);
+    }
+  });
+  window.alert = function(msg) { push('alert', msg); };
+})();
+"""
+
+# Resolves with the queued events, or waits for the next one
+WAIT_JS = """
+var done = arguments[arguments.length - 1];
+if (location.pathname.indexOf('/game/') !== 0) { return done([['left', location.pathname]]); }
+if (window.__botEvents.length) { return done(window.__botEvents.splice(0)); }
+window.__botWaiter = done;
+"""
+
+
+# Where a resolved ChromeDriver path is remembered between runs
+DRIVER_CACHE = os.environ.get('CHROMEDRIVER_CACHE', os.path.expanduser('~/.cache/codenames-chromedriver.json'))
+
+
+def resolve_driver_path():
+    """CHROMEDRIVER_PATH, else the cached path, else PATH, else webdriver_manager."""
+    path = os.environ.get('CHROMEDRIVER_PATH')
+    if path:
+        return path
+    try:
+        with open(DRIVER_CACHE) as f:
+            path = json.load(f).get('path')
+        if path and os.path.exists(path):
+            return path
+    except (IOError, ValueError):
+        pass
+    # webdriver_manager may hit the network, so only fall back to it once
+    path = which('chromedriver') or ChromeDriverManager().install()
+    try:
+        os.makedirs(os.path.dirname(DRIVER_CACHE), exist_ok=True)
+        with open(DRIVER_CACHE, 'w') as f:
+            json.dump({'path': path}, f)
+    except IOError as e:
+        print(f"could not cache driver path: {e}")
+    return path
+
+
+def new_browser(driver_path):
     # Setup Selenium WebDriver (headless Chromium)
     options = Options()
     options.add_argument('--headless')
     options.add_argument('--no-sandbox')
     options.add_argument('--disable-dev-shm-usage')
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    return webdriver.Chrome(service=Service(driver_path), options=options)
+
+
+class BrowserPool:
+    """Warm headless Chromes; each bot borrows one and plays in a fresh incognito context."""
+
+    def __init__(self, size, driver_path=None, samples=1000):
+        self.size = size
+        self.driver_path = driver_path or resolve_driver_path()
+        # holds drivers, or None for a slot whose browser must be (re)launched
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        # seconds spent starting each browser, and per bot until its context was ready;
+        # only the latest `samples` are kept
+        self.browser_startup = deque(maxlen=samples)
+        self.context_startup = deque(maxlen=samples)
+
+    def _launch(self):
+        t0 = time.monotonic()
+        driver = new_browser(self.driver_path)
+        elapsed = time.monotonic() - t0
+        with self._lock:
+            self.browser_startup.append(elapsed)
+        print(f"browser started in {elapsed * 1000:.0f} ms")
+        return driver
+
+    def _replace(self):
+        """A fresh browser, or None so the slot is retried by the next bot instead of lost."""
+        try:
+            return self._launch()
+        except Exception as e:
+            print(f"browser launch failed, will retry on next bot: {e}")
+            return None
+
+    def warm(self):
+        with ThreadPoolExecutor(self.size) as ex:
+            for driver in ex.map(lambda _: self._replace(), range(self.size)):
+                self._idle.put(driver)
+
+    def startup_summary(self):
+        """Median and max of the kept startup timings, in ms."""
+        with self._lock:
+            timings = {'browser': sorted(self.browser_startup), 'context': sorted(self.context_startup)}
+        return {name: (values[len(values) // 2] * 1000, values[-1] * 1000)
+                for name, values in timings.items() if values}
+
+    def run(self, fn, *args):
+        """Call fn(driver, *args) inside a fresh incognito context."""
+        t0 = time.monotonic()
+        driver = self._idle.get()
+        healthy = True
+        try:
+            if driver is None:
+                driver = self._launch()
+            home = driver.current_window_handle
+            ctx = driver.execute_cdp_cmd('Target.createBrowserContext', {'disposeOnDetach': True})
+            context_id = ctx['browserContextId']
+            target = driver.execute_cdp_cmd('Target.createTarget', {'url': 'about:blank', 'browserContextId': context_id})
+            handle = next((h for h in driver.window_handles if target['targetId'] in h), None)
+            if handle is None:
+                raise WebDriverException('incognito window not visible to chromedriver')
+            driver.switch_to.window(handle)
+            elapsed = time.monotonic() - t0
+            with self._lock:
+                self.context_startup.append(elapsed)
+            print(f"bot context ready in {elapsed * 1000:.0f} ms")
+            try:
+                return fn(driver, *args)
+            except Exception as e:
+                print(f"bot failed: {e}")
+            finally:
+                driver.close()
+                driver.switch_to.window(home)
+                driver.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': context_id})
+        except (WebDriverException, OSError) as e:
+            print(f"browser failed, replacing it: {e}")
+            healthy = False
+        finally:
+            if not healthy:
+                if driver is not None:
+                    try:
+                        driver.quit()
+                    except Exception:
+                        pass
+                driver = self._replace()
+            self._idle.put(driver)
+
+    def close(self):
+        while not self._idle.empty():
+            driver = self._idle.get()
+            if driver is not None:
+                driver.quit()
+
+
+class GameEvents:
+    """Dispatches server pushes seen by the page to registered callbacks."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.handlers = {}
+        self.running = False
+
+    def on(self, name, fn):
+        self.handlers[name] = fn
+
+    def stop(self):
+        self.running = False
+
+    def run(self, lifetime):
+        deadline = time.monotonic() + lifetime
+        self.running = True
+        while self.running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print("quitting...")
+                return
+            self.driver.set_script_timeout(remaining)
+            try:
+                events = self.driver.execute_async_script(WAIT_JS)
+            except TimeoutException:
+                print("quitting...")
+                return
+            except WebDriverException:
+                # page navigated away mid-wait, i.e. the game ended
+                return
+            for name, data in events:
+                handler = self.handlers.get(name)
+                if handler:
+                    handler(data)
+                if not self.running:
+                    return
+
+def play(driver, code, lifetime):
+    # Bot credentials
+    username = f"BOT_{code}_" + os.urandom(4).hex()
+    password = os.environ.get('BOT_SECRET_PREFIX', "") + os.urandom(16).hex()
+    driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': HOOK_JS})
     base_url = os.environ.get('BOT_BASE_URL', 'http://localhost:5000')
     try:
         # Register bot
@@ -61,22 +271,11 @@ def main():
     driver.find_element(By.CSS_SELECTOR, 'form[action="/join_game"] button[type="submit"]').click()
     # Wait for game page
     WebDriverWait(driver, 10).until(EC.url_contains(f'/game/{code}'))
-    # Main loop: give clues until game ends
-    ctr = 0
-    while True:
-        # check for timeout
-        if ctr > 30:
-            print("quitting...")
-            driver.quit()
-            exit()
-        # check for end-game alert
-        try:
-            alert = WebDriverWait(driver, 1).until(EC.alert_is_present())
-            alert.accept()
-            break
-        except TimeoutException:
-            pass
-        # attempt to send a clue if form is available
+    # React to server pushes: give clues whenever it is our turn
+    events = GameEvents(driver)
+    state = {'clue_giver': None}
+
+    def give_clue():
         try:
             clue_box = driver.find_element(By.ID, 'clue_word')
             num_box = driver.find_element(By.ID, 'clue_num')
@@ -91,9 +290,57 @@ def main():
                 send_btn.click()
         except NoSuchElementException:
             pass
-        time.sleep(1)
-        ctr += 1
-    driver.quit()
+
+    def on_start(data):
+        state['clue_giver'] = data.get('clue_giver')
+        if state['clue_giver'] == username:
+            give_clue()
+
+    def on_update(data):
+        if data.get('win') or data.get('lose'):
+            events.stop()
+        elif state['clue_giver'] == username and data.get('guesses_remaining', 0) <= 0:
+            give_clue()
+
+    events.on('start_game', on_start)
+    events.on('update', on_update)
+    events.on('alert', lambda msg: events.stop())
+    events.on('left', lambda path: events.stop())
+    events.run(lifetime)
+
+
+def serve(lifetime):
+    pool = BrowserPool(int(os.environ.get('BOT_BROWSER_POOL_SIZE', '2')))
+    pool.warm()
+    with ThreadPoolExecutor(pool.size) as ex:
+        for line in sys.stdin:
+            code = line.strip().upper()
+            if code:
+                ex.submit(pool.run, play, code, lifetime)
+    pool.close()
+    for name, (p50, worst) in pool.startup_summary().items():
+        print(f"{name} startup: p50 {p50:.0f} ms, max {worst:.0f} ms")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: bot.py <GAME_CODE> [LIFETIME] | --serve | --resolve-driver")
+        sys.exit(1)
+    if sys.argv[1] == '--resolve-driver':
+        print(resolve_driver_path())
+        return
+    lifetime = float(sys.argv[2]) if len(sys.argv) > 2 else float(os.environ.get('BOT_LIFETIME', '30'))
+    if sys.argv[1] == '--serve':
+        serve(lifetime)
+        return
+    code = sys.argv[1].strip().upper()
+    t0 = time.monotonic()
+    driver = new_browser(resolve_driver_path())
+    print(f"browser started in {(time.monotonic() - t0) * 1000:.0f} ms")
+    try:
+        play(driver, code, lifetime)
+    finally:
+        driver.quit()
 
 if __name__ == '__main__':
     main()
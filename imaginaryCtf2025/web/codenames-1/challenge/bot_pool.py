@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Native Codenames bots: plain HTTP + Socket.IO clients, no browser.
+
+All bots run as asyncio tasks inside one long-lived helper process, so the
+server's event loop never runs bot code and no Chrome is started per bot.
+The server feeds game codes to the helper's stdin, one per line. At most
+BOT_POOL_SIZE bots play at once; further games wait their turn.
+
+Usage (standalone, against a running server):
+  BOT_BASE_URL=http://localhost:5000 python3 bot_pool.py <GAME_CODE> [...]
+  BOT_BASE_URL=http://localhost:5000 python3 bot_pool.py --serve < codes.txt
+"""
+import os
+import sys
+import random
+import asyncio
+import subprocess
+
+
+async def play_game(base_url, code, secret_prefix='', lifetime=30.0):
+    """Register a bot, join game `code` and give clues until it ends."""
+    import aiohttp
+    import socketio
+
+    username = f"BOT_{code}_" + os.urandom(4).hex()
+    password = secret_prefix + os.urandom(16).hex()
+    creds = {'username': username, 'password': password}
+    jar = aiohttp.CookieJar(unsafe=True)
+    async with aiohttp.ClientSession(cookie_jar=jar) as http:
+        async with http.post(f"{base_url}/register", data=creds) as r:
+            landed = str(r.url)
+        # Login if not redirected to lobby
+        if '/lobby' not in landed:
+            async with http.post(f"{base_url}/login", data=creds) as r:
+                if '/lobby' not in str(r.url):
+                    raise RuntimeError(f"bot login failed for {code}")
+        async with http.post(f"{base_url}/join_game", data={'code': code}) as r:
+            if f'/game/{code}' not in str(r.url):
+                raise RuntimeError(f"bot could not join {code}")
+        cookie = '; '.join(f"{c.key}={c.value}" for c in jar)
+
+    sio = socketio.AsyncClient(reconnection=False)
+    done = asyncio.Event()
+    state = {'clue_giver': None}
+
+    async def give_clue():
+        # arbitrary clue with random count 1-3, like the Selenium bot
+        await sio.emit('give_clue', {'clue': 'potato', 'number': random.randint(1, 3)})
+
+    @sio.event
+    async def connect():
+        await sio.emit('join')
+
+    @sio.event
+    async def disconnect(*args):
+        done.set()
+
+    @sio.on('start_game')
+    async def on_start(data):
+        state['clue_giver'] = data.get('clue_giver')
+        if state['clue_giver'] == username and data.get('guesses_remaining', 0) <= 0:
+            await give_clue()
+
+    @sio.on('update')
+    async def on_update(data):
+        if data.get('win') or data.get('lose'):
+            done.set()
+            return
+        if state['clue_giver'] == username and data.get('guesses_remaining', 0) <= 0:
+            await give_clue()
+
+    await sio.connect(f"{base_url}?code={code}", headers={'Cookie': cookie})
+    try:
+        await asyncio.wait_for(done.wait(), lifetime)
+    except asyncio.TimeoutError:
+        print(f"bot {username}: lifetime exceeded, quitting")
+    finally:
+        await sio.disconnect()
+
+
+async def serve(base_url, secret_prefix='', max_concurrency=32, lifetime=30.0):
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(max_concurrency)
+    tasks = set()
+
+    async def run(code):
+        async with slots:
+            try:
+                await play_game(base_url, code, secret_prefix, lifetime)
+            except Exception as e:
+                print(f"bot for {code} failed: {e}")
+
+    while True:
+        line = await loop.run_in_executor(None, sys.stdin.readline)
+        if not line:
+            break
+        code = line.strip().upper()
+        if not code:
+            continue
+        task = asyncio.create_task(run(code))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+class BotPool:
+    def __init__(self, base_url, secret_prefix='', max_concurrency=32, lifetime=30.0, script=None):
+        self.base_url = base_url.rstrip('/')
+        # any script accepting codes on stdin with --serve, e.g. bot.py for Selenium bots
+        self.script = os.path.abspath(script or __file__)
+        self.secret_prefix = secret_prefix
+        self.max_concurrency = max_concurrency
+        self.lifetime = lifetime
+        self.submitted = 0
+        self._proc = None
+
+    def _ensure_worker(self):
+        if self._proc is not None and self._proc.poll() is None:
+            return
+        # pass secret prefix and pool settings to the helper via environment
+        env = os.environ.copy()
+        env['BOT_BASE_URL'] = self.base_url
+        env['BOT_SECRET_PREFIX'] = self.secret_prefix
+        env['BOT_POOL_SIZE'] = str(self.max_concurrency)
+        env['BOT_LIFETIME'] = str(self.lifetime)
+        self._proc = subprocess.Popen(
+            [sys.executable, self.script, '--serve'],
+            stdin=subprocess.PIPE, env=env, text=True,
+        )
+
+    def submit(self, code):
+        self._ensure_worker()
+        self._proc.stdin.write(code + '\n')
+        self._proc.stdin.flush()
+        self.submitted += 1
+
+    def close(self, timeout=None):
+        """Let running bots finish, then stop the helper process."""
+        if self._proc is None:
+            return
+        self._proc.stdin.close()
+        self._proc.wait(timeout)
+        self._proc = None
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: bot_pool.py <GAME_CODE> [...] | --serve")
+        sys.exit(1)
+    base_url = os.environ.get('BOT_BASE_URL', 'http://localhost:5000')
+    prefix = os.environ.get('BOT_SECRET_PREFIX', '')
+    lifetime = float(os.environ.get('BOT_LIFETIME', '30'))
+    if sys.argv[1] == '--serve':
+        pool_size = int(os.environ.get('BOT_POOL_SIZE', '32'))
+        asyncio.run(serve(base_url, prefix, pool_size, lifetime))
+        return
+
+    async def run_all():
+        await asyncio.gather(*(
+            play_game(base_url, code.strip().upper(), prefix, lifetime) for code in sys.argv[1:]
+        ))
+    asyncio.run(run_all())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+Compact per-game state for the Codenames server.
+
+Colors are stored as one byte per cell and revealed cells as a bitmask, and
+per-team counters of unrevealed words make the win check O(1).
+
+Every broadcast is recorded with a sequence number (the game version), so
+a reconnecting client can be sent just the events it missed, and the
+start_game payload for each role is built once per version.
+"""
+import time
+
+COLOR_NAMES = ('red', 'blue', 'neutral', 'assassin')
+COLOR_CODES = {name: code for code, name in enumerate(COLOR_NAMES)}
+RED, BLUE, NEUTRAL, ASSASSIN = range(4)
+# recorded events kept per game for resync; older clients get a full snapshot
+HISTORY_LIMIT = 64
+
+
+class Game:
+    __slots__ = (
+        'players', 'board', 'colors', 'revealed', 'remaining',
+        'start_team', 'team_color', 'clue_giver', 'clue',
+        'guesses_remaining', 'score', 'hard_mode', 'bots', 'sids',
+        'finished', 'touched', 'version', 'history', '_snapshots',
+    )
+    # everything but the snapshot cache goes into to_dict()
+    PERSISTED = __slots__[:-1]
+
+    def __init__(self, players, board, colors, start_team, hard_mode=False):
+        self.players = list(players)
+        self.board = tuple(board)
+        # one byte per cell, see COLOR_NAMES
+        self.colors = bytes(COLOR_CODES[c] for c in colors)
+        # bit i set once cell i has been guessed
+        self.revealed = 0
+        # unrevealed words left per team, indexed by RED / BLUE
+        self.remaining = [self.colors.count(RED), self.colors.count(BLUE)]
+        self.start_team = start_team
+        self.team_color = start_team
+        self.clue_giver = None
+        self.clue = None
+        self.guesses_remaining = 0
+        self.score = 0
+        self.hard_mode = hard_mode
+        self.bots = []
+        self.sids = {}
+        self.finished = False
+        # wall-clock time of the last change, used for idle eviction
+        self.touched = time.time()
+        self.version = 0
+        # [version, event, payload] for the last HISTORY_LIMIT broadcasts
+        self.history = []
+        self._snapshots = None
+
+    def phase(self):
+        """'lobby' until both players are connected, then 'playing', then 'finished'."""
+        if self.finished:
+            return 'finished'
+        if len(self.players) < 2 or len(self.sids) < 2:
+            return 'lobby'
+        return 'playing'
+
+    def is_revealed(self, idx):
+        return bool(self.revealed >> idx & 1)
+
+    def color(self, idx):
+        return COLOR_NAMES[self.colors[idx]]
+
+    def reveal(self, idx):
+        """Mark cell idx as guessed and return its color name."""
+        self.revealed |= 1 << idx
+        code = self.colors[idx]
+        if code == RED or code == BLUE:
+            self.remaining[code] -= 1
+        return COLOR_NAMES[code]
+
+    def team_remaining(self, team):
+        return self.remaining[COLOR_CODES[team]]
+
+    def record(self, event, payload):
+        """Stamp payload with the next sequence number and remember it for resync."""
+        self.version += 1
+        payload['seq'] = self.version
+        self.history.append([self.version, event, payload])
+        if len(self.history) > HISTORY_LIMIT:
+            del self.history[0]
+        return payload
+
+    def since(self, version):
+        """[event, payload] pairs after version, or None if they are no longer kept."""
+        if version > self.version:
+            return None
+        if version == self.version:
+            return []
+        if not self.history or self.history[0][0] > version + 1:
+            return None
+        return [[event, payload] for v, event, payload in self.history if v > version]
+
+    def snapshot(self, clue_giver):
+        """start_game payload for one role, cached until the game changes."""
+        key = (self.version, self.clue_giver)
+        if self._snapshots is None or self._snapshots['key'] != key:
+            self._snapshots = {'key': key}
+        role = 'giver' if clue_giver else 'guesser'
+        snap = self._snapshots.get(role)
+        if snap is None:
+            snap = {
+                'board': self.board,
+                'revealed': self.revealed_list(),
+                'clue_giver': self.clue_giver,
+                'team_color': self.team_color,
+                'score': self.score,
+                'clue': self.clue,
+                'guesses_remaining': self.guesses_remaining,
+                'hard_mode': self.hard_mode,
+                'seq': self.version,
+            }
+            # send full colors to clue giver, omit for guesser
+            if clue_giver:
+                snap['colors'] = self.color_list()
+            self._snapshots[role] = snap
+        return snap
+
+    def color_list(self):
+        return [COLOR_NAMES[c] for c in self.colors]
+
+    def revealed_list(self):
+        return [bool(self.revealed >> i & 1) for i in range(len(self.board))]
+
+    def to_dict(self):
+        return {
+            'players': self.players,
+            'board': list(self.board),
+            'colors': self.colors.hex(),
+            'revealed': self.revealed,
+            'remaining': self.remaining,
+            'start_team': self.start_team,
+            'team_color': self.team_color,
+            'clue_giver': self.clue_giver,
+            'clue': self.clue,
+            'guesses_remaining': self.guesses_remaining,
+            'score': self.score,
+            'hard_mode': self.hard_mode,
+            'bots': self.bots,
+            'sids': self.sids,
+            'finished': self.finished,
+            'touched': self.touched,
+            'version': self.version,
+            'history': self.history,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        game = cls.__new__(cls)
+        for name in cls.PERSISTED:
+            setattr(game, name, data[name])
+        game._snapshots = None
+        game.board = tuple(game.board)
+        game.colors = bytes.fromhex(game.colors)
+        return game
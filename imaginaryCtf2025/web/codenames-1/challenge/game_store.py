@@ -0,0 +1,239 @@
+"""
+Game state storage for the Codenames server.
+
+Backends (selected with GAME_STORE):
+  memory  games live in a dict inside this process (default)
+  redis   games are JSON-encoded Game.to_dict() blobs in one or more Redis-compatible servers,
+          sharded by game code, so several workers can serve the same game
+
+Handlers read a game with get(), mutate it, and write it back with save()
+while holding lock(code), so concurrent guesses cannot lose updates.
+
+Idle games expire after a per-phase TTL (see Game.phase()): the memory
+backend keeps games in LRU order and reap() drops expired ones from the
+cold end, the redis backend sets a key expiry on every write.
+"""
+import os
+import json
+import time
+import uuid
+import zlib
+import threading
+from collections import OrderedDict
+
+from game_state import Game
+
+
+# idle seconds before a game is evicted, per phase
+DEFAULT_TTLS = {'lobby': 600, 'playing': 3600, 'finished': 60}
+
+
+def shard_index(code, n):
+    """Stable shard for a game code; also usable by a code-aware load balancer."""
+    return zlib.crc32(code.encode()) % n
+
+
+class GameStore:
+    def __init__(self, ttls=None):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        # games evicted by reap(), per phase
+        self.evicted = {phase: 0 for phase in self.ttls}
+
+    def ttl(self, game):
+        return self.ttls[game.phase()]
+
+    def reap(self, now=None):
+        """Drop games idle for longer than their phase TTL; returns their codes."""
+        return []
+
+    def live(self):
+        return len(self.codes())
+
+    def get(self, code):
+        raise NotImplementedError
+
+    def save(self, code, game):
+        raise NotImplementedError
+
+    def create(self, code, game):
+        """Store a new game; returns False if the code is already taken."""
+        raise NotImplementedError
+
+    def delete(self, code):
+        raise NotImplementedError
+
+    def codes(self):
+        raise NotImplementedError
+
+    def lock(self, code):
+        raise NotImplementedError
+
+    def __contains__(self, code):
+        return self.get(code) is not None
+
+
+class InProcessGameStore(GameStore):
+    # striped locks so the lock table does not grow with the number of games
+    LOCK_STRIPES = 64
+
+    def __init__(self, ttls=None):
+        super().__init__(ttls)
+        # least recently touched first
+        self._games = OrderedDict()
+        self._guard = threading.Lock()
+        self._locks = [threading.RLock() for _ in range(self.LOCK_STRIPES)]
+
+    def get(self, code):
+        # the live object is returned, save() only has to store new games
+        return self._games.get(code)
+
+    def save(self, code, game):
+        game.touched = time.time()
+        with self._guard:
+            self._games[code] = game
+            self._games.move_to_end(code)
+
+    def create(self, code, game):
+        game.touched = time.time()
+        with self._guard:
+            if code in self._games:
+                return False
+            self._games[code] = game
+            return True
+
+    def delete(self, code):
+        with self._guard:
+            self._games.pop(code, None)
+
+    def reap(self, now=None):
+        now = time.time() if now is None else now
+        shortest = min(self.ttls.values())
+        reaped = []
+        with self._guard:
+            for code, game in list(self._games.items()):
+                idle = now - game.touched
+                # everything after this entry was touched even more recently
+                if idle < shortest:
+                    break
+                phase = game.phase()
+                if idle >= self.ttls[phase]:
+                    del self._games[code]
+                    self.evicted[phase] += 1
+                    reaped.append(code)
+        return reaped
+
+    def live(self):
+        return len(self._games)
+
+    def codes(self):
+        return list(self._games)
+
+    def lock(self, code):
+        return self._locks[shard_index(code, self.LOCK_STRIPES)]
+
+    def __len__(self):
+        return len(self._games)
+
+
+class RedisGameStore(GameStore):
+    """Games stored under '<prefix><code>' on the shard chosen by shard_index().
+
+    Works with anything speaking the redis-py client API, e.g. redis.Redis
+    or fakeredis.FakeRedis for local testing.
+    """
+
+    def __init__(self, urls=None, clients=None, prefix='codenames:game:', lock_timeout=10, ttls=None):
+        super().__init__(ttls)
+        if clients is None:
+            import redis
+            clients = [redis.Redis.from_url(url) for url in urls]
+        if not clients:
+            raise ValueError('RedisGameStore needs at least one server')
+        self.clients = list(clients)
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+
+    def _client(self, code):
+        return self.clients[shard_index(code, len(self.clients))]
+
+    def get(self, code):
+        raw = self._client(code).get(self.prefix + code)
+        if raw is None:
+            return None
+        return Game.from_dict(json.loads(raw))
+
+    def save(self, code, game):
+        game.touched = time.time()
+        self._client(code).set(self.prefix + code, json.dumps(game.to_dict()), ex=self.ttl(game))
+
+    def create(self, code, game):
+        game.touched = time.time()
+        return bool(self._client(code).set(
+            self.prefix + code, json.dumps(game.to_dict()), nx=True, ex=self.ttl(game)))
+
+    def delete(self, code):
+        self._client(code).delete(self.prefix + code)
+
+    def codes(self):
+        out = []
+        for client in self.clients:
+            for key in client.scan_iter(match=self.prefix + '*'):
+                if isinstance(key, bytes):
+                    key = key.decode()
+                out.append(key[len(self.prefix):])
+        return out
+
+    def lock(self, code):
+        return RedisLock(self._client(code), 'codenames:lock:' + code, self.lock_timeout)
+
+
+class RedisLock:
+    """SET NX PX lock released with WATCH/MULTI instead of a Lua script,
+    so it also runs against stand-ins without scripting support."""
+
+    def __init__(self, client, name, timeout, poll=0.005):
+        self.client = client
+        self.name = name
+        self.timeout = timeout
+        self.poll = poll
+        self.token = None
+
+    def __enter__(self):
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.timeout
+        while not self.client.set(self.name, token, nx=True, px=int(self.timeout * 1000)):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"could not lock {self.name}")
+            time.sleep(self.poll)
+        self.token = token
+        return self
+
+    def __exit__(self, *exc):
+        import redis
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(self.name)
+                current = pipe.get(self.name)
+                if isinstance(current, bytes):
+                    current = current.decode()
+                if current == self.token:
+                    pipe.multi()
+                    pipe.delete(self.name)
+                    pipe.execute()
+            except redis.WatchError:
+                # the lock expired and was taken by someone else
+                pass
+        self.token = None
+        return False
+
+
+def open_game_store(kind=None):
+    kind = kind or os.environ.get('GAME_STORE', 'memory')
+    ttls = {phase: int(os.environ.get(f'GAME_TTL_{phase.upper()}', ttl))
+            for phase, ttl in DEFAULT_TTLS.items()}
+    if kind == 'memory':
+        return InProcessGameStore(ttls)
+    if kind == 'redis':
+        urls = os.environ.get('GAME_STORE_URLS', 'redis://localhost:6379/0')
+        return RedisGameStore([u.strip() for u in urls.split(',') if u.strip()], ttls=ttls)
+    raise ValueError(f"unknown game store: {kind}")
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Load generator for the Codenames server.
+
+Plays N two-player games against a running instance over HTTP and
+Socket.IO, with the clue giver steering the guesser onto its own team's
+words so every game runs to a win, and reports latency percentiles for
+create_game, join_game and make_guess plus Socket.IO events per second.
+
+Start the server with LOGIN_RATE=0, otherwise the per-IP login limiter
+throttles the registrations done here.
+
+Usage:
+  python3 loadtest.py [base_url] [--games N] [--concurrency C] [--language en]
+"""
+import os
+import math
+import time
+import asyncio
+import argparse
+from collections import defaultdict
+
+import aiohttp
+import socketio
+
+
+def percentile(values, p):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    # nearest rank: the smallest value with at least p% of values at or below it
+    k = max(0, math.ceil(p / 100.0 * len(values)) - 1)
+    return values[k]
+
+
+class Player:
+    def __init__(self, base, stats):
+        self.base = base
+        self.stats = stats
+        self.username = 'load_' + os.urandom(6).hex()
+        self.jar = aiohttp.CookieJar(unsafe=True)
+        self.http = aiohttp.ClientSession(cookie_jar=self.jar)
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.inbox = defaultdict(asyncio.Queue)
+
+        @self.sio.on('*')
+        async def on_any(event, data=None):
+            self.stats['events'] += 1
+            await self.inbox[event].put(data)
+
+        @self.sio.event
+        async def connect():
+            await self.sio.emit('join', {})
+
+    async def register(self):
+        creds = {'username': self.username, 'password': 'loadtest-' + os.urandom(4).hex()}
+        async with self.http.post(f"{self.base}/register", data=creds) as r:
+            if '/lobby' not in str(r.url):
+                raise RuntimeError(f"register failed: HTTP {r.status}")
+
+    async def create_game(self, language):
+        t0 = time.perf_counter()
+        async with self.http.post(f"{self.base}/create_game", data={'language': language}) as r:
+            url = str(r.url)
+        self.stats['create_game'].append(time.perf_counter() - t0)
+        if '/game/' not in url:
+            raise RuntimeError('create_game did not redirect to a game')
+        return url.rsplit('/', 1)[1]
+
+    async def join_game(self, code):
+        t0 = time.perf_counter()
+        async with self.http.post(f"{self.base}/join_game", data={'code': code}) as r:
+            url = str(r.url)
+        self.stats['join_game'].append(time.perf_counter() - t0)
+        if f'/game/{code}' not in url:
+            raise RuntimeError(f"join_game failed for {code}")
+
+    async def connect(self, code):
+        cookie = '; '.join(f"{c.key}={c.value}" for c in self.jar)
+        await self.sio.connect(f"{self.base}?code={code}", headers={'Cookie': cookie}, transports=['websocket'])
+
+    async def wait(self, event, timeout=10):
+        return await asyncio.wait_for(self.inbox[event].get(), timeout)
+
+    async def close(self):
+        await self.sio.disconnect()
+        await self.http.close()
+
+
+async def play_one(base, language, stats):
+    guesser, giver = Player(base, stats), Player(base, stats)
+    try:
+        await guesser.register()
+        await giver.register()
+        code = await guesser.create_game(language)
+        await giver.join_game(code)
+        await guesser.connect(code)
+        await giver.connect(code)
+        start = await giver.wait('start_game')
+        await guesser.wait('start_game')
+        team = start['team_color']
+        targets = [i for i, c in enumerate(start['colors']) if c == team]
+        while targets:
+            n = min(3, len(targets))
+            await giver.sio.emit('give_clue', {'clue': 'load', 'number': n})
+            await guesser.wait('clue_given')
+            for _ in range(n):
+                idx = targets.pop()
+                t0 = time.perf_counter()
+                await guesser.sio.emit('make_guess', {'index': idx})
+                update = await guesser.wait('update')
+                stats['make_guess'].append(time.perf_counter() - t0)
+                if update.get('win') or update.get('lose'):
+                    targets = []
+                    break
+        stats['games'] += 1
+    except Exception as e:
+        stats['errors'] += 1
+        print(f"game failed: {e!r}")
+    finally:
+        await guesser.close()
+        await giver.close()
+
+
+async def run(base, games, concurrency, language):
+    stats = defaultdict(list)
+    stats['events'] = stats['games'] = stats['errors'] = 0
+    slots = asyncio.Semaphore(concurrency)
+
+    async def bounded():
+        async with slots:
+            await play_one(base, language, stats)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(bounded() for _ in range(games)))
+    elapsed = time.perf_counter() - t0
+
+    print(f"{stats['games']} games ok, {stats['errors']} failed in {elapsed:.2f}s")
+    print(f"{'operation':<12} {'count':>6} {'p50 ms':>9} {'p99 ms':>9}")
+    for op in ('create_game', 'join_game', 'make_guess'):
+        lat = stats[op]
+        print(f"{op:<12} {len(lat):>6} {percentile(lat, 50) * 1000:>9.2f} {percentile(lat, 99) * 1000:>9.2f}")
+    print(f"socket.io events received: {stats['events']} ({stats['events'] / elapsed:.1f}/s)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('base', nargs='?', default='http://localhost:5000')
+    ap.add_argument('--games', type=int, default=50)
+    ap.add_argument('--concurrency', type=int, default=10)
+    ap.add_argument('--language', default='en')
+    args = ap.parse_args()
+    asyncio.run(run(args.base.rstrip('/'), args.games, args.concurrency, args.language))
+
+
+if __name__ == '__main__':
+    main()
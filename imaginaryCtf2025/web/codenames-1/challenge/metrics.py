@@ -0,0 +1,214 @@
+"""
+Hot-path instrumentation for the Codenames server.
+
+Every Flask view and Socket.IO handler is timed into a fixed-bucket
+histogram, with error and payload-size counters, and everything is
+rendered in Prometheus text format. Recording is a bisect and a few dict
+updates per call, so it can stay on in production.
+
+An optional SIGPROF sampling profiler (METRICS_PROFILE_HZ > 0) counts the
+stacks that are on-CPU; /metrics/profile returns them in collapsed-stack
+format for flamegraph tools.
+"""
+import json
+import time
+import atexit
+import signal
+import bisect
+import functools
+import threading
+from collections import defaultdict
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# upper bounds for the number of events a room has handled
+ROOM_EVENT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+def _payload_size(args):
+    size = 0
+    for arg in args:
+        if isinstance(arg, (str, bytes)):
+            size += len(arg)
+        elif arg is not None:
+            size += len(json.dumps(arg, separators=(',', ':'), default=str))
+    return size
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}'
+
+
+class Metrics:
+    def __init__(self, room_idle=3600):
+        self._lock = threading.Lock()
+        # (kind, name) -> [bucket counts..., sum, count]
+        self._hist = {}
+        self._errors = defaultdict(int)
+        self._payload_bytes = defaultdict(int)
+        # room -> [events, last seen]; rooms quiet for room_idle seconds are
+        # dropped, since not every game store reports the games it evicts
+        self._room_events = {}
+        self.room_idle = room_idle
+        self._rooms_swept = time.monotonic()
+        self._collectors = []
+        self._samples = defaultdict(int)
+        self.profile_hz = 0
+
+    def observe(self, kind, name, seconds, payload=0, error=False):
+        with self._lock:
+            hist = self._hist.get((kind, name))
+            if hist is None:
+                hist = self._hist[(kind, name)] = [0] * (len(BUCKETS) + 3)
+            hist[bisect.bisect_left(BUCKETS, seconds)] += 1
+            hist[-2] += seconds
+            hist[-1] += 1
+            if payload:
+                self._payload_bytes[(kind, name)] += payload
+            if error:
+                self._errors[(kind, name)] += 1
+
+    def count_room_event(self, room):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._room_events.get(room)
+            if entry is None:
+                self._room_events[room] = [1, now]
+            else:
+                entry[0] += 1
+                entry[1] = now
+            if now - self._rooms_swept > self.room_idle / 10:
+                self._expire_rooms(now)
+
+    def _expire_rooms(self, now):
+        # caller holds the lock
+        self._rooms_swept = now
+        cutoff = now - self.room_idle
+        for room in [r for r, (_, seen) in self._room_events.items() if seen < cutoff]:
+            del self._room_events[room]
+
+    def forget_room(self, room):
+        with self._lock:
+            self._room_events.pop(room, None)
+
+    def add_collector(self, fn):
+        """fn() -> iterable of (name, type, value, labels-dict) for gauges and counters."""
+        self._collectors.append(fn)
+
+    def _wrap(self, kind, name, fn, payload_of, room_of=None):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            error = False
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                self.observe(kind, name, time.perf_counter() - t0, payload_of(args), error)
+                if room_of is not None:
+                    room = room_of()
+                    if room:
+                        self.count_room_event(room)
+        return wrapper
+
+    def instrument_socketio(self, socketio, room_of=None):
+        """Replace socketio.on so handlers registered afterwards are timed."""
+        register = socketio.on
+
+        def on(message, namespace=None):
+            def decorator(handler):
+                register(message, namespace)(
+                    self._wrap('socketio', message, handler, _payload_size, room_of))
+                return handler
+            return decorator
+        socketio.on = on
+
+    def instrument_flask(self, app):
+        """Wrap every view function registered so far."""
+        from flask import request
+        for endpoint, view in list(app.view_functions.items()):
+            app.view_functions[endpoint] = self._wrap(
+                'http', endpoint, view, lambda args: request.content_length or 0)
+
+    def start_profiler(self, hz):
+        if hz <= 0:
+            return
+        try:
+            signal.signal(signal.SIGPROF, self._sample)
+            signal.setitimer(signal.ITIMER_PROF, 1.0 / hz, 1.0 / hz)
+        except (ValueError, AttributeError) as e:
+            # not in the main thread, or no SIGPROF on this platform
+            print(f"profiler unavailable: {e}")
+            return
+        self.profile_hz = hz
+        # a SIGPROF arriving after interpreter teardown would kill the process
+        atexit.register(self.stop_profiler)
+
+    def stop_profiler(self):
+        if self.profile_hz:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            self.profile_hz = 0
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None and len(stack) < 64:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+            frame = frame.f_back
+        self._samples[';'.join(reversed(stack))] += 1
+
+    def profile(self):
+        """Collapsed stacks sampled since the last call."""
+        # swap rather than copy: the signal handler may fire at any bytecode
+        samples, self._samples = self._samples, defaultdict(int)
+        lines = []
+        for stack, count in sorted(samples.items(), key=lambda kv: -kv[1]):
+            lines.append(f"{stack} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def render(self):
+        out = []
+        with self._lock:
+            hist = {k: list(v) for k, v in self._hist.items()}
+            errors = dict(self._errors)
+            payload = dict(self._payload_bytes)
+            self._expire_rooms(time.monotonic())
+            rooms = [n for n, _ in self._room_events.values()]
+
+        out.append('# HELP codenames_handler_seconds Time spent in HTTP views and Socket.IO handlers.')
+        out.append('# TYPE codenames_handler_seconds histogram')
+        for (kind, name), counts in sorted(hist.items()):
+            cumulative = 0
+            for le, n in zip(BUCKETS + ('+Inf',), counts):
+                cumulative += n
+                out.append(f"codenames_handler_seconds_bucket{_labels(kind=kind, name=name, le=le)} {cumulative}")
+            out.append(f"codenames_handler_seconds_sum{_labels(kind=kind, name=name)} {counts[-2]:.6f}")
+            out.append(f"codenames_handler_seconds_count{_labels(kind=kind, name=name)} {counts[-1]}")
+
+        out.append('# HELP codenames_handler_errors_total Handler calls that raised.')
+        out.append('# TYPE codenames_handler_errors_total counter')
+        for (kind, name) in sorted(hist):
+            out.append(f"codenames_handler_errors_total{_labels(kind=kind, name=name)} {errors.get((kind, name), 0)}")
+
+        out.append('# HELP codenames_payload_bytes_total Bytes received by handlers.')
+        out.append('# TYPE codenames_payload_bytes_total counter')
+        for (kind, name) in sorted(hist):
+            out.append(f"codenames_payload_bytes_total{_labels(kind=kind, name=name)} {payload.get((kind, name), 0)}")
+
+        out.append('# HELP codenames_room_events Socket.IO events handled per live room.')
+        out.append('# TYPE codenames_room_events histogram')
+        for le in ROOM_EVENT_BUCKETS:
+            out.append(f"codenames_room_events_bucket{_labels(le=le)} {sum(1 for n in rooms if n <= le)}")
+        out.append(f"codenames_room_events_bucket{_labels(le='+Inf')} {len(rooms)}")
+        out.append(f"codenames_room_events_sum {sum(rooms)}")
+        out.append(f"codenames_room_events_count {len(rooms)}")
+
+        typed = set()
+        for collect in self._collectors:
+            for name, kind, value, labels in collect():
+                if name not in typed:
+                    out.append(f"# TYPE {name} {kind}")
+                    typed.add(name)
+                out.append(f"{name}{_labels(**labels) if labels else ''} {value}")
+        return '\n'.join(out) + '\n'
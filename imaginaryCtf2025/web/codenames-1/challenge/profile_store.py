@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Profile storage backends for the Codenames server.
+
+Backends (selected with PROFILE_STORE):
+  files   one JSON file per user under profiles/ (legacy layout)
+  sqlite  single SQLite database in WAL mode
+  log     append-only JSON-lines log replayed into memory at startup
+
+Usage (one-shot import of an existing profiles/ directory):
+  python3 profile_store.py migrate <profiles_dir> [sqlite|log] [target_path]
+"""
+import os
+import sys
+import json
+import atexit
+import sqlite3
+import importlib
+
+
+def _original(name):
+    # only look if eventlet is already loaded; patching imports it first
+    patcher = sys.modules.get('eventlet.patcher')
+    if patcher is not None and patcher.is_monkey_patched('thread'):
+        return patcher.original(name)
+    return importlib.import_module(name)
+
+
+def native_threading():
+    """The threading module as it was before eventlet monkey patching.
+
+    Win awards are written from a real OS thread (see win_awards.py), so
+    every lock that thread shares with the hub must be a native lock: a
+    green lock cannot be waited on from another OS thread.
+    """
+    return _original('threading')
+
+
+def native_queue():
+    """The queue module as it was before eventlet monkey patching."""
+    return _original('queue')
+
+
+class ProfileStore:
+    """Base interface; profiles are plain dicts keyed by 'username'."""
+
+    def get(self, username):
+        raise NotImplementedError
+
+    def put(self, profile):
+        self.put_many([profile])
+
+    def put_many(self, profiles):
+        raise NotImplementedError
+
+    def add_wins(self, username, amount):
+        self.add_wins_many({username: amount})
+
+    def add_wins_many(self, increments):
+        """Atomically add increments[username] to each existing profile's wins."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class FileProfileStore(ProfileStore):
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = native_threading().Lock()
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def _path(self, username):
+        return os.path.join(self.directory, username)
+
+    def get(self, username):
+        path = self._path(username)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def _write(self, profile):
+        path = self._path(profile['username'])
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(profile, f)
+        os.replace(tmp, path)
+
+    def put_many(self, profiles):
+        with self._lock:
+            for profile in profiles:
+                self._write(profile)
+
+    def add_wins_many(self, increments):
+        with self._lock:
+            for username, amount in increments.items():
+                profile = self.get(username)
+                if profile:
+                    profile['wins'] = profile.get('wins', 0) + amount
+                    self._write(profile)
+
+
+class SqliteProfileStore(ProfileStore):
+    def __init__(self, path):
+        self.path = path
+        # per OS thread: under eventlet a patched local would be per
+        # greenlet, opening (and leaking) a connection per request
+        self._local = native_threading().local()
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS profiles ('
+            ' username TEXT PRIMARY KEY,'
+            ' wins INTEGER NOT NULL DEFAULT 0,'
+            ' data TEXT NOT NULL)'
+        )
+        conn.commit()
+
+    def _conn(self):
+        # sqlite connections must not be shared across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, username):
+        row = self._conn().execute(
+            'SELECT wins, data FROM profiles WHERE username = ?', (username,)
+        ).fetchone()
+        if not row:
+            return None
+        profile = json.loads(row[1])
+        # the wins column is authoritative so increments never touch the blob
+        profile['wins'] = row[0]
+        return profile
+
+    def put_many(self, profiles):
+        rows = [(p['username'], p.get('wins', 0), json.dumps(p)) for p in profiles]
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                'INSERT INTO profiles (username, wins, data) VALUES (?, ?, ?) '
+                'ON CONFLICT(username) DO UPDATE SET wins = excluded.wins, data = excluded.data',
+                rows,
+            )
+
+    def add_wins_many(self, increments):
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                'UPDATE profiles SET wins = wins + ? WHERE username = ?',
+                [(amount, username) for username, amount in increments.items()],
+            )
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class LogProfileStore(ProfileStore):
+    """Append-only log of full profile records; the newest record wins.
+
+    Every profile lives in memory, so reads never touch the disk. The log is
+    rewritten once it holds COMPACT_RATIO times more records than profiles.
+    """
+
+    COMPACT_RATIO = 4
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = native_threading().Lock()
+        self._profiles = {}
+        self._records = 0
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        profile = json.loads(line)
+                    except ValueError:
+                        # torn write at the tail of the log
+                        continue
+                    self._profiles[profile['username']] = profile
+                    self._records += 1
+        self._fh = open(path, 'a')
+
+    def get(self, username):
+        profile = self._profiles.get(username)
+        return dict(profile) if profile else None
+
+    def _append(self, profiles):
+        # caller holds the lock; one write + fsync per batch
+        self._fh.write(''.join(json.dumps(p) + '\n' for p in profiles))
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        for p in profiles:
+            self._profiles[p['username']] = p
+        self._records += len(profiles)
+        if self._records > self.COMPACT_RATIO * max(len(self._profiles), 1024):
+            self._compact()
+
+    def _compact(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            for p in self._profiles.values():
+                f.write(json.dumps(p) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._fh.close()
+        os.replace(tmp, self.path)
+        self._fh = open(self.path, 'a')
+        self._records = len(self._profiles)
+
+    def put_many(self, profiles):
+        with self._lock:
+            self._append([dict(p) for p in profiles])
+
+    def add_wins_many(self, increments):
+        with self._lock:
+            updated = []
+            for username, amount in increments.items():
+                profile = self._profiles.get(username)
+                if profile:
+                    profile = dict(profile)
+                    profile['wins'] = profile.get('wins', 0) + amount
+                    updated.append(profile)
+            if updated:
+                self._append(updated)
+
+    def close(self):
+        with self._lock:
+            self._fh.close()
+
+
+class WriteBehindStore(ProfileStore):
+    """Runs every write to `store` on one native thread.
+
+    put_many() only queues the profiles, which get() serves until they are
+    written, so a request never waits on disk I/O or on a store lock held
+    across it. add_wins_many() queues its batch and waits for the result,
+    so the win-award thread still sees failures. The only lock here guards
+    the pending dict and is never held across I/O.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        threading = native_threading()
+        self._lock = threading.Lock()
+        self._Event = threading.Event
+        self._pending = {}
+        self._queue = native_queue().SimpleQueue()
+        self._closed = False
+        self.failures = 0
+        self._thread = threading.Thread(target=self._run, name='profile-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def get(self, username):
+        with self._lock:
+            profile = self._pending.get(username)
+        return dict(profile) if profile else self.store.get(username)
+
+    def put_many(self, profiles):
+        profiles = [dict(p) for p in profiles]
+        with self._lock:
+            for p in profiles:
+                self._pending[p['username']] = p
+        self._queue.put((self.store.put_many, profiles, None))
+
+    def add_wins_many(self, increments):
+        done = self._Event()
+        result = [done, None]
+        self._queue.put((self.store.add_wins_many, increments, result))
+        done.wait()
+        if result[1] is not None:
+            raise result[1]
+
+    def _run(self):
+        while True:
+            write, arg, result = self._queue.get()
+            if write is None:
+                return
+            try:
+                write(arg)
+            except Exception as e:
+                if result is not None:
+                    result[1] = e
+                else:
+                    print(f"profile write failed: {e}")
+                    self.failures += 1
+            finally:
+                if result is not None:
+                    result[0].set()
+                else:
+                    # written (or given up on): reads go to the store again
+                    with self._lock:
+                        for p in arg:
+                            if self._pending.get(p['username']) is p:
+                                del self._pending[p['username']]
+
+    def close(self):
+        """Write everything queued, then close the store; safe to call twice."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put((None, None, None))
+        self._thread.join()
+        self.store.close()
+
+
+def open_store(kind=None, path=None):
+    kind = kind or os.environ.get('PROFILE_STORE', 'files')
+    if kind == 'files':
+        return FileProfileStore(path or os.environ.get('PROFILES_DIR', 'profiles'))
+    if kind == 'sqlite':
+        return SqliteProfileStore(path or os.environ.get('PROFILE_DB', 'profiles.db'))
+    if kind == 'log':
+        return LogProfileStore(path or os.environ.get('PROFILE_LOG', 'profiles.log'))
+    raise ValueError(f"unknown profile store: {kind}")
+
+
+def migrate(src_dir, dest, batch_size=1000):
+    """Import every JSON profile in src_dir into dest, batch_size at a time."""
+    count = 0
+    batch = []
+    for name in sorted(os.listdir(src_dir)):
+        path = os.path.join(src_dir, name)
+        if not os.path.isfile(path) or name.endswith('.tmp'):
+            continue
+        try:
+            with open(path, 'r') as f:
+                profile = json.load(f)
+        except (IOError, ValueError) as e:
+            print(f"skipping {name}: {e}")
+            continue
+        profile.setdefault('username', name)
+        batch.append(profile)
+        if len(batch) >= batch_size:
+            dest.put_many(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        dest.put_many(batch)
+        count += len(batch)
+    return count
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] != 'migrate':
+        print("Usage: profile_store.py migrate <profiles_dir> [sqlite|log] [target_path]")
+        sys.exit(1)
+    src = sys.argv[2]
+    kind = sys.argv[3] if len(sys.argv) > 3 else 'sqlite'
+    target = sys.argv[4] if len(sys.argv) > 4 else None
+    dest = open_store(kind, target)
+    try:
+        n = migrate(src, dest)
+    finally:
+        dest.close()
+    print(f"migrated {n} profiles into {kind} store")
+
+
+if __name__ == '__main__':
+    main()
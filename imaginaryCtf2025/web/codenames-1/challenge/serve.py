@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the Codenames server.
+
+Usage:
+  ASYNC_MODE=eventlet python3 serve.py
+
+Environment:
+  ASYNC_MODE  eventlet (default), gevent or threading; gevent needs the
+              gevent and gevent-websocket packages
+  HOST, PORT  listen address (default 0.0.0.0:5000)
+"""
+import os
+
+ASYNC_MODE = os.environ.setdefault('ASYNC_MODE', 'eventlet')
+# monkey patching must happen before app.py imports socket/threading users
+if ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif ASYNC_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+elif ASYNC_MODE != 'threading':
+    raise SystemExit(f"unknown ASYNC_MODE: {ASYNC_MODE}")
+
+from app import app, socketio
+
+
+def main():
+    host = os.environ.get('HOST', '0.0.0.0')
+    port = int(os.environ.get('PORT', '5000'))
+    kwargs = {}
+    if ASYNC_MODE == 'threading':
+        # threading mode runs on Werkzeug, which Flask-SocketIO refuses by default
+        kwargs['allow_unsafe_werkzeug'] = True
+    socketio.run(app, host=host, port=port, **kwargs)
+
+
+if __name__ == '__main__':
+    main()
@@ -19,10 +19,13 @@ document.addEventListener('DOMContentLoaded', function() {
   var lightMap = { red: '#ff9999', blue: '#9999ff', neutral: '#dddddd', assassin: '#777777' };
   var darkMap  = { red: '#cc6666', blue: '#6666cc', neutral: '#bbbbbb', assassin: '#333333' };
   var boardColors, isClueGiver;
+  // sequence number of the last state we applied; sent on reconnect to resync
+  var seq = null;
   socket.on('connect', function() {
-    socket.emit('join');
+    socket.emit('join', seq === null ? {} : { since: seq });
   });
   socket.on('start_game', function(data) {
+    seq = data.seq;
     window.board = data.board;
     window.revealed = data.revealed;
     window.clue_giver = data.clue_giver;
@@ -58,7 +61,8 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     boardTable.style.display = 'table';
   });
-  socket.on('clue_given', function(data) {
+  function onClueGiven(data) {
+    seq = data.seq;
     var clue = data.clue;
     var guesses = data.guesses_remaining;
     clueDisplay.style.display = 'block';
@@ -68,13 +72,17 @@ document.addEventListener('DOMContentLoaded', function() {
       clueInput.style.display = 'none';
     }
     renderBoard();
-  });
-  socket.on('update', function(data) {
+  }
+  function onUpdate(data) {
+    seq = data.seq;
     var idx = data.index;
     var color = data.color;
     window.revealed[idx] = true;
     colorCell(idx, color);
-    window.score = data.score;
+    // score is only sent when it changed
+    if (data.score !== undefined) {
+      window.score = data.score;
+    }
     var rem = data.guesses_remaining;
     scoreVal.innerText = window.score;
     guessesVal.innerText = rem;
@@ -105,6 +113,18 @@ document.addEventListener('DOMContentLoaded', function() {
         clueInput.style.display = 'block';
       }
     }
+  }
+  socket.on('clue_given', onClueGiven);
+  socket.on('update', onUpdate);
+  // replay the events missed while disconnected
+  socket.on('resync', function(data) {
+    data.events.forEach(function(ev) {
+      if (ev[0] === 'clue_given') {
+        onClueGiven(ev[1]);
+      } else if (ev[0] === 'update') {
+        onUpdate(ev[1]);
+      }
+    });
   });
   sendClueBtn.addEventListener('click', function() {
     var clue = clueWord.value.trim();
@@ -0,0 +1,82 @@
+"""
+Background win-award queue for the Codenames server.
+
+Socket.IO handlers only call award(); increments are coalesced per user and
+written to the profile store in one add_wins_many() batch, either every
+flush_interval seconds or as soon as max_pending users are waiting.
+"""
+import time
+import atexit
+
+from profile_store import native_threading
+
+
+class WinAwardQueue:
+    def __init__(self, store, flush_interval=1.0, max_pending=256):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}
+        # under eventlet these are the unpatched classes: a real OS thread
+        # and native locking, so blocking disk I/O never runs on the hub
+        threading = native_threading()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.flushed = 0
+        self.failures = 0
+        self._thread = threading.Thread(target=self._run, name='win-awards', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def award(self, usernames, amount):
+        with self._cond:
+            for username in usernames:
+                self._pending[username] = self._pending.get(username, 0) + amount
+            if len(self._pending) >= self.max_pending:
+                self._cond.notify()
+
+    def pending_for(self, username):
+        with self._cond:
+            return self._pending.get(username, 0)
+
+    def flush(self):
+        with self._cond:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        try:
+            self.store.add_wins_many(batch)
+        except Exception as e:
+            print(f"win award flush failed: {e}")
+            self.failures += 1
+            # put the batch back so no increment is lost
+            with self._cond:
+                for username, amount in batch.items():
+                    self._pending[username] = self._pending.get(username, 0) + amount
+            return 0
+        self.flushed += len(batch)
+        return len(batch)
+
+    def _run(self):
+        while True:
+            deadline = time.monotonic() + self.flush_interval
+            with self._cond:
+                while not self._closed and len(self._pending) < self.max_pending:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def close(self):
+        """Flush outstanding awards and stop the worker; safe to call twice."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self.flush()